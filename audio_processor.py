@@ -0,0 +1,602 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import struct
+import time
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from math import gcd
+from typing import Optional, Tuple
+
+import numpy as np
+
+import metrics
+from logging_config import LogSampler
+
+logger = logging.getLogger(__name__)
+
+DSP_QUEUE_WAIT = metrics.histogram(
+    "stt_dsp_queue_wait_seconds", "Time audio DSP jobs wait for a worker thread")
+DSP_RUN_SECONDS = metrics.histogram(
+    "stt_dsp_run_seconds", "Time audio DSP jobs spend on a worker thread", ("task",))
+
+
+@lru_cache(maxsize=None)
+def _design_phase_taps(up: int, down: int) -> np.ndarray:
+    """
+    Anti-aliasing filter for resampling by up/down, split into `up` reversed polyphase
+    sub-filters. Designed once per ratio and shared (read-only) by all resamplers.
+    """
+    if up == down:
+        # Same rate: a single unit tap turns the filter into a plain copy
+        taps = np.ones(1)
+    else:
+        # scipy.signal takes about a second to import, so it is loaded by the first resampler that needs it
+        import scipy.signal
+
+        # Same filter design as scipy.signal.resample_poly (kaiser window, beta 5.0)
+        max_rate = max(up, down)
+        half_len = 10 * max_rate
+        taps = scipy.signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * up
+
+    # Split into `up` polyphase sub-filters of equal length, reversed for dot products
+    taps_per_phase = -(-len(taps) // up)
+    padded = np.zeros(taps_per_phase * up, dtype=np.float64)
+    padded[:len(taps)] = taps
+    phase_taps = np.ascontiguousarray(padded.reshape(taps_per_phase, up).T[:, ::-1], dtype=np.float32)
+    phase_taps.flags.writeable = False
+    return phase_taps
+
+
+class StreamingResampler:
+    """
+    Stateful polyphase resampler for Int16 PCM streams.
+
+    The anti-aliasing FIR filter is designed once (same design as
+    scipy.signal.resample_poly) and the last input samples are carried over
+    between calls, so consecutive chunks are filtered as one continuous signal
+    without edge artifacts at chunk boundaries.
+    """
+
+    def __init__(self, source_sample_rate: int, target_sample_rate: int, max_chunk_samples: int = 24000):
+        divisor = gcd(source_sample_rate, target_sample_rate)
+        self.up = target_sample_rate // divisor
+        self.down = source_sample_rate // divisor
+
+        self._phase_taps = _design_phase_taps(self.up, self.down)
+        self._history_len = self._phase_taps.shape[1] - 1
+
+        self._input = np.empty(0, dtype=np.float32)
+        self._output = np.empty(0, dtype=np.float32)
+        self._output_int16 = np.empty(0, dtype=np.int16)
+        self._windows = None  # Filter windows over `_input`, cached for the last chunk size
+        self._ensure_capacity(max_chunk_samples)
+        self.reset()
+
+    def _ensure_capacity(self, chunk_samples: int):
+        if len(self._input) < self._history_len + chunk_samples:
+            history = self._input[:self._history_len].copy() if len(self._input) else None
+            self._input = np.zeros(self._history_len + chunk_samples, dtype=np.float32)
+            if history is not None:
+                self._input[:self._history_len] = history
+            self._windows = None
+        max_out = chunk_samples * self.up // self.down + 2
+        if len(self._output) < max_out:
+            self._output = np.empty(max_out, dtype=np.float32)
+            self._output_int16 = np.empty(max_out, dtype=np.int16)
+
+    def reset(self):
+        """
+        Clears the filter state so the next chunk starts a new stream.
+        """
+        self._input[:self._history_len] = 0.0
+        self._samples_in = 0  # Total input samples consumed
+        self._samples_out = 0  # Total output samples produced
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        """
+        Resamples one chunk of Int16 samples.
+
+        Returns a view into an internal buffer that is only valid until the next call.
+        """
+        n = len(pcm)
+        self._ensure_capacity(n)
+        hist = self._history_len
+        buf = self._input[:hist + n]
+        buf[hist:] = pcm
+
+        first_out = self._samples_out
+        samples_in_before = self._samples_in
+        self._samples_in += n
+        # Output k needs input up to index (k * down) // up
+        end_out = -(-self._samples_in * self.up // self.down)
+        count = end_out - first_out
+
+        out = self._output[:count]
+        if count > 0:
+            if self._windows is None or len(self._windows) != n + 1:
+                # Clients send fixed-size frames, so the view is built once per recording
+                self._windows = np.lib.stride_tricks.sliding_window_view(buf, hist + 1)
+            windows = self._windows
+            for j in range(min(self.up, count)):
+                k = first_out + j
+                phase = (k * self.down) % self.up
+                start = (k * self.down) // self.up - samples_in_before
+                rows = windows[start::self.down][:len(range(j, count, self.up))]
+                np.matmul(rows, self._phase_taps[phase], out=out[j::self.up])
+        self._samples_out = end_out
+
+        # Keep the tail of the signal as filter history for the next chunk
+        if hist:
+            buf[:hist] = buf[n:n + hist]
+
+        np.rint(out, out=out)
+        np.clip(out, -32768, 32767, out=out)
+        out_int16 = self._output_int16[:count]
+        out_int16[:] = out
+        return out_int16
+
+
+class VoiceActivityDetector:
+    """
+    Energy + zero-crossing voice activity detector for 16kHz Int16 PCM.
+
+    Features are computed for all 20ms frames of a chunk in one vectorized
+    pass; a small state machine then keeps a pre-roll before speech and a
+    hangover after it, so word onsets and the pauses ASR needs to end a
+    sentence survive. Longer silence is dropped, except for a zero frame every
+    `keepalive_ms` so the ASR session does not hit its idle timeout.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20, threshold_db: float = 12.0,
+                 min_speech_dbfs: float = -50.0, zcr_threshold: float = 0.25, padding_ms: int = 200,
+                 hangover_ms: int = 600, keepalive_ms: int = 5000):
+        self.frame_ms = frame_ms
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.threshold_db = threshold_db  # Required level above the tracked noise floor
+        self.min_speech_dbfs = min_speech_dbfs  # Frames quieter than this are never speech
+        self.zcr_threshold = zcr_threshold  # Catches quiet unvoiced consonants (s, sh, f)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.keepalive_frames = max(1, keepalive_ms // frame_ms)
+        self._preroll_frames = max(0, padding_ms // frame_ms)
+        # Scratch buffers, grown on demand and reused for every chunk
+        self._pending = np.empty(0, dtype=np.int16)  # Leftover samples of the last chunk, then the new chunk
+        self._output = np.empty(0, dtype=np.int16)
+        self._samples = np.empty((0, self.frame_samples), dtype=np.float32)
+        self._signs = np.empty((0, self.frame_samples), dtype=bool)
+        self._crossings = np.empty((0, self.frame_samples - 1), dtype=bool)
+        self._levels = np.empty(0, dtype=np.float32)
+        self._preroll = np.zeros((self._preroll_frames, self.frame_samples), dtype=np.int16)  # Ring of silent frames
+        self.reset()
+
+    def reset(self):
+        self._remainder = 0  # Samples at the start of `_pending` that did not fill a frame
+        self._preroll_start = 0
+        self._preroll_count = 0
+        self._hangover = 0
+        self._silent_run = 0
+        self._noise_db = None
+        self.total_frames = 0
+        self.speech_frames = 0
+        self.sent_frames = 0
+
+    def _ensure_capacity(self, chunk_samples: int):
+        pending = self.frame_samples + chunk_samples
+        if len(self._pending) < pending:
+            grown = np.empty(pending, dtype=np.int16)
+            grown[:self._remainder] = self._pending[:self._remainder]
+            self._pending = grown
+        max_frames = pending // self.frame_samples
+        if len(self._levels) < max_frames:
+            self._samples = np.empty((max_frames, self.frame_samples), dtype=np.float32)
+            self._signs = np.empty((max_frames, self.frame_samples), dtype=bool)
+            self._crossings = np.empty((max_frames, self.frame_samples - 1), dtype=bool)
+            self._levels = np.empty(max_frames, dtype=np.float32)
+            # Worst case: the whole pre-roll plus every frame, plus keepalive frames
+            self._output = np.empty((self._preroll_frames + 2 * max_frames) * self.frame_samples, dtype=np.int16)
+
+    def _features(self, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        count = len(frames)
+        samples = self._samples[:count]
+        np.copyto(samples, frames)
+        energy = np.einsum('ij,ij->i', samples, samples, out=self._levels[:count])
+        energy /= frames.shape[1]
+        energy += 1e-3
+        level_dbfs = np.log10(energy, out=energy)
+        level_dbfs *= 10.0
+        level_dbfs -= 20.0 * np.log10(32768.0)
+        signs = np.signbit(samples, out=self._signs[:count])
+        # Sign changes per frame; counted row by row in `process`
+        return level_dbfs, np.not_equal(signs[:, 1:], signs[:, :-1], out=self._crossings[:count])
+
+    def _is_speech(self, level_dbfs: float, zcr: float) -> bool:
+        if self._noise_db is None:
+            self._noise_db = level_dbfs
+        floor = max(self._noise_db, self.min_speech_dbfs - self.threshold_db)
+        speech = (level_dbfs > floor + self.threshold_db or
+                  (zcr > self.zcr_threshold and level_dbfs > floor + self.threshold_db / 2))
+        # The noise floor follows quieter frames immediately and louder non-speech slowly
+        if level_dbfs < self._noise_db:
+            self._noise_db = level_dbfs
+        elif not speech:
+            self._noise_db += 0.05 * (level_dbfs - self._noise_db)
+        return speech
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        """
+        Returns the part of `pcm` that should be sent to ASR.
+
+        The result is a view into an internal buffer that is only valid until the next call.
+        """
+        self._ensure_capacity(len(pcm))
+        total = self._remainder + len(pcm)
+        self._pending[self._remainder:total] = pcm
+        count = total // self.frame_samples
+        frames = self._pending[:count * self.frame_samples].reshape(count, self.frame_samples)
+        out = self._output.reshape(-1, self.frame_samples)
+        kept = 0
+        if count:
+            levels, crossings = self._features(frames)
+            for frame, level_dbfs, frame_crossings in zip(frames, levels.tolist(), crossings):
+                zcr = np.count_nonzero(frame_crossings) / (self.frame_samples - 1)
+                if self._is_speech(level_dbfs, zcr):
+                    self.speech_frames += 1
+                    self._hangover = self.hangover_frames
+                    for i in range(self._preroll_count):
+                        out[kept] = self._preroll[(self._preroll_start + i) % self._preroll_frames]
+                        kept += 1
+                    self._preroll_start = self._preroll_count = 0
+                    out[kept] = frame
+                    kept += 1
+                    self._silent_run = 0
+                elif self._hangover:
+                    self._hangover -= 1
+                    out[kept] = frame
+                    kept += 1
+                    self._silent_run = 0
+                else:
+                    self._push_preroll(frame)
+                    self._silent_run += 1
+                    if self._silent_run >= self.keepalive_frames:
+                        out[kept] = 0
+                        kept += 1
+                        self._silent_run = 0
+        self.total_frames += count
+        self.sent_frames += kept
+
+        # Carry the samples that did not fill a frame over to the next chunk
+        self._remainder = total - count * self.frame_samples
+        self._pending[:self._remainder] = self._pending[count * self.frame_samples:total]
+        return self._output[:kept * self.frame_samples]
+
+    def _push_preroll(self, frame: np.ndarray):
+        if not self._preroll_frames:
+            return
+        if self._preroll_count < self._preroll_frames:
+            self._preroll[(self._preroll_start + self._preroll_count) % self._preroll_frames] = frame
+            self._preroll_count += 1
+        else:
+            # Full: overwrite the oldest frame
+            self._preroll[self._preroll_start] = frame
+            self._preroll_start = (self._preroll_start + 1) % self._preroll_frames
+
+    def stats(self) -> dict:
+        silence_frames = self.total_frames - self.speech_frames
+        return {
+            "audio_ms": self.total_frames * self.frame_ms,
+            "speech_ms": self.speech_frames * self.frame_ms,
+            "silence_ms": silence_frames * self.frame_ms,
+            "sent_ms": self.sent_frames * self.frame_ms,
+            "speech_ratio": round(self.speech_frames / self.total_frames, 3) if self.total_frames else 0.0,
+            "sent_ratio": round(self.sent_frames / self.total_frames, 3) if self.total_frames else 0.0
+        }
+
+
+# Framed audio sent by AudioWorklet clients: magic, sequence number, sample rate,
+# timestamp in ms since the recording started, then the payload. The payload is
+# little-endian Int16 PCM for FRAME_MAGIC and one raw Opus packet for OPUS_FRAME_MAGIC.
+FRAME_MAGIC = b"STT1"
+OPUS_FRAME_MAGIC = b"STO1"
+FRAME_HEADER = struct.Struct("<4sIII")
+
+
+def opus_supported() -> bool:
+    """
+    Whether Opus ingest is available; it needs the optional PyAV package (`pip install av`).
+    """
+    return importlib.util.find_spec("av") is not None
+
+
+def warm_up_dsp(source_sample_rates: Tuple[int, ...] = (48000, 44100), target_sample_rate: int = 16000):
+    """
+    Imports scipy.signal and designs the resampling filters of common capture rates, and
+    loads PyAV when Opus ingest is available, so the first recording does not pay for it.
+    """
+    for sample_rate in source_sample_rates:
+        StreamingResampler(sample_rate, target_sample_rate)
+    if opus_supported():
+        import av  # noqa: F401
+
+
+class OpusStreamDecoder:
+    """
+    Incremental decoder for raw Opus packets, e.g. from the browser's WebCodecs AudioEncoder.
+
+    Decodes to 48kHz mono Int16 (Opus' native rate); AudioProcessor resamples the result.
+    """
+    sample_rate = 48000
+
+    def __init__(self):
+        try:
+            import av
+        except ImportError as e:
+            raise RuntimeError("Opus ingest requires the optional 'av' (PyAV) package") from e
+        self._av = av
+        self._codec = None
+        for codec_name in ("libopus", "opus"):
+            try:
+                self._codec = av.CodecContext.create(codec_name, "r")
+                break
+            except Exception:
+                continue
+        if self._codec is None:
+            raise RuntimeError("No Opus decoder available in the installed FFmpeg build")
+        self._codec.layout = "mono"
+        self._codec.sample_rate = self.sample_rate
+        self._codec.open()
+
+    def decode(self, packet) -> np.ndarray:
+        try:
+            frames = self._codec.decode(self._av.Packet(bytes(packet)))
+        except Exception as e:
+            raise ValueError(f"Undecodable Opus packet: {e}") from e
+        decoded = []
+        for frame in frames:
+            samples = frame.to_ndarray().reshape(-1)
+            if samples.dtype != np.int16:
+                # Planar float output from FFmpeg's native decoder
+                samples = np.clip(samples * 32768.0, -32768, 32767).astype(np.int16)
+            decoded.append(samples)
+        if not decoded:
+            return np.empty(0, dtype=np.int16)
+        return decoded[0] if len(decoded) == 1 else np.concatenate(decoded)
+
+
+class AudioProcessor:
+    def __init__(self, target_sample_rate=16000, source_sample_rate=48000): # Changed to 16kHz for Tencent ASR
+        self.target_sample_rate = target_sample_rate
+        self.source_sample_rate = source_sample_rate  # Most common sample rate for microphones
+        self.default_source_sample_rate = source_sample_rate  # Assumed for clients that send bare PCM
+        self.resampler = StreamingResampler(self.source_sample_rate, self.target_sample_rate)
+        self.framed = False  # Whether the client sends FRAME_HEADER-prefixed frames
+        self.codec = "pcm16"  # Payload encoding: "pcm16" or "opus"
+        self._opus_decoder = None
+        self.vad = VoiceActivityDetector(self.target_sample_rate)
+        self.vad_enabled = False  # Drop silence before it reaches ASR
+        self._next_sequence = 0
+        self.lost_frames = 0
+        self._gap_log = LogSampler(every=1, interval=5.0)  # Lossy links can gap on every frame
+
+    def reset(self, framed: bool = False, codec: str = "pcm16", vad: bool = False):
+        """
+        Resets the resampler and VAD state at the start of a new recording.
+        """
+        if codec not in ("pcm16", "opus") or (codec == "opus" and not framed):
+            raise ValueError(f"Unsupported audio codec '{codec}'")
+        self.framed = framed
+        self.codec = codec
+        # Opus decoders carry prediction state, so every recording gets a fresh one
+        self._opus_decoder = OpusStreamDecoder() if codec == "opus" else None
+        self.vad_enabled = vad
+        self.vad.reset()
+        self._next_sequence = 0
+        self.lost_frames = 0
+        if self.source_sample_rate != self.default_source_sample_rate:
+            self.source_sample_rate = self.default_source_sample_rate
+            self.resampler = StreamingResampler(self.source_sample_rate, self.target_sample_rate)
+        self.resampler.reset()
+
+    def unpack_frame(self, audio_data) -> Tuple[memoryview, int]:
+        """
+        Returns the payload of a client frame and its sample rate.
+
+        Legacy clients send bare PCM at `source_sample_rate`; framed clients
+        prefix every frame with FRAME_HEADER. Raises ValueError for a frame
+        without a valid header; it is taken to be the expected frame, so the
+        next one is not counted as a sequence gap as well.
+        """
+        if not self.framed:
+            return memoryview(audio_data), self.source_sample_rate
+        if len(audio_data) < FRAME_HEADER.size:
+            self._next_sequence += 1
+            raise ValueError(f"Audio frame of {len(audio_data)} bytes is shorter than its header")
+        magic, sequence, sample_rate, _timestamp_ms = FRAME_HEADER.unpack_from(audio_data)
+        if magic != (OPUS_FRAME_MAGIC if self.codec == "opus" else FRAME_MAGIC):
+            self._next_sequence += 1
+            raise ValueError("Audio frame is missing the expected header")
+        if sequence != self._next_sequence:
+            self.lost_frames += max(0, sequence - self._next_sequence)
+            if self._gap_log.should_log():
+                logger.warning(f"Audio frame sequence gap: expected {self._next_sequence}, got {sequence} "
+                               f"({self._gap_log.take_suppressed()} more gaps not logged, {self.lost_frames} frames lost)")
+        self._next_sequence = sequence + 1
+        return memoryview(audio_data)[FRAME_HEADER.size:], sample_rate
+
+    def drop_frame(self, error: Exception):
+        """
+        Counts a malformed client frame (bad header, undecodable payload) as lost, so one
+        bad packet costs a frame of audio rather than the whole recording.
+        """
+        self.lost_frames += 1
+        if self._gap_log.should_log():
+            logger.warning(f"Dropped malformed audio frame: {error} "
+                           f"({self._gap_log.take_suppressed()} more gaps not logged, {self.lost_frames} frames lost)")
+
+    def needs_processing(self, sample_rate: int) -> bool:
+        """
+        Whether a payload needs decoding, resampling or VAD before it can go to ASR.
+        """
+        return self.codec != "pcm16" or sample_rate != self.target_sample_rate or self.vad_enabled
+
+    def process_payload(self, payload, sample_rate: int) -> memoryview:
+        """
+        Decodes (for Opus) and resamples one frame payload to 16kHz Int16 PCM,
+        then drops silence if VAD is enabled. May return an empty view.
+
+        The result is a byte view into the resampler's or VAD's reused buffers:
+        it is only valid until the next call, so consumers copy it (as
+        AudioSendQueue.put does) before the next frame is processed.
+        """
+        if self.codec == "opus":
+            pcm_data = self._opus_decoder.decode(payload)
+            sample_rate = OpusStreamDecoder.sample_rate
+        else:
+            # Interpret the binary audio data as Int16 without copying
+            pcm_data = np.frombuffer(payload, dtype=np.int16)
+
+        if sample_rate != self.target_sample_rate:
+            if sample_rate != self.source_sample_rate:
+                # The client reported a different rate; rebuild the filter for it
+                self.source_sample_rate = sample_rate
+                self.resampler = StreamingResampler(sample_rate, self.target_sample_rate)
+            # Resample to 16kHz, continuing the filter state of the previous chunk
+            pcm_data = self.resampler.process(pcm_data)
+
+        if self.vad_enabled:
+            pcm_data = self.vad.process(pcm_data)
+        return pcm_data.data.cast('B')
+
+    def process_audio_chunk(self, audio_data) -> bytes:
+        """
+        Like unpack_frame + process_payload, but returns a copy the caller owns.
+        """
+        payload, sample_rate = self.unpack_frame(audio_data)
+        if not self.needs_processing(sample_rate):
+            # Already 16kHz PCM (e.g. downsampled in the browser): no DSP needed
+            return bytes(payload)
+        return bytes(self.process_payload(payload, sample_rate))
+
+    def save_audio_buffer(self, audio_buffer, filename):
+        """
+        Writes an iterable of 16kHz PCM chunks to a WAV file, one chunk at a time.
+        """
+        with WavWriter(filename, self.target_sample_rate) as writer:
+            for chunk in audio_buffer:
+                writer.write(chunk)
+        logger.info(f"Saved audio buffer to {filename}")
+
+
+class WavWriter:
+    """
+    Appends mono Int16 PCM to a WAV file as it arrives.
+
+    Chunks go straight to the (buffered) file, so memory stays flat however
+    long the recording runs; the RIFF and data sizes in the header are patched
+    when the writer is closed.
+    """
+
+    def __init__(self, filename: str, sample_rate: int = 16000):
+        self.filename = filename
+        self.frames = 0
+        self._wav = wave.open(filename, 'wb')
+        self._wav.setnchannels(1)  # Mono audio
+        self._wav.setsampwidth(2)  # 2 bytes per sample (16-bit)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, pcm):
+        """
+        Appends a chunk of PCM (any bytes-like object, e.g. a view from process_payload).
+        """
+        self._wav.writeframesraw(pcm)
+        self.frames += len(pcm) // 2
+
+    def close(self):
+        self._wav.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DSPExecutor:
+    """
+    Shared worker pool that runs audio DSP for all WebSocket sessions off the event loop.
+
+    NumPy/SciPy release the GIL inside their kernels, so a thread pool gives real
+    parallelism without copying audio between processes. Each session awaits its
+    own jobs one at a time, which keeps per-session ordering; the number of jobs
+    in flight across all sessions is bounded, so callers block (and stop reading
+    from their sockets) when the pool falls behind.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 64, latency_window: int = 1024):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dsp")
+        self._slots = asyncio.Semaphore(max_pending)
+
+        # Metrics
+        self.pending = 0  # Jobs submitted and not yet finished
+        self.completed = 0
+        self.backpressure_waits = 0  # Jobs that had to wait for a free slot
+        self._queue_wait = deque(maxlen=latency_window)  # Seconds from submit to start on a worker
+        self._run_time = deque(maxlen=latency_window)  # Seconds spent on the worker
+
+    async def run(self, func, *args):
+        """
+        Runs `func(*args)` on the pool and returns its result.
+        """
+        if self._slots.locked():
+            self.backpressure_waits += 1
+        async with self._slots:
+            self.pending += 1
+            submitted = time.perf_counter()
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, self._timed_call, submitted, func, args)
+            finally:
+                self.pending -= 1
+                self.completed += 1
+
+    def _timed_call(self, submitted, func, args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            run_time = time.perf_counter() - started
+            self._queue_wait.append(started - submitted)
+            self._run_time.append(run_time)
+            DSP_QUEUE_WAIT.observe(started - submitted)
+            DSP_RUN_SECONDS.observe(run_time, task=getattr(func, "__name__", "unknown"))
+
+    def stats(self) -> dict:
+        """
+        Returns queue depth and latency percentiles (in milliseconds) for sizing the pool.
+        """
+        def percentiles(samples):
+            if not samples:
+                return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+            values = np.fromiter(samples, dtype=np.float64) * 1000.0
+            return {
+                "p50": float(np.percentile(values, 50)),
+                "p99": float(np.percentile(values, 99)),
+                "max": float(values.max()),
+            }
+
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "backpressure_waits": self.backpressure_waits,
+            "queue_wait_ms": percentiles(self._queue_wait),
+            "run_time_ms": percentiles(self._run_time),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,461 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+import metrics
+from audio_processor import AudioProcessor, DSPExecutor
+from tencent_asr_client import ASRSessionManager, AudioSendQueue
+
+logger = logging.getLogger(__name__)
+
+BATCH_JOBS = metrics.counter("stt_batch_jobs_total", "Batch transcription jobs by outcome", ("status",))
+BATCH_REALTIME_FACTOR = metrics.histogram(
+    "stt_batch_realtime_factor", "Seconds of audio transcribed per wall-clock second, per batch job",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200))
+
+
+class BatchQueueFullError(Exception):
+    """
+    Raised when a batch job cannot be queued because too many are already waiting.
+    """
+
+
+class AudioFile:
+    """
+    16-bit PCM audio (WAV or headerless) read through a memory map, so files of
+    any length are processed chunk by chunk without loading them.
+
+    `fd` is owned by the AudioFile and closed with it.
+    """
+
+    def __init__(self, fd: int, audio_format: str = "wav", sample_rate: int = 16000, channels: int = 1):
+        self._fd = fd
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                raise ValueError("The uploaded file is empty")
+            self._mmap = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            os.close(fd)
+            raise
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.data_offset = 0
+        self.data_size = size
+        if audio_format == "wav" or self._mmap[:4] == b"RIFF":
+            self._parse_wav()
+        elif audio_format != "pcm16":
+            self.close()
+            raise ValueError(f"Unsupported audio format '{audio_format}', expected 'wav' or 'pcm16'")
+        if self.channels < 1 or self.sample_rate < 1:
+            self.close()
+            raise ValueError(f"Invalid audio parameters: {self.channels} channels at {self.sample_rate} Hz")
+        self.frame_bytes = 2 * self.channels  # One sample of every channel
+        self.data_size -= self.data_size % self.frame_bytes
+
+    def _parse_wav(self):
+        m = self._mmap
+        if m[:4] != b"RIFF" or m[8:12] != b"WAVE":
+            self.close()
+            raise ValueError("Not a WAV file")
+        position = 12
+        fmt = None
+        while position + 8 <= len(m):
+            chunk_id = m[position:position + 4]
+            chunk_size = struct.unpack_from("<I", m, position + 4)[0]
+            body = position + 8
+            if chunk_id == b"fmt ":
+                if chunk_size < 16 or body + 16 > len(m):
+                    self.close()
+                    raise ValueError("WAV file has a truncated fmt chunk")
+                fmt = struct.unpack_from("<HHIIHH", m, body)
+            elif chunk_id == b"data":
+                self.data_offset = body
+                # Streaming writers leave the size at 0 or 0xFFFFFFFF; the data then runs to the end of the file
+                available = len(m) - body
+                self.data_size = available if chunk_size in (0, 0xFFFFFFFF) else min(chunk_size, available)
+                break
+            position = body + chunk_size + (chunk_size & 1)
+        else:
+            self.close()
+            raise ValueError("WAV file has no data chunk")
+
+        if fmt is None:
+            self.close()
+            raise ValueError("WAV file has no fmt chunk")
+        format_tag, channels, sample_rate, _byte_rate, _block_align, bits = fmt
+        if format_tag not in (1, 0xFFFE) or bits != 16:
+            self.close()
+            raise ValueError("Only 16-bit PCM WAV files are supported")
+        self.channels = channels
+        self.sample_rate = sample_rate
+
+    @property
+    def frames(self) -> int:
+        return self.data_size // self.frame_bytes
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    def read(self, start_frame: int, end_frame: int) -> memoryview:
+        """
+        Zero-copy view of frames [start_frame, end_frame), interleaved if multi-channel.
+        """
+        start = self.data_offset + start_frame * self.frame_bytes
+        end = self.data_offset + min(end_frame, self.frames) * self.frame_bytes
+        return memoryview(self._mmap)[start:end]
+
+    def find_split_points(self, segment_seconds: float, search_seconds: float = 3.0, window_ms: int = 20) -> List[int]:
+        """
+        Frame indices that cut the file into segments of about `segment_seconds`.
+
+        Each cut is moved to the quietest `window_ms` window within
+        `search_seconds` of the target, so segments rarely split a word.
+        """
+        points = [0]
+        window = max(1, self.sample_rate * window_ms // 1000)
+        step = int(segment_seconds * self.sample_rate)
+        search = int(search_seconds * self.sample_rate)
+        target = step
+        while target < self.frames - step // 4:
+            lo = max(points[-1] + window, target - search)
+            hi = min(self.frames, target + search)
+            windows = (hi - lo) // window
+            if windows <= 0:
+                points.append(target)
+            else:
+                view = self.read(lo, lo + windows * window)
+                samples = np.frombuffer(view, dtype=np.int16)[::self.channels].astype(np.float32)
+                blocks = samples.reshape(windows, window)
+                energy = np.einsum("ij,ij->i", blocks, blocks)
+                points.append(lo + int(np.argmin(energy)) * window)
+                del samples, blocks, view
+            target = points[-1] + step
+        points.append(self.frames)
+        return points
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A view is still alive somewhere; the map is released when it is collected
+                pass
+            self._mmap = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _prepare_chunk(processor: AudioProcessor, payload: memoryview, channels: int, sample_rate: int) -> memoryview:
+    if channels > 1:
+        payload = np.frombuffer(payload, dtype=np.int16).reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return processor.process_payload(payload, sample_rate)
+
+
+class TranscriptionJob:
+    """
+    One uploaded file and its progress through transcription (and optional enhancement).
+    """
+
+    def __init__(self, audio: AudioFile, filename: str = "", vad: bool = False,
+                 enhance: Optional[Callable[[str], AsyncIterator[str]]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.audio = audio
+        self.filename = filename
+        self.vad = vad
+        self.enhance = enhance
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.segments = 0
+        self.segments_done = 0
+        self.sent_seconds = 0.0  # Audio delivered to ASR so far, across segments
+        self.sentences: List[dict] = []
+        self.enhanced_text = None
+        self._segment_sentences: Dict[int, List[dict]] = {}
+        self._next_flush = 0
+        self.duration = audio.duration
+
+    @property
+    def text(self) -> str:
+        return "".join(sentence["text"] for sentence in self.sentences)
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "duration": round(self.duration, 2),
+            "progress": round(min(1.0, self.sent_seconds / self.duration), 3) if self.duration else 1.0,
+            "segments": self.segments,
+            "segments_done": self.segments_done,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.started_at and self.finished_at:
+            data["realtime_factor"] = round(self.duration / max(1e-6, self.finished_at - self.started_at), 1)
+        if include_result:
+            data["text"] = self.text
+            data["sentences"] = self.sentences
+            data["enhanced_text"] = self.enhanced_text
+        return data
+
+
+class BatchTranscriber:
+    """
+    Job queue that transcribes uploaded recordings much faster than real time.
+
+    Each file is cut at quiet points into segments of about `segment_seconds`;
+    up to `parallel_segments` segments per job are streamed to Tencent at once,
+    each in `packet_ms` packets paced at `speed` times real time. Sessions come
+    from the shared ASRSessionManager, so batch work counts against the same
+    session cap as live recordings (and gets the same reconnect handling). At
+    most `max_jobs` jobs run at once and `max_queued` more may wait; beyond
+    that `submit` raises BatchQueueFullError.
+
+    `handlers` may contain "on_status" (job) and "on_sentence" (job, sentence)
+    coroutines, called as the job progresses; sentences are reported in order.
+    """
+
+    def __init__(self, sessions: ASRSessionManager, dsp: DSPExecutor, max_jobs: int = 2, max_queued: int = 20,
+                 parallel_segments: int = 4, segment_seconds: float = 300.0, speed: float = 4.0,
+                 packet_ms: int = 200, final_timeout: float = 60.0, keep_finished: int = 100,
+                 handlers: Optional[Dict[str, Callable[..., Awaitable[None]]]] = None):
+        self.sessions = sessions
+        self.dsp = dsp
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self.parallel_segments = parallel_segments
+        self.segment_seconds = segment_seconds
+        self.speed = speed
+        self.packet_ms = packet_ms
+        self.final_timeout = final_timeout
+        self.keep_finished = keep_finished
+        self.handlers = handlers or {}
+        self._slots = asyncio.Semaphore(max_jobs)
+        self._jobs: "OrderedDict[str, TranscriptionJob]" = OrderedDict()
+        self._tasks = set()
+        self.waiting = 0
+        self.running = 0
+
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.audio_seconds = 0.0
+
+    def submit(self, audio: AudioFile, filename: str = "", vad: bool = False,
+               enhance: Optional[Callable[[str], AsyncIterator[str]]] = None) -> TranscriptionJob:
+        """
+        Queues `audio` for transcription and returns its job; takes ownership of `audio`.
+        """
+        if self.waiting >= self.max_queued:
+            self.rejected += 1
+            BATCH_JOBS.inc(status="rejected")
+            audio.close()
+            raise BatchQueueFullError("Too many batch transcription jobs are queued")
+        job = TranscriptionJob(audio, filename, vad, enhance)
+        self._jobs[job.job_id] = job
+        self.submitted += 1
+        self.waiting += 1
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        return self._jobs.get(job_id)
+
+    async def _emit(self, event_type: str, *args):
+        handler = self.handlers.get(event_type)
+        if handler:
+            try:
+                await handler(*args)
+            except Exception as e:
+                logger.warning(f"Batch {event_type} handler failed: {e}")
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    async def _run(self, job: TranscriptionJob):
+        await self._emit("on_status", job)
+        started = False
+        try:
+            async with self._slots:
+                self.waiting -= 1
+                started = True
+                self.running += 1
+                try:
+                    await self._transcribe(job)
+                finally:
+                    self.running -= 1
+        except asyncio.CancelledError:
+            job.status, job.error = "failed", "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {job.job_id} failed: {e}", exc_info=True)
+            job.status, job.error = "failed", str(e)
+        finally:
+            if not started:
+                self.waiting -= 1
+            job.audio.close()
+            job.finished_at = time.time()
+            if job.status == "finished":
+                self.completed += 1
+                self.audio_seconds += job.duration
+                BATCH_REALTIME_FACTOR.observe(job.duration / max(1e-6, job.finished_at - job.started_at))
+            else:
+                self.failed += 1
+            BATCH_JOBS.inc(status=job.status)
+            await self._emit("on_status", job)
+            self._prune()
+
+    async def _transcribe(self, job: TranscriptionJob):
+        job.status = "transcribing"
+        job.started_at = time.time()
+        points = await asyncio.to_thread(job.audio.find_split_points, self.segment_seconds)
+        job.segments = len(points) - 1
+        await self._emit("on_status", job)
+
+        limit = asyncio.Semaphore(self.parallel_segments)
+
+        async def run_segment(index):
+            async with limit:
+                await self._transcribe_segment(job, index, points[index], points[index + 1])
+
+        tasks = [asyncio.create_task(run_segment(i)) for i in range(job.segments)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        logger.info(f"Batch job {job.job_id}: {job.duration:.0f} s of audio transcribed in "
+                    f"{time.time() - job.started_at:.1f} s ({job.segments} segments)")
+
+        if job.enhance is not None and job.sentences:
+            job.status = "enhancing"
+            await self._emit("on_status", job)
+            job.enhanced_text = "".join([chunk async for chunk in job.enhance(job.text)])
+        job.status = "finished"
+
+    async def _transcribe_segment(self, job: TranscriptionJob, index: int, start_frame: int, end_frame: int):
+        audio = job.audio
+        offset_ms = start_frame * 1000 // audio.sample_rate
+        sentences = []
+        done = asyncio.Event()
+        finished = False
+        failure = []
+
+        async def on_result(data):
+            nonlocal finished
+            result = data.get("result", {})
+            text = result.get("voice_text_str", "")
+            if result.get("slice_type") == 2 and text:
+                sentences.append({
+                    "start_ms": offset_ms + result.get("start_time", 0),
+                    "end_ms": offset_ms + result.get("end_time", 0),
+                    "text": text,
+                })
+            if data.get("final") == 1:
+                finished = True
+                done.set()
+
+        async def on_error(data):
+            failure.append(data.get("message", "ASR error"))
+
+        async def on_close(data):
+            failure.append(data.get("error") or "ASR connection closed")
+            done.set()
+
+        session = await self.sessions.open_session({"on_result": on_result, "on_error": on_error, "on_close": on_close})
+        processor = AudioProcessor(source_sample_rate=audio.sample_rate)
+        processor.reset(vad=job.vad)
+        needs_dsp = audio.channels > 1 or processor.needs_processing(audio.sample_rate)
+        # Backpressure instead of dropping: "pause" blocks the reader while the paced sender catches up
+        queue = AudioSendQueue(packet_ms=self.packet_ms, max_packet_ms=self.packet_ms,
+                               max_buffer_ms=4 * self.packet_ms, overflow="pause",
+                               realtime_factor=self.speed, burst_ms=self.packet_ms)
+
+        async def send(packet):
+            # While the session reconnects, hold packets back rather than overfill its replay buffer
+            while not session.upstream_ready and not session.closed:
+                await asyncio.sleep(0.05)
+            await session.send_audio(packet)
+
+        chunk_frames = audio.sample_rate * self.packet_ms // 1000
+        try:
+            queue.start(send)
+            for position in range(start_frame, end_frame, chunk_frames):
+                frames = min(chunk_frames, end_frame - position)
+                payload = audio.read(position, position + frames)
+                if needs_dsp:
+                    pcm = await self.dsp.run(_prepare_chunk, processor, payload, audio.channels, audio.sample_rate)
+                else:
+                    pcm = payload
+                if pcm:
+                    await queue.put(pcm)
+                del payload, pcm  # Views into the mapped file must not outlive it
+                job.sent_seconds += frames / audio.sample_rate
+                if done.is_set():
+                    break  # The session gave up reconnecting
+            if not done.is_set():
+                await queue.flush()
+                await session.send_end_frame()
+                await asyncio.wait_for(done.wait(), self.final_timeout)
+        finally:
+            await queue.stop()
+            await session.close()
+        if not finished:
+            raise RuntimeError(f"Segment {index} failed: {failure[-1] if failure else 'no final result'}")
+
+        job._segment_sentences[index] = sentences
+        job.segments_done += 1
+        # Report sentences in order, as soon as every earlier segment is done
+        while job._next_flush in job._segment_sentences:
+            for sentence in job._segment_sentences.pop(job._next_flush):
+                sentence["index"] = len(job.sentences)
+                job.sentences.append(sentence)
+                await self._emit("on_sentence", job, sentence)
+            job._next_flush += 1
+
+    def stats(self, include_jobs: bool = False) -> dict:
+        stats = {
+            "max_jobs": self.max_jobs,
+            "max_queued": self.max_queued,
+            "parallel_segments": self.parallel_segments,
+            "speed": self.speed,
+            "running": self.running,
+            "waiting": self.waiting,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "audio_seconds": round(self.audio_seconds, 1),
+        }
+        if include_jobs:
+            stats["jobs"] = [job.to_dict(include_result=False) for job in self._jobs.values()]
+        return stats
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
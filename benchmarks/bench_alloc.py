@@ -0,0 +1,141 @@
+"""
+Benchmark: memory behaviour of the audio ingest path over a long recording.
+
+Feeds framed 48kHz PCM (85 ms frames, as sent by the AudioWorklet client)
+through unpack_frame -> process_payload -> AudioSendQueue -> ASR session sink
+(replay buffer + incremental WAV recording), without a network. Reports the
+transient bytes allocated per frame, how much live Python memory the session
+accumulates, and the process RSS over simulated time. Run from the repository root:
+    python benchmarks/bench_alloc.py --minutes 120 --vad
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_processor import FRAME_HEADER, FRAME_MAGIC, AudioProcessor, WavWriter  # noqa: E402
+from tencent_asr_client import AudioReplayBuffer, AudioSendQueue  # noqa: E402
+
+SOURCE_RATE = 48000
+FRAME_SAMPLES = 4096  # 85 ms at 48kHz
+
+
+class SessionSink:
+    """
+    Stands in for ASRSession.send_audio: keeps the replay window and records the session.
+    """
+
+    def __init__(self, path):
+        self.replay = AudioReplayBuffer()
+        self.recorder = WavWriter(path)
+
+    async def send_audio(self, packet):
+        self.replay.append(packet)
+        self.recorder.write(packet)
+
+
+def make_frames(count=64):
+    # Speech-like bursts with pauses, so VAD both keeps and drops audio
+    rng = np.random.default_rng(0)
+    t = np.arange(FRAME_SAMPLES * count) / SOURCE_RATE
+    envelope = (np.sin(2 * np.pi * 0.4 * t) > 0).astype(np.float64)
+    signal = (8000 * np.sin(2 * np.pi * 220 * t) * envelope + 50 * rng.standard_normal(t.size)).astype(np.int16)
+    return [bytearray(FRAME_HEADER.size) + signal[i:i + FRAME_SAMPLES].tobytes()
+            for i in range(0, signal.size, FRAME_SAMPLES)]
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+async def run_session(frames, total_frames, vad, path, on_frame):
+    processor = AudioProcessor(source_sample_rate=SOURCE_RATE)
+    processor.reset(framed=True, vad=vad)
+    sink = SessionSink(path)
+    queue = AudioSendQueue(realtime_factor=1e6)  # No pacing: measure the copies, not the clock
+    queue.start(sink.send_audio)
+    try:
+        for i in range(total_frames):
+            frame = frames[i % len(frames)]
+            FRAME_HEADER.pack_into(frame, 0, FRAME_MAGIC, i, SOURCE_RATE, i * 85)
+            payload, sample_rate = processor.unpack_frame(frame)
+            pcm = processor.process_payload(payload, sample_rate)
+            if pcm:
+                await queue.put(pcm)
+            await asyncio.sleep(0)  # Let the sender drain the queue
+            on_frame(i)
+        await queue.flush()
+    finally:
+        await queue.stop()
+        sink.recorder.close()
+    return sink.recorder.frames
+
+
+def measure_allocations(frames, total_frames, vad, path, warmup):
+    # Peak bytes allocated on top of the live set while one frame is ingested
+    transient = []
+    live = {}
+
+    def on_frame(i):
+        current, peak = tracemalloc.get_traced_memory()
+        if i >= warmup:
+            transient.append(peak - live.get("before", current))
+        if i == warmup:
+            live["start"] = current
+        live["end"] = current
+        tracemalloc.reset_peak()
+        live["before"], _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.start()
+    asyncio.run(run_session(frames, total_frames, vad, path, on_frame))
+    tracemalloc.stop()
+    return np.mean(transient), live["end"] - live["start"]
+
+
+def measure_rss(frames, total_frames, vad, path, samples):
+    every = max(1, total_frames // samples)
+    rss = []
+
+    def on_frame(i):
+        if i % every == 0:
+            rss.append((i, rss_bytes()))
+
+    start = time.perf_counter()
+    recorded = asyncio.run(run_session(frames, total_frames, vad, path, on_frame))
+    return rss, recorded, time.perf_counter() - start
+
+
+def main(args):
+    frames = make_frames()
+    frame_seconds = FRAME_SAMPLES / SOURCE_RATE
+    total_frames = int(args.minutes * 60 / frame_seconds)
+    alloc_frames = min(total_frames, int(args.alloc_minutes * 60 / frame_seconds))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.wav")
+        per_frame, growth = measure_allocations(frames, alloc_frames, args.vad, path, warmup=200)
+        rss, recorded, elapsed = measure_rss(frames, total_frames, args.vad, path, args.samples)
+        wav_bytes = os.path.getsize(path)
+
+    print(f"{args.minutes:g} min session, {FRAME_SAMPLES} samples/frame at {SOURCE_RATE} Hz, VAD {'on' if args.vad else 'off'}")
+    print(f"  transient allocation {per_frame / 1024:.1f} KiB/frame; live memory grew "
+          f"{growth / 2 ** 20:.2f} MiB over {alloc_frames * frame_seconds / 60:.1f} min")
+    print(f"  ingest {elapsed / total_frames * 1e6:.0f} us/frame, recorded {recorded / 16000 / 60:.1f} min "
+          f"({wav_bytes / 2 ** 20:.0f} MiB WAV)")
+    print("  RSS: " + ", ".join(f"{i * frame_seconds / 60:.0f} min {value / 2 ** 20:.1f} MiB" for i, value in rss))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=120.0, help="Simulated session length for the RSS run")
+    parser.add_argument("--alloc-minutes", type=float, default=5.0, help="Session length traced with tracemalloc")
+    parser.add_argument("--samples", type=int, default=6, help="RSS samples over the session")
+    parser.add_argument("--vad", action="store_true")
+    main(parser.parse_args())
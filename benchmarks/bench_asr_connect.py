@@ -0,0 +1,76 @@
+"""
+Benchmark: time from start_recording to "connected" and to the first partial
+result, with and without the warm TencentASRConnectionPool.
+
+Runs offline against the fake ASR server. Run from the repository root:
+    python benchmarks/bench_asr_connect.py --handshake-delay 0.15
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_asr_server import FakeTencentASRServer  # noqa: E402
+from tencent_asr_client import TencentASRClient, TencentASRConnectionPool  # noqa: E402
+
+APP_ID, SECRET_ID, SECRET_KEY = "1250000000", "fake-secret-id", "fake-secret-key"
+FRAME = b"\x00\x00" * 3200  # 200 ms of 16 kHz PCM
+
+
+async def measure(acquire, rounds):
+    connected, first_partial = [], []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        client = await acquire()
+        connected.append(time.perf_counter() - start)
+
+        got_partial = asyncio.Event()
+
+        async def on_result(data):
+            if data.get("result"):
+                got_partial.set()
+
+        client.register_handler("on_result", on_result)
+        await client.send_audio(FRAME)
+        await got_partial.wait()
+        first_partial.append(time.perf_counter() - start)
+        await client.close()
+        # Users do not press record back-to-back; give the pool time to refill
+        await asyncio.sleep(0.3)
+    return connected, first_partial
+
+
+def report(name, connected, first_partial):
+    print(f"{name:>8}: connected p50 {statistics.median(connected) * 1000:7.1f} ms, "
+          f"first partial p50 {statistics.median(first_partial) * 1000:7.1f} ms, "
+          f"max {max(first_partial) * 1000:7.1f} ms")
+
+
+async def main(args):
+    async with FakeTencentASRServer(secret_key=SECRET_KEY, handshake_delay=args.handshake_delay) as server:
+        async def connect_new():
+            client = TencentASRClient(APP_ID, SECRET_ID, SECRET_KEY, base_url=server.base_url)
+            await client.connect()
+            return client
+
+        report("direct", *await measure(connect_new, args.rounds))
+
+        pool = TencentASRConnectionPool(APP_ID, SECRET_ID, SECRET_KEY, size=2, base_url=server.base_url)
+        pool.start()
+        await asyncio.sleep(args.handshake_delay * 2 + 0.1)
+        report("pooled", *await measure(pool.acquire, args.rounds))
+        print(f"pool stats: {pool.stats()}")
+        await pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--handshake-delay", type=float, default=0.15,
+                        help="Simulated signing + TLS + handshake time of the real service, in seconds")
+    asyncio.run(main(parser.parse_args()))
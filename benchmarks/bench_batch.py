@@ -0,0 +1,99 @@
+"""
+Benchmark: /api/v1/transcribe on a long synthetic recording, offline against
+the fake Tencent ASR server. Reports wall time, speed relative to real time and
+the server's peak RSS. Uploads are memory-mapped and streamed, so RSS only grows
+by the mapped file pages (page cache, released under memory pressure), not by
+copies of the audio. Run from the repository root:
+    python benchmarks/bench_batch.py --minutes 60 --parallel 4 --speed 4
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import ProcessMonitor, wait_for_http  # noqa: E402
+
+
+def write_recording(path, minutes, sample_rate):
+    # Noise bursts with pauses, written a minute at a time so the benchmark itself stays small
+    rng = np.random.default_rng(0)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        for minute in range(int(np.ceil(minutes))):
+            t = np.arange(sample_rate * 60) / sample_rate + minute * 60
+            envelope = (np.sin(2 * np.pi * 0.3 * t) > -0.3).astype(np.float32)
+            wav.writeframes((rng.standard_normal(t.size) * 4000 * envelope).astype(np.int16).tobytes())
+
+
+async def transcribe(base_url, path):
+    async with httpx.AsyncClient(base_url=base_url, timeout=600.0) as client:
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            response = await client.post("/api/v1/transcribe", files={"file": ("recording.wav", f, "audio/wav")})
+        response.raise_for_status()
+        uploaded = time.perf_counter() - start
+        job_id = response.json()["job_id"]
+        while True:
+            job = (await client.get(f"/api/v1/transcribe/{job_id}")).json()
+            if job["status"] in ("finished", "failed"):
+                return job, uploaded, time.perf_counter() - start
+            await asyncio.sleep(0.5)
+
+
+def main(args):
+    asr_port, port = args.port + 1, args.port
+    env = dict(os.environ, LOG_LEVEL="WARNING", BATCH_PARALLEL_SEGMENTS=str(args.parallel),
+               BATCH_SPEED=str(args.speed), BATCH_SEGMENT_SECONDS=str(args.segment_seconds))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "recording.wav")
+        write_recording(path, args.minutes, args.sample_rate)
+        fake_asr = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_asr_server.py"),
+                                     "--port", str(asr_port)],
+                                    cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        server = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "serve_offline.py"), "--port", str(port),
+                                   "--asr-url", f"ws://127.0.0.1:{asr_port}/asr/v2/"],
+                                  cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            asyncio.run(wait_for_http(base_url + "/api/v1/stats/dsp"))
+            monitor = ProcessMonitor(server.pid)
+            baseline_rss = monitor.rss_bytes()
+            monitor.start()
+            job, uploaded, elapsed = asyncio.run(transcribe(base_url, path))
+            monitor.stop()
+        finally:
+            server.terminate()
+            fake_asr.terminate()
+            server.wait()
+            fake_asr.wait()
+
+    audio_seconds = job["duration"]
+    print(f"{args.minutes:g} min of {args.sample_rate} Hz audio ({os.cpu_count()} cores), "
+          f"{args.parallel} parallel segments at {args.speed:g}x: {job['status']} {job.get('error') or ''}")
+    print(f"  upload {uploaded:.1f} s, total {elapsed:.1f} s -> {audio_seconds / elapsed:.1f}x real time, "
+          f"{job['segments']} segments, {len(job['sentences'])} sentences")
+    print(f"  server RSS {baseline_rss / 2 ** 20:.0f} MiB idle, {monitor.peak_rss / 2 ** 20:.0f} MiB peak")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--speed", type=float, default=4.0)
+    parser.add_argument("--segment-seconds", type=float, default=300.0)
+    parser.add_argument("--port", type=int, default=3306)
+    main(parser.parse_args())
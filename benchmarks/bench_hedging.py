@@ -0,0 +1,109 @@
+"""
+Benchmark: client-side time to first chunk with and without hedged LLM requests.
+
+Both fake providers have a log-normal time to first token with occasional
+stalls (and optionally errors), like a congested upstream API. Every request
+uses a distinct text, so the response cache never answers. Reports TTFT
+percentiles and how many extra upstream requests hedging cost. Run from the
+repository root:
+    python benchmarks/bench_hedging.py --requests 400 --stall-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+PRIMARY, BACKUP = "deepseek-chat", "gpt-4o-mini"
+
+
+def make_backend(args, rng):
+    from fake_llm import FakeLLMProcessor
+
+    class FlakyLLMProcessor(FakeLLMProcessor):
+        # Samples a fresh first-token latency (and failure) for every request
+        @property
+        def first_token_latency(self):
+            if rng.random() < args.error_rate:
+                raise RuntimeError("simulated upstream error")
+            if rng.random() < args.stall_rate:
+                return rng.uniform(args.stall_seconds / 2, args.stall_seconds)
+            return rng.lognormvariate(np.log(args.median_ttft), 0.3)
+
+        @first_token_latency.setter
+        def first_token_latency(self, value):
+            pass
+
+    backends = {}
+
+    def factory(provider, model_name):
+        backends[model_name] = FlakyLLMProcessor(default_model=model_name, tokens_per_second=400)
+        return backends[model_name]
+    return factory, backends
+
+
+async def run(args, hedge):
+    os.environ["LLM_HEDGE_MODELS"] = BACKUP if hedge else ""
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency * 2)
+    os.environ["LLM_CACHE_MAX_ENTRIES"] = "0"
+    for name in [m for m in sys.modules if m in ("llm_processor", "fake_llm")]:
+        del sys.modules[name]
+    import llm_processor
+
+    factory, backends = make_backend(args, random.Random(1))
+    llm_processor.set_llm_backend(factory)
+    slots = asyncio.Semaphore(args.concurrency)
+    ttfts, errors = [], 0
+
+    async def request(i):
+        nonlocal errors
+        async with slots:
+            start = time.perf_counter()
+            try:
+                processor = llm_processor.get_llm_processor(PRIMARY)
+                async for _ in processor.process_text(f"request {i}: " + "transcript text " * 20, "prompt"):
+                    ttfts.append(time.perf_counter() - start)
+                    break
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(*(request(i) for i in range(args.requests)))
+    calls = {model: backend.calls for model, backend in backends.items()}
+    stats = llm_processor.get_llm_hedging_stats()
+    await llm_processor.close_llm_processors()
+    return np.array(ttfts), errors, calls, stats
+
+
+def main(args):
+    print(f"{args.requests} requests, {args.concurrency} concurrent; median TTFT {args.median_ttft}s, "
+          f"{args.stall_rate:.0%} stalls up to {args.stall_seconds}s, {args.error_rate:.0%} errors")
+    for hedge in (False, True):
+        ttfts, errors, calls, stats = asyncio.run(run(args, hedge))
+        p50, p95, p99 = (np.percentile(ttfts, q) * 1000 for q in (50, 95, 99))
+        extra = sum(calls.values()) / args.requests - 1
+        line = (f"{'hedged' if hedge else 'single':>7}: TTFT p50 {p50:6.0f} ms, p95 {p95:6.0f} ms, "
+                f"p99 {p99:6.0f} ms, failed {errors}, upstream calls {calls} (+{extra:.1%})")
+        if hedge:
+            hedged = stats["hedged"][PRIMARY]
+            line += (f"\n         hedge delay {hedged['hedge_delay_ms']:.0f} ms, hedged {hedged['hedged']}, "
+                     f"hedge won {hedged['hedge_wins']}, failovers {hedged['failovers']}, "
+                     f"over budget {hedged['budget_exhausted']}")
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=40)
+    parser.add_argument("--median-ttft", type=float, default=0.4)
+    parser.add_argument("--stall-rate", type=float, default=0.05)
+    parser.add_argument("--stall-seconds", type=float, default=6.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    main(parser.parse_args())
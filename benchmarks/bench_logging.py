@@ -0,0 +1,124 @@
+"""
+Benchmark: cost of logging on the event-loop thread, before and after the queued
+logging pipeline.
+
+Replays the hot-path log traffic of a busy server: ASR results (many per second
+per session) and LLM calls with long prompts. "before" logs every result and the
+full prompt through a synchronous handler, as the server used to; "after" routes
+records through logging_config.setup_logging with sampled results and summarized
+prompts; "queued" sends the old, unsampled traffic through the queue, to separate
+the two effects. Each mode writes to a file and to a "slow" sink whose writes
+stall for 2 ms, like a blocked pipe or a busy disk. Run from the repository root:
+    python benchmarks/bench_logging.py
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_config import TEXT_FORMAT, LogSampler, setup_logging, shutdown_logging, summarize_text  # noqa: E402
+
+
+class SlowStream(io.TextIOBase):
+    """
+    A stream whose writes stall, standing in for a blocked stderr pipe or slow disk.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.bytes = 0
+
+    def write(self, data):
+        time.sleep(self.delay)
+        self.bytes += len(data)
+        return len(data)
+
+
+def make_events(results: int, prompt_every: int, prompt_chars: int):
+    sentence = "今天我们讨论一下下个季度的产品规划以及市场推广的具体安排"
+    prompt = ("请将以下语音转录整理为通顺的书面文字。" + sentence * (prompt_chars // len(sentence)))[:prompt_chars]
+    events = []
+    for i in range(results):
+        events.append(("result", sentence[:5 + i % len(sentence)]))
+        if i % prompt_every == 0:
+            events.append(("prompt", prompt))
+    return events
+
+
+def replay(logger, events, mode):
+    sampler = LogSampler(every=50, interval=5.0)
+    latencies = np.empty(len(events))
+    for i, (kind, text) in enumerate(events):
+        start = time.perf_counter()
+        if mode in ("before", "queued"):
+            if kind == "result":
+                logger.info(f"Handled ASR result: {text}")
+            else:
+                logger.info(f"Prompt: {text}")
+        else:
+            if kind == "result":
+                if sampler.should_log():
+                    logger.info(f"ASR result ({sampler.take_suppressed()} results not logged): {summarize_text(text)}")
+            else:
+                logger.info(f"Using model: deepseek-chat for processing, prompt {summarize_text(text)}")
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def run(mode, sink_name, stream, events):
+    root = logging.getLogger()
+    handler = None
+    if mode == "before":
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        handler = setup_logging(logging.INFO, stream=stream)
+
+    logger = logging.getLogger("bench")
+    start = time.perf_counter()
+    latencies = replay(logger, events, mode)
+    elapsed = time.perf_counter() - start
+    if mode != "before":
+        shutdown_logging()
+    else:
+        handler.flush()
+    dropped = getattr(handler, "dropped", 0)
+    print(f"{mode:6s} {sink_name:4s}: {elapsed / len(events) * 1e6:8.1f} us/event on the caller, "
+          f"p99 {np.percentile(latencies, 99) * 1e6:8.1f} us, max {latencies.max() * 1e3:6.2f} ms, "
+          f"dropped {dropped}")
+
+
+def main(args):
+    events = make_events(args.results, args.prompt_every, args.prompt_chars)
+    print(f"{len(events)} events: {args.results} ASR results, a {args.prompt_chars}-char prompt "
+          f"every {args.prompt_every} results")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("before", "queued", "after"):
+            path = os.path.join(tmp, f"{mode}.log")
+            with open(path, "w", encoding="utf-8") as stream:
+                run(mode, "file", stream, events)
+            print(f"{'':13s}{os.path.getsize(path) / 1024:8.1f} KiB written")
+    for mode in ("before", "queued", "after"):
+        slow = SlowStream(args.slow_ms / 1000)
+        run(mode, "slow", slow, events[:args.slow_events])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=20000)
+    parser.add_argument("--prompt-every", type=int, default=200)
+    parser.add_argument("--prompt-chars", type=int, default=20000)
+    parser.add_argument("--slow-ms", type=float, default=2.0, help="Stall per write of the slow sink")
+    parser.add_argument("--slow-events", type=int, default=2000)
+    main(parser.parse_args())
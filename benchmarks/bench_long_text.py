@@ -0,0 +1,66 @@
+"""
+Benchmark: single-call vs. chunked (map and map-reduce) processing of a long
+transcript against the fake LLM. Run from the repository root:
+    python benchmarks/bench_long_text.py --chars 40000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm import FakeLLMProcessor  # noqa: E402
+from llm_processor import ChunkedProcessor, estimate_tokens  # noqa: E402
+from prompts import PROMPTS  # noqa: E402
+
+
+def make_transcript(chars: int) -> str:
+    sentence = "今天我们讨论了下一季度的产品规划和预算安排。"
+    paragraph = sentence * 8
+    paragraphs = []
+    while sum(len(p) for p in paragraphs) < chars:
+        paragraphs.append(paragraph)
+    return "\n\n".join(paragraphs)
+
+
+async def run(name, processor, text, prompt):
+    start = time.perf_counter()
+    first = None
+    output = []
+    async for chunk in processor.process_text(text, prompt):
+        if first is None:
+            first = time.perf_counter() - start
+        output.append(chunk)
+    total = time.perf_counter() - start
+    print(f"{name:>12}: first chunk {first:6.2f} s, total {total:6.2f} s, output {len(''.join(output))} chars")
+
+
+async def main(args):
+    text = make_transcript(args.chars)
+    print(f"transcript: {len(text)} chars, ~{estimate_tokens(text)} tokens")
+
+    fake = FakeLLMProcessor(first_token_latency=args.ttft, tokens_per_second=args.tps)
+    await run("single", fake, text, PROMPTS['readability-enhance'])
+
+    chunked = ChunkedProcessor(fake, max_chunk_tokens=args.chunk_tokens, max_parallel=args.parallel)
+    await run("chunked", chunked, text, PROMPTS['readability-enhance'])
+    print(f"{'':>12}  {fake.calls - 1} calls, max {fake.max_concurrent} concurrent")
+
+    summarizer = FakeLLMProcessor(first_token_latency=args.ttft, tokens_per_second=args.tps, max_output_chars=100)
+    await run("single-sum", summarizer, text, PROMPTS['correctness-check'])
+    map_reduce = ChunkedProcessor(summarizer, max_chunk_tokens=args.chunk_tokens, max_parallel=args.parallel,
+                                  map_prompt=PROMPTS['chunk-summary'])
+    await run("map-reduce", map_reduce, text, PROMPTS['correctness-check'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chars", type=int, default=40000)
+    parser.add_argument("--chunk-tokens", type=int, default=3000)
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.5, help="Fake time to first token, seconds")
+    parser.add_argument("--tps", type=float, default=2000.0, help="Fake output tokens per second")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+"""
+Benchmark: server CPU to decode Opus uploads (opus_framed) into 16 kHz PCM,
+versus the upload bandwidth saved compared with raw PCM. Needs PyAV (`pip install av`).
+
+Run from the repository root:
+    python benchmarks/bench_opus.py --bitrate 24000
+"""
+import argparse
+import os
+import sys
+import time
+
+import av
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_processor import FRAME_HEADER, OPUS_FRAME_MAGIC, AudioProcessor  # noqa: E402
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 320  # 20 ms, the browser AudioEncoder default
+
+
+def make_speechlike(seconds: float) -> np.ndarray:
+    # Amplitude-modulated harmonics with noise, so the encoder has real work to do
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    signal = 0.2 * envelope * voiced + 0.01 * rng.standard_normal(len(t))
+    return (signal * 32767).clip(-32768, 32767).astype(np.int16)
+
+
+def encode(pcm: np.ndarray, bitrate: int) -> list:
+    encoder = av.CodecContext.create("libopus", "w")
+    encoder.sample_rate = SAMPLE_RATE
+    encoder.layout = "mono"
+    encoder.format = "s16"
+    encoder.bit_rate = bitrate
+    encoder.open()
+
+    frames = []
+    for sequence, start in enumerate(range(0, len(pcm) - FRAME_SAMPLES + 1, FRAME_SAMPLES)):
+        frame = av.AudioFrame.from_ndarray(pcm[start:start + FRAME_SAMPLES].reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = SAMPLE_RATE
+        frame.pts = start
+        for packet in encoder.encode(frame):
+            frames.append(bytes(packet))
+    for packet in encoder.encode(None):
+        frames.append(bytes(packet))
+    return [FRAME_HEADER.pack(OPUS_FRAME_MAGIC, i, SAMPLE_RATE, i * 20) + p for i, p in enumerate(frames)]
+
+
+def main(args):
+    pcm = make_speechlike(args.seconds)
+    frames = encode(pcm, args.bitrate)
+    opus_bytes = sum(len(f) for f in frames)
+
+    processor = AudioProcessor()
+    best = float("inf")
+    for _ in range(args.repeat):
+        processor.reset(framed=True, codec="opus")
+        start = time.process_time()
+        out = 0
+        for frame in frames:
+            out += len(processor.process_audio_chunk(frame))
+        best = min(best, time.process_time() - start)
+
+    cpu_per_second = best / args.seconds
+    print(f"audio: {args.seconds:.0f} s, {len(frames)} Opus frames, decoded {out // 2} samples")
+    print(f"decode + resample CPU: {cpu_per_second * 1000:.2f} ms per second of audio "
+          f"({cpu_per_second * 100:.2f}% of one core per stream, ~{int(1 / cpu_per_second)} streams per core)")
+    opus_kbps = opus_bytes * 8 / args.seconds / 1000
+    for name, rate in (("16 kHz PCM", 16000), ("48 kHz PCM", 48000)):
+        pcm_kbps = rate * 16 / 1000
+        print(f"upload vs {name}: {opus_kbps:.1f} kbps instead of {pcm_kbps:.0f} kbps "
+              f"({pcm_kbps / opus_kbps:.1f}x less)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--bitrate", type=int, default=24000)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,106 @@
+"""
+Benchmark: server import time and time to first request, with and without warm-up.
+
+Imports realtime_server in fresh interpreters (median wall time, plus the slowest
+modules it imports directly, from `python -X importtime`), then starts the server
+as a subprocess and times how long it takes to answer its first HTTP request and
+how long the background warm-up (WARMUP=true) takes to finish. ASR points at a closed
+port, so no network or real credentials are needed. Run from the repository root:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV = dict(os.environ, TENCENT_APP_ID="1250000000", TENCENT_SECRET_ID="fake-secret-id",
+           TENCENT_SECRET_KEY="fake-secret-key", DEEPSEEK_API_KEY="unused",
+           TENCENT_ASR_BASE_URL="ws://127.0.0.1:9/asr/v2/", LOG_LEVEL="ERROR")
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import realtime_server; print(time.perf_counter() - t)"
+
+
+def import_seconds():
+    result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=ENV,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(count):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import realtime_server"], cwd=ROOT, env=ENV,
+                            capture_output=True, text=True, check=True)
+    # Lines look like "import time:  self [us] | cumulative | <2 spaces per level>name"
+    direct = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| {3}(\S.*)$", line)
+        if match:
+            direct.append((int(match.group(1)) / 1e6, match.group(2)))
+    return sorted(direct, reverse=True)[:count]
+
+
+def get_json(url, timeout=1.0):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def start_server(port, warmup):
+    env = dict(ENV, PORT=str(port), WARMUP="true" if warmup else "false")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "realtime_server.py"], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with code {process.returncode}")
+            try:
+                request_start = time.perf_counter()
+                get_json(f"{base}/api/v1/stats/dsp")
+                first_response = time.perf_counter() - start
+                first_latency = time.perf_counter() - request_start
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        warm = None
+        while warmup:
+            state = get_json(f"{base}/api/v1/stats/warmup")
+            if state["status"] in ("finished", "failed"):
+                warm = time.perf_counter() - start
+                break
+            time.sleep(0.01)
+        return first_response, first_latency, warm
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(values):
+    return f"median {statistics.median(values) * 1000:6.0f} ms, max {max(values) * 1000:6.0f} ms"
+
+
+def main(args):
+    imports = [import_seconds() for _ in range(args.runs)]
+    print(f"import realtime_server: {summary(imports)}")
+    for seconds, name in slowest_imports(args.top):
+        print(f"    {seconds * 1000:6.0f} ms  {name}")
+    for warmup in (False, True):
+        runs = [start_server(args.port, warmup) for _ in range(args.runs)]
+        line = (f"WARMUP={str(warmup).lower():<5}: first response {summary([r[0] for r in runs])}, "
+                f"first request took {statistics.median(r[1] for r in runs) * 1000:.0f} ms")
+        if warmup:
+            line += f"\n              warm-up finished {summary([r[2] for r in runs])} after start"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=3017)
+    parser.add_argument("--top", type=int, default=6, help="Slowest direct imports to list")
+    main(parser.parse_args())
@@ -0,0 +1,117 @@
+"""
+Benchmark: HTTP writes and server CPU of streamed LLM responses, with and without
+output coalescing.
+
+Starts the offline server (fake ASR + FakeLLMProcessor streaming one or two
+characters per delta, like the real providers) twice: once with
+LLM_STREAM_FLUSH_MS=0 (one HTTP chunk per delta) and once with the given flush
+window. Many clients then read /api/v1/ask_ai/stream concurrently over raw
+HTTP/1.1, so every chunk the server writes is counted. Reports chunks and bytes
+on the wire per response, time to first byte and the server's CPU time. Streams
+slower than one delta per flush window are passed through as is, so e.g.
+--tokens-per-second 60 --chars-per-chunk 2 shows the same writes and CPU for both.
+Run from the repository root:
+    python benchmarks/bench_streaming.py --clients 100 --chars 1500
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import ProcessMonitor, wait_for_http  # noqa: E402
+
+
+async def stream_request(port, path, payload):
+    """
+    Returns (HTTP chunks, bytes received including headers and chunk framing, seconds to first body byte).
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    start = time.perf_counter()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    head = await reader.readuntil(b"\r\n\r\n")
+    if not head.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(head.split(b"\r\n", 1)[0].decode())
+    received, chunks, ttfb = len(head), 0, None
+    while True:
+        size_line = await reader.readline()
+        size = int(size_line.strip(), 16)
+        data = await reader.readexactly(size + 2)
+        received += len(size_line) + len(data)
+        if size == 0:
+            break
+        chunks += 1
+        if ttfb is None:
+            ttfb = time.perf_counter() - start
+    writer.close()
+    return chunks, received, ttfb
+
+
+async def run_clients(port, args):
+    sample = "今天的会议主要讨论了第三季度的销售目标和市场推广计划，大家一致同意加快新产品的上线节奏。"
+    text = (sample * (args.chars // len(sample) + 1))[:args.chars]
+    results = await asyncio.gather(*(
+        stream_request(port, "/api/v1/ask_ai/stream", {"text": f"{i}:{text}"}) for i in range(args.clients)
+    ))
+    return results
+
+
+def run(args, flush_ms):
+    asr_port, port = args.port + 1, args.port
+    env = dict(os.environ, LOG_LEVEL="WARNING", LLM_CACHE_MAX_ENTRIES="0", LLM_STREAM_FLUSH_MS=str(flush_ms),
+               LLM_STREAM_FLUSH_BYTES=str(args.flush_bytes), LLM_MAX_CONCURRENCY=str(args.clients))
+    fake_asr = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_asr_server.py"), "--port", str(asr_port)],
+                                cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    server = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "serve_offline.py"), "--port", str(port),
+                               "--asr-url", f"ws://127.0.0.1:{asr_port}/asr/v2/", "--first-token-latency", "0.2",
+                               "--tokens-per-second", str(args.tokens_per_second),
+                               "--chars-per-chunk", str(args.chars_per_chunk)],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_for_http(f"http://127.0.0.1:{port}/api/v1/stats/dsp"))
+        monitor = ProcessMonitor(server.pid)
+        cpu_before = monitor.cpu_seconds()
+        start = time.perf_counter()
+        results = asyncio.run(run_clients(port, args))
+        elapsed = time.perf_counter() - start
+        cpu = monitor.cpu_seconds() - cpu_before
+    finally:
+        server.terminate()
+        fake_asr.terminate()
+        server.wait()
+        fake_asr.wait()
+    chunks, received, ttfb = (np.array(column) for column in zip(*results))
+    return chunks, received, ttfb, cpu, elapsed
+
+
+def main(args):
+    print(f"{args.clients} concurrent streams of {args.chars} characters, {args.chars_per_chunk} characters "
+          f"per delta at {args.tokens_per_second:g} tokens/s")
+    for flush_ms in (0, args.flush_ms):
+        chunks, received, ttfb, cpu, elapsed = run(args, flush_ms)
+        label = f"{flush_ms:g} ms / {args.flush_bytes} B" if flush_ms else "per delta"
+        print(f"  {label:>15}: {chunks.mean():6.0f} writes and {received.mean() / 1024:5.1f} KiB per response, "
+              f"TTFB p50 {np.percentile(ttfb, 50) * 1000:4.0f} ms, server CPU {cpu:5.2f} s "
+              f"({cpu / args.clients * 1000:.1f} ms per response), wall {elapsed:.1f} s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--chars", type=int, default=1500, help="Characters streamed back per response")
+    parser.add_argument("--chars-per-chunk", type=int, default=1)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--flush-ms", type=float, default=30.0)
+    parser.add_argument("--flush-bytes", type=int, default=256)
+    parser.add_argument("--port", type=int, default=3310)
+    main(parser.parse_args())
@@ -0,0 +1,117 @@
+"""
+Benchmark: transcript store write throughput and query latency at scale.
+
+Fills a fresh database with synthetic Chinese recordings (finalized sentences plus
+a readability output each) through the same non-blocking API the server uses, then
+times session listing (first and deep pages), session detail and full-text search
+for common, rare, multi-term and single-character queries. Run from the repository root:
+    python benchmarks/bench_transcript_store.py --sessions 20000 --segments 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_store import TranscriptStore  # noqa: E402
+
+CHARS = ("的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定"
+         "行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政")
+RARE_WORDS = ["量子计算", "碳中和", "供应链金融", "鸿蒙系统"]
+
+
+def make_vocabulary(rng, size=2000):
+    return ["".join(rng.choice(CHARS) for _ in range(rng.choice((1, 2, 2, 2, 3, 4)))) for _ in range(size)]
+
+
+def make_sentence(rng, vocabulary, weights, rare=False):
+    words = rng.choices(vocabulary, weights, k=rng.randint(6, 14))
+    if rare:
+        words.insert(rng.randrange(len(words)), rng.choice(RARE_WORDS))
+    if rng.random() < 0.1:
+        words.append(rng.choice(["DeepSeek", "API", "Q3", "KPI"]))
+    return "".join(words) + rng.choice("。，？")
+
+
+def fill(store, args, rng):
+    vocabulary = make_vocabulary(rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]  # Zipf-like word frequencies
+    enqueue_seconds, writes = 0.0, 0
+    start = time.perf_counter()
+    now = time.time() - args.sessions * 60
+    for i in range(args.sessions):
+        sentences = [make_sentence(rng, vocabulary, weights, rare=rng.random() < 0.0005) for _ in range(args.segments)]
+        t = time.perf_counter()
+        session_id = f"{i:08x}"
+        store.save_session(session_id, kind="recording", status="recording", started_at=now + i * 60, worker="bench")
+        for index, text in enumerate(sentences):
+            store.add_segment(session_id, index, text, index * 3000, index * 3000 + 2800)
+        store.add_output(session_id, "readability", "".join(sentences), model="deepseek-chat")
+        store.save_session(session_id, status="finished", ended_at=now + i * 60 + args.segments * 3)
+        enqueue_seconds += time.perf_counter() - t
+        writes += args.segments + 3
+        if i % 1000 == 999:
+            store.flush()  # Bounded queue in the benchmark process, as under a steady stream of recordings
+    store.flush()
+    return vocabulary, writes, enqueue_seconds, time.perf_counter() - start
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return np.array(samples) * 1000, result
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def main(args):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "transcripts.db")
+        store = TranscriptStore(path)
+        vocabulary, writes, enqueue_seconds, elapsed = fill(store, args, rng)
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        stats = store.stats()
+        print(f"{args.sessions} sessions x {args.segments} sentences: {stats['entries']} entries, "
+              f"{size / 2 ** 20:.0f} MiB on disk")
+        print(f"  {writes / elapsed:.0f} writes/s, {enqueue_seconds / writes * 1e6:.1f} us per write on the caller, "
+              f"{stats['written'] / stats['batches']:.0f} writes per commit")
+
+        cursor = None
+        for _ in range(args.deep_page - 1):
+            cursor = store.list_sessions(20, cursor)["next_cursor"]
+        multi_char = [word for word in vocabulary if len(word) > 1]
+        search_terms = [("rare", "量子计算"), ("two rare terms", "量子计算 碳中和"), ("latin", "deepseek"),
+                        ("frequent word", multi_char[0]), ("mid-frequency word", multi_char[200]),
+                        ("single character", CHARS[0])]
+        queries = [
+            ("list first page", lambda: store.list_sessions(20)),
+            (f"list page {args.deep_page}", lambda: store.list_sessions(20, cursor)),
+            ("session detail", lambda: store.get_session(f"{rng.randrange(args.sessions):08x}")),
+        ] + [(f"search {kind} {q!r}", lambda q=q: store.search(q, 20)) for kind, q in search_terms]
+        for name, fn in queries:
+            ms, result = timed(fn, args.repeat)
+            hits = f", {len(result['results'])} hits" if "results" in result else ""
+            print(f"  {name:<38} p50 {np.percentile(ms, 50):6.2f} ms  p99 {np.percentile(ms, 99):6.2f} ms{hits}")
+        print(f"  process RSS {rss_bytes() / 2 ** 20:.0f} MiB")
+        store.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--segments", type=int, default=20, help="Finalized sentences per session")
+    parser.add_argument("--deep-page", type=int, default=500, help="Listing page reached by following cursors")
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
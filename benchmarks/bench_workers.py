@@ -0,0 +1,141 @@
+"""
+Benchmark: audio ingest throughput of realtime_server.py with 1..N uvicorn
+workers, offline against the fake ASR server (and the fake Redis bus when
+running several workers).
+
+Every client streams legacy 48 kHz PCM as fast as the server accepts it (so
+each frame is resampled and run through the VAD), then stops the recording;
+throughput is seconds of audio ingested per wall-clock second. Afterwards every
+recording is looked up through /api/v1/sessions/{id}/events to check that
+whichever worker answers can see it. Run from the repository root:
+    python benchmarks/bench_workers.py --workers 1 2 4 --clients 16
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FRAME_SAMPLES = 4096  # What the ScriptProcessor client sends per message
+
+
+def start_process(args, env=None):
+    return subprocess.Popen([sys.executable] + args, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_for_http(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up")
+
+
+async def run_client(url, audio, frame_bytes):
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.recv()  # idle
+        await ws.send(json.dumps({"type": "start_recording", "protocol_version": 2}))
+        session_id = None
+        while session_id is None:
+            message = json.loads(await ws.recv())
+            if message.get("type") == "error":
+                raise RuntimeError(message["content"])
+            session_id = message.get("session_id")
+
+        for i in range(0, len(audio), frame_bytes):
+            await ws.send(audio[i:i + frame_bytes])
+        await ws.send(json.dumps({"type": "stop_recording"}))
+        while json.loads(await ws.recv()).get("type") != "vad_stats":
+            pass
+        return session_id
+
+
+def client_process(url, clients, seconds, result_queue):
+    rng = np.random.default_rng(os.getpid())
+    audio = (rng.standard_normal(int(48000 * seconds)) * 3000).astype(np.int16).tobytes()
+
+    async def main():
+        return await asyncio.gather(*(run_client(url, audio, FRAME_SAMPLES * 2) for _ in range(clients)))
+
+    start = time.perf_counter()
+    session_ids = asyncio.run(main())
+    result_queue.put((time.perf_counter() - start, session_ids))
+
+
+async def check_sessions(base_url, session_ids):
+    visible = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=10.0) as client:
+        for session_id in session_ids:
+            response = await client.get(f"/api/v1/sessions/{session_id}/events")
+            visible += response.status_code == 200
+    return visible
+
+
+def run(workers, args, fake_asr_url, bus_url):
+    port = args.port
+    env = dict(os.environ, TENCENT_APP_ID="1250000000", TENCENT_SECRET_ID="fake-secret-id",
+               TENCENT_SECRET_KEY="fake-secret-key", TENCENT_ASR_BASE_URL=fake_asr_url,
+               EVENT_BUS_URL=bus_url if workers > 1 else "memory://", WORKERS=str(workers),
+               PORT=str(port), ASR_AUDIO_BUFFER_MS="500", ASR_POOL_SIZE="0")
+    env.setdefault("DEEPSEEK_API_KEY", "unused")
+    server = start_process(["realtime_server.py"], env)
+    try:
+        asyncio.run(wait_for_http(f"http://127.0.0.1:{port}/api/v1/stats/dsp"))
+        processes = max(1, min(args.client_processes, args.clients))
+        result_queue = multiprocessing.Queue()
+        procs = [multiprocessing.Process(
+            target=client_process,
+            args=(f"ws://127.0.0.1:{port}/api/v1/ws", args.clients // processes, args.seconds, result_queue)
+        ) for _ in range(processes)]
+        for proc in procs:
+            proc.start()
+        results = [result_queue.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+        elapsed = max(r[0] for r in results)
+        session_ids = [sid for r in results for sid in r[1]]
+        audio_seconds = len(session_ids) * args.seconds
+        visible = asyncio.run(check_sessions(f"http://127.0.0.1:{port}", session_ids))
+        print(f"workers {workers}: {audio_seconds / elapsed:8.1f} s audio / s "
+              f"({len(session_ids)} clients in {elapsed:.2f} s), "
+              f"{visible}/{len(session_ids)} sessions visible via the bus")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args):
+    fake_asr = start_process([os.path.join(BENCH_DIR, "fake_asr_server.py"), "--port", str(args.port + 1)])
+    fake_redis = start_process([os.path.join(BENCH_DIR, "fake_redis_server.py"), "--port", str(args.port + 2)])
+    try:
+        print(f"CPU cores: {os.cpu_count()}")
+        for workers in args.workers:
+            run(workers, args, f"ws://127.0.0.1:{args.port + 1}/asr/v2/", f"redis://127.0.0.1:{args.port + 2}/0")
+    finally:
+        fake_asr.terminate()
+        fake_redis.terminate()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=20.0, help="Audio per client")
+    parser.add_argument("--port", type=int, default=3106)
+    main(parser.parse_args())
@@ -0,0 +1,192 @@
+"""
+Local stand-in for the Tencent real-time ASR WebSocket API.
+
+It follows the parts of the protocol the server relies on: the handshake
+acknowledgement, per-slice partial results, the {"type": "end"} frame with a
+final result, voice_id uniqueness, signature checking and the idle timeout.
+
+Run standalone and point the server at it:
+    python benchmarks/fake_asr_server.py --port 8765
+    TENCENT_ASR_BASE_URL=ws://127.0.0.1:8765/asr/v2/ python realtime_server.py
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import urllib.parse
+import zlib
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_SECOND = 16000 * 2  # 16 kHz, 16-bit mono PCM
+# "Recognized" characters are picked from the audio content, so the same audio yields the same text
+CHARS = "我们今天讨论产品规划预算安排下一季度市场销售目标团队"
+
+
+class FakeTencentASRServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, secret_key: str = None,
+                 handshake_delay: float = 0.0, partial_every: float = 0.2, idle_timeout: float = 15.0,
+                 recognition_delay: float = 0.0, drop_after: float = 0.0, max_drops: int = 1):
+        self.host = host
+        self.port = port
+        self.secret_key = secret_key  # When set, signatures are verified like Tencent does
+        self.handshake_delay = handshake_delay  # Simulated signing/TLS/handshake cost
+        self.partial_every = partial_every  # Seconds of audio between partial results
+        self.idle_timeout = idle_timeout  # Tencent drops sessions without audio for 15s
+        self.recognition_delay = recognition_delay  # Simulated model latency per result
+        self.drop_after = drop_after  # Abort connections after this many seconds of audio (0: never)
+        self.max_drops = max_drops
+        self.drops = 0
+        self.seen_voice_ids = set()
+        self.connections = 0
+        self.audio_bytes = 0
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/asr/v2/"
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def _check_signature(self, path: str, params: dict) -> bool:
+        if not self.secret_key:
+            return True
+        signature = params.pop("signature", "")
+        query_string = urllib.parse.urlencode(sorted(params.items()))
+        source_string = f"{self.host}:{self.port}{path}?{query_string}"
+        expected = base64.b64encode(hmac.new(
+            self.secret_key.encode('utf-8'), source_string.encode('utf-8'), hashlib.sha1
+        ).digest()).decode('utf-8')
+        return hmac.compare_digest(signature, expected)
+
+    async def _handle(self, ws, path=None):
+        self.connections += 1
+        parsed = urllib.parse.urlparse(path or ws.path)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        voice_id = params.get("voice_id", "")
+
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+
+        if not self._check_signature(parsed.path, params):
+            await ws.send(json.dumps({"code": 4002, "message": "鉴权失败", "voice_id": voice_id}))
+            await ws.close()
+            return
+        if voice_id in self.seen_voice_ids:
+            await ws.send(json.dumps({"code": 4008, "message": "voice_id 重复", "voice_id": voice_id}))
+            await ws.close()
+            return
+        self.seen_voice_ids.add(voice_id)
+        await ws.send(json.dumps({"code": 0, "message": "success", "voice_id": voice_id}))
+
+        received = 0
+        step = int(self.partial_every * BYTES_PER_SECOND) // 2 * 2
+        pending = bytearray()
+        sentence = 0
+        sentence_start = 0
+        words = ""
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    await ws.send(json.dumps({"code": 4008, "message": "客户端数据上传超时", "voice_id": voice_id}))
+                    break
+
+                if isinstance(message, bytes):
+                    received += len(message)
+                    self.audio_bytes += len(message)
+                    pending += message
+                    if self.drop_after and self.drops < self.max_drops and received >= self.drop_after * BYTES_PER_SECOND:
+                        self.drops += 1
+                        await ws.close(code=1011, reason="simulated upstream failure")
+                        return
+                    while len(pending) >= step:
+                        words += CHARS[zlib.crc32(bytes(pending[:step])) % len(CHARS)]
+                        del pending[:step]
+                        slice_type = 1
+                        if len(words) >= 10:
+                            slice_type = 2  # Sentence finished
+                        end_ms = (received - len(pending)) * 1000 // BYTES_PER_SECOND
+                        await self._send_result(ws, voice_id, sentence, words, slice_type, sentence_start, end_ms)
+                        if slice_type == 2:
+                            sentence += 1
+                            sentence_start = end_ms
+                            words = ""
+                elif json.loads(message).get("type") == "end":
+                    if words:
+                        await self._send_result(ws, voice_id, sentence, words, 2, sentence_start,
+                                                received * 1000 // BYTES_PER_SECOND)
+                    await ws.send(json.dumps({
+                        "code": 0, "message": "success", "voice_id": voice_id, "final": 1
+                    }))
+                    break
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            await ws.close()
+
+    async def _send_result(self, ws, voice_id, index, text, slice_type, start_ms=0, end_ms=0):
+        if self.recognition_delay:
+            await asyncio.sleep(self.recognition_delay)
+        await ws.send(json.dumps({
+            "code": 0,
+            "message": "success",
+            "voice_id": voice_id,
+            "message_id": f"{voice_id}_{index}_{len(text)}",
+            "result": {
+                "slice_type": slice_type,
+                "index": index,
+                "start_time": start_ms,
+                "end_time": end_ms,
+                "voice_text_str": text,
+                "word_size": 0,
+                "word_list": []
+            },
+            "final": 0
+        }, ensure_ascii=False))
+
+
+async def _serve(args):
+    server = FakeTencentASRServer(
+        host=args.host, port=args.port, secret_key=args.secret_key, handshake_delay=args.handshake_delay,
+        partial_every=args.partial_every, recognition_delay=args.recognition_delay,
+        drop_after=args.drop_after, max_drops=args.max_drops
+    )
+    await server.start()
+    logger.info(f"Fake Tencent ASR listening on {server.base_url}")
+    await asyncio.Future()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--secret-key", default=None)
+    parser.add_argument("--handshake-delay", type=float, default=0.0)
+    parser.add_argument("--partial-every", type=float, default=0.2, help="Seconds of audio between partial results")
+    parser.add_argument("--recognition-delay", type=float, default=0.0, help="Simulated model latency per result")
+    parser.add_argument("--drop-after", type=float, default=0.0,
+                        help="Abort each connection after this many seconds of audio, to exercise reconnects")
+    parser.add_argument("--max-drops", type=int, default=1)
+    asyncio.run(_serve(parser.parse_args()))
@@ -0,0 +1,52 @@
+"""
+Offline stand-in for the LLM providers, implementing LLMProcessor.
+
+It echoes the input text back as a stream of small chunks after a configurable
+time-to-first-token, at a configurable token rate, so latency-sensitive code
+paths (chunking, caching, streaming) can be exercised without API keys.
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import AsyncGenerator, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_processor import LLMProcessor, estimate_tokens  # noqa: E402
+
+
+class FakeLLMProcessor(LLMProcessor):
+    def __init__(self, default_model: str = 'fake-llm', first_token_latency: float = 0.3,
+                 tokens_per_second: float = 50.0, chars_per_chunk: int = 4, max_output_chars: Optional[int] = None):
+        self.default_model = default_model
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.chars_per_chunk = chars_per_chunk
+        self.max_output_chars = max_output_chars  # Caps the echo, e.g. to mimic a short summary
+        self.calls = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    def _output(self, text: str) -> str:
+        return text[:self.max_output_chars] if self.max_output_chars else text
+
+    async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
+        self.calls += 1
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            await asyncio.sleep(self.first_token_latency)
+            output = self._output(text)
+            for i in range(0, len(output), self.chars_per_chunk):
+                chunk = output[i:i + self.chars_per_chunk]
+                await asyncio.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+                yield chunk
+        finally:
+            self.concurrent -= 1
+
+    def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
+        self.calls += 1
+        output = self._output(text)
+        time.sleep(self.first_token_latency + estimate_tokens(output) / self.tokens_per_second)
+        return output
@@ -0,0 +1,176 @@
+"""
+Minimal in-memory server speaking the Redis protocol (RESP2), for testing the
+Redis event bus without a Redis installation.
+
+It implements only the commands RedisEventBus uses: hashes, lists, EXPIRE and
+pub/sub. Run standalone and point the server at it:
+    python benchmarks/fake_redis_server.py --port 6390
+    EVENT_BUS_URL=redis://127.0.0.1:6390/0 WORKERS=4 python realtime_server.py
+"""
+import argparse
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class Status(str):
+    """
+    A RESP simple string reply such as +OK.
+    """
+
+
+class FakeRedisServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._data = {}
+        self._expires = {}
+        self._channels = defaultdict(set)  # channel -> writers subscribed to it
+        self._server = None
+        self.commands = 0
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # --- RESP encoding ---
+
+    @classmethod
+    def _encode(cls, value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, Status):
+            return f"+{value}\r\n".encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, Exception):
+            return f"-ERR {value}\r\n".encode()
+        if isinstance(value, (list, tuple)):
+            return b"*%d\r\n" % len(value) + b"".join(cls._encode(v) for v in value)
+        if isinstance(value, str):
+            value = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()  # Inline command
+        args = []
+        for _ in range(int(line[1:])):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    # --- Keyspace ---
+
+    def _get(self, key, default_type):
+        if self._expires.get(key, float("inf")) < time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        value = self._data.get(key)
+        if value is None:
+            return default_type()
+        return value
+
+    def _execute(self, name: str, args: list):
+        if name == "PING":
+            return Status("PONG")
+        if name in ("CLIENT", "SELECT"):
+            return Status("OK")
+        if name == "HSET":
+            key, pairs = args[0], args[1:]
+            value = self._data.setdefault(key, self._get(key, dict))
+            added = sum(1 for field in pairs[::2] if field not in value)
+            value.update(zip(pairs[::2], pairs[1::2]))
+            return added
+        if name == "HGETALL":
+            return [item for pair in self._get(args[0], dict).items() for item in pair]
+        if name == "RPUSH":
+            value = self._data.setdefault(args[0], self._get(args[0], list))
+            value.extend(args[1:])
+            return len(value)
+        if name == "LRANGE":
+            value = self._get(args[0], list)
+            start, stop = int(args[1]), int(args[2])
+            return value[start:None if stop == -1 else stop + 1]
+        if name == "EXPIRE":
+            if args[0] not in self._data:
+                return 0
+            self._expires[args[0]] = time.monotonic() + int(args[1])
+            return 1
+        if name == "DEL":
+            return sum(1 for key in args if self._data.pop(key, None) is not None)
+        return ValueError(f"unknown command '{name}'")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed = set()
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+                self.commands += 1
+                name, args = command[0].decode().upper(), command[1:]
+                if name == "SUBSCRIBE":
+                    for channel in args:
+                        subscribed.add(channel)
+                        self._channels[channel].add(writer)
+                        writer.write(self._encode([b"subscribe", channel, len(subscribed)]))
+                elif name == "UNSUBSCRIBE":
+                    for channel in args or list(subscribed):
+                        subscribed.discard(channel)
+                        self._channels[channel].discard(writer)
+                        writer.write(self._encode([b"unsubscribe", channel, len(subscribed)]))
+                elif name == "PUBLISH":
+                    channel, message = args
+                    receivers = list(self._channels.get(channel, ()))
+                    for receiver in receivers:
+                        receiver.write(self._encode([b"message", channel, message]))
+                    writer.write(self._encode(len(receivers)))
+                elif name == "PING" and subscribed:
+                    writer.write(self._encode([b"pong", b""]))
+                else:
+                    writer.write(self._encode(self._execute(name, args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self._channels[channel].discard(writer)
+            writer.close()
+
+
+async def _serve(args):
+    server = await FakeRedisServer(args.host, args.port).start()
+    logger.info(f"Fake Redis listening on {server.url}")
+    await asyncio.Future()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    asyncio.run(_serve(parser.parse_args()))
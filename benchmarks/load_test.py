@@ -0,0 +1,291 @@
+"""
+Load test: N simulated browser clients stream PCM through /api/v1/ws in real time
+while LLM workers call /api/v1/readability and /api/v1/correctness, against
+serve_offline.py (fake Tencent ASR + FakeLLMProcessor), all on this machine.
+
+Reports:
+- partial latency (p50/p99): from sending a frame to receiving the text_delta
+  whose end_ms covers it
+- server CPU per session and per second of audio
+- server memory (RSS growth) per session
+- LLM endpoint requests/sec, time to first byte and total time
+
+--json writes the numbers so runs can be compared across commits. Clients and
+server share the machine, so compare runs on the same hardware. Run from the
+repository root:
+    python benchmarks/load_test.py --clients 20 --seconds 30 --llm-workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+import httpx
+import numpy as np
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from audio_processor import FRAME_HEADER, FRAME_MAGIC  # noqa: E402
+
+SAMPLE_RATE = 16000
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+class ProcessMonitor:
+    """
+    Samples CPU time and RSS of a process from /proc (Linux only).
+    """
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+
+    def rss_bytes(self) -> int:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.rss_bytes())
+
+    def start(self):
+        self.peak_rss = self.rss_bytes()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentiles(samples, scale=1000.0):
+    if not samples:
+        return {"p50": None, "p99": None, "max": None}
+    values = np.asarray(samples) * scale
+    return {"p50": round(float(np.percentile(values, 50)), 1),
+            "p99": round(float(np.percentile(values, 99)), 1),
+            "max": round(float(values.max()), 1)}
+
+
+def load_audio(path, seconds):
+    if path:
+        with wave.open(path, "rb") as wav:
+            if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise SystemExit("--wav must be 16 kHz mono 16-bit PCM")
+            audio = wav.readframes(wav.getnframes())
+        # Loop the recording to the requested length
+        needed = int(seconds * SAMPLE_RATE) * 2
+        return (audio * (needed // len(audio) + 1))[:needed]
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 3000).astype(np.int16).tobytes()
+
+
+async def run_client(url, audio, frame_ms, results):
+    frame_bytes = SAMPLE_RATE * 2 * frame_ms // 1000
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.recv()  # idle
+        await ws.send(json.dumps({"type": "start_recording", "protocol_version": 2,
+                                  "audio_format": "pcm16_framed", "vad": False}))
+        while True:
+            message = json.loads(await ws.recv())
+            if message.get("type") == "error":
+                results["rejected"] += 1
+                return
+            if message.get("status") == "connected":
+                break
+
+        sent_at = []  # perf_counter time at which frame i (covering audio up to (i + 1) * frame_ms) was sent
+        total_ms = len(audio) * 1000 // (SAMPLE_RATE * 2)
+
+        async def receive():
+            while True:
+                message = json.loads(await ws.recv())
+                if message.get("type") != "text_delta" or "end_ms" not in message:
+                    continue
+                frame = max(0, -(-message["end_ms"] // frame_ms) - 1)
+                if frame < len(sent_at):
+                    results["latencies"].append(time.perf_counter() - sent_at[frame])
+                if message["end_ms"] >= total_ms and message.get("sentence_final"):
+                    return
+
+        receiver = asyncio.create_task(receive())
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for i, offset in enumerate(range(0, len(audio), frame_bytes)):
+            # Pace frames like a microphone would
+            await asyncio.sleep(max(0.0, start + i * frame_ms / 1000 - loop.time()))
+            header = FRAME_HEADER.pack(FRAME_MAGIC, i, SAMPLE_RATE, i * frame_ms)
+            await ws.send(header + audio[offset:offset + frame_bytes])
+            sent_at.append(time.perf_counter())
+        await ws.send(json.dumps({"type": "stop_recording"}))
+        try:
+            await asyncio.wait_for(receiver, timeout=10.0)
+            results["completed"] += 1
+        except asyncio.TimeoutError:
+            results["incomplete"] += 1
+
+
+async def llm_worker(client, worker, done, text, results):
+    i = 0
+    while not done.is_set():
+        endpoint = "/api/v1/readability" if i % 2 == 0 else "/api/v1/correctness"
+        # Unique text per request so the response cache does not answer it
+        body = {"text": f"[{worker}-{i}] {text}"}
+        start = time.perf_counter()
+        first = None
+        try:
+            async with client.stream("POST", endpoint, json=body) as response:
+                async for _ in response.aiter_bytes():
+                    if first is None:
+                        first = time.perf_counter() - start
+                ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        total = time.perf_counter() - start
+        if ok:
+            results["llm_ttfb"].append(first if first is not None else total)
+            results["llm_total"].append(total)
+        else:
+            results["llm_errors"] += 1
+        i += 1
+
+
+async def drive(args, base_url):
+    audio = load_audio(args.wav, args.seconds)
+    results = {"latencies": [], "completed": 0, "incomplete": 0, "rejected": 0,
+               "llm_ttfb": [], "llm_total": [], "llm_errors": 0}
+    done = asyncio.Event()
+    text = "今天我们讨论了下一季度的产品规划和预算安排，" * (args.llm_chars // 22 + 1)
+    text = text[:args.llm_chars]
+    ws_url = base_url.replace("http", "ws", 1) + "/api/v1/ws"
+
+    async def clients():
+        tasks = []
+        for _ in range(args.clients):
+            tasks.append(asyncio.create_task(run_client(ws_url, audio, args.frame_ms, results)))
+            await asyncio.sleep(args.ramp / max(1, args.clients))  # Stagger starts like real users
+        await asyncio.gather(*tasks)
+        done.set()
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        await asyncio.gather(clients(), *(llm_worker(client, w, done, text, results) for w in range(args.llm_workers)))
+    return results, time.perf_counter() - start
+
+
+async def wait_for_http(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up")
+
+
+def main(args):
+    asr_port, port = args.port + 1, args.port
+    env = dict(os.environ, LOG_LEVEL="WARNING", ASR_MAX_SESSIONS=str(max(200, args.clients)),
+               ASR_MAX_WAITING=str(args.clients))
+    fake_asr = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_asr_server.py"),
+                                 "--port", str(asr_port), "--recognition-delay", str(args.recognition_delay)],
+                                cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    server = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "serve_offline.py"),
+                               "--port", str(port), "--asr-url", f"ws://127.0.0.1:{asr_port}/asr/v2/",
+                               "--first-token-latency", str(args.first_token_latency),
+                               "--tokens-per-second", str(args.tokens_per_second)],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_for_http(base_url + "/api/v1/stats/dsp"))
+        monitor = ProcessMonitor(server.pid)
+        baseline_rss = monitor.rss_bytes()
+        cpu_before = monitor.cpu_seconds()
+        monitor.start()
+        results, elapsed = asyncio.run(drive(args, base_url))
+        monitor.stop()
+        cpu = monitor.cpu_seconds() - cpu_before
+    finally:
+        server.terminate()
+        fake_asr.terminate()
+        server.wait()
+        fake_asr.wait()
+
+    sessions = results["completed"] + results["incomplete"]
+    audio_seconds = sessions * args.seconds
+    llm_requests = len(results["llm_total"])
+    report = {
+        "clients": args.clients,
+        "sessions_completed": results["completed"],
+        "sessions_incomplete": results["incomplete"],
+        "sessions_rejected": results["rejected"],
+        "elapsed_s": round(elapsed, 2),
+        "partial_latency_ms": percentiles(results["latencies"]),
+        "partial_results": len(results["latencies"]),
+        "server_cpu_s": round(cpu, 2),
+        "server_cpu_ms_per_session": round(cpu / sessions * 1000, 1) if sessions else None,
+        "server_cpu_ms_per_audio_second": round(cpu / audio_seconds * 1000, 2) if audio_seconds else None,
+        "server_rss_baseline_mib": round(baseline_rss / 2 ** 20, 1),
+        "server_rss_peak_mib": round(monitor.peak_rss / 2 ** 20, 1),
+        "server_rss_per_session_kib": round((monitor.peak_rss - baseline_rss) / max(1, args.clients) / 1024, 1),
+        "llm_requests": llm_requests,
+        "llm_errors": results["llm_errors"],
+        "llm_requests_per_s": round(llm_requests / elapsed, 2),
+        "llm_ttfb_ms": percentiles(results["llm_ttfb"]),
+        "llm_total_ms": percentiles(results["llm_total"]),
+    }
+
+    print(f"CPU cores: {os.cpu_count()}, {args.clients} clients x {args.seconds:g} s audio, "
+          f"{args.llm_workers} LLM workers, {elapsed:.1f} s")
+    print(f"sessions      : {results['completed']} completed, {results['incomplete']} incomplete, "
+          f"{results['rejected']} rejected")
+    latency = report["partial_latency_ms"]
+    print(f"partial delay : p50 {latency['p50']} ms, p99 {latency['p99']} ms, max {latency['max']} ms "
+          f"({report['partial_results']} results)")
+    print(f"server CPU    : {report['server_cpu_s']} s total, {report['server_cpu_ms_per_session']} ms/session, "
+          f"{report['server_cpu_ms_per_audio_second']} ms per second of audio")
+    print(f"server memory : {report['server_rss_baseline_mib']} MiB idle, {report['server_rss_peak_mib']} MiB peak, "
+          f"~{report['server_rss_per_session_kib']} KiB/session")
+    print(f"LLM endpoints : {report['llm_requests_per_s']} req/s ({llm_requests} ok, {results['llm_errors']} errors), "
+          f"TTFB p50 {report['llm_ttfb_ms']['p50']} / p99 {report['llm_ttfb_ms']['p99']} ms, "
+          f"total p50 {report['llm_total_ms']['p50']} / p99 {report['llm_total_ms']['p99']} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=20.0, help="Audio per client, streamed in real time")
+    parser.add_argument("--wav", help="16 kHz mono recording to stream instead of synthetic audio")
+    parser.add_argument("--frame-ms", type=int, default=100, help="Audio per WebSocket message")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which clients connect")
+    parser.add_argument("--llm-workers", type=int, default=4, help="Concurrent LLM endpoint callers")
+    parser.add_argument("--llm-chars", type=int, default=400, help="Text length sent to the LLM endpoints")
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="Fake LLM time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0, help="Fake LLM output rate")
+    parser.add_argument("--recognition-delay", type=float, default=0.0, help="Fake ASR latency per result")
+    parser.add_argument("--port", type=int, default=3206)
+    parser.add_argument("--json", help="Also write the report to this file")
+    main(parser.parse_args())
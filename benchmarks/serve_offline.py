@@ -0,0 +1,48 @@
+"""
+Runs realtime_server.py fully offline: ASR goes to the fake Tencent server and
+every LLM model is answered by FakeLLMProcessor, so no API keys are needed.
+Used by load_test.py, and handy for front-end work. Run from the repository root:
+    python benchmarks/fake_asr_server.py --port 8765 &
+    python benchmarks/serve_offline.py --asr-url ws://127.0.0.1:8765/asr/v2/ --port 3006
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def main(args):
+    os.environ.setdefault("TENCENT_APP_ID", "1250000000")
+    os.environ.setdefault("TENCENT_SECRET_ID", "fake-secret-id")
+    os.environ.setdefault("TENCENT_SECRET_KEY", "fake-secret-key")
+    os.environ.setdefault("DEEPSEEK_API_KEY", "unused")
+    os.environ["TENCENT_ASR_BASE_URL"] = args.asr_url
+    os.chdir(ROOT)  # The app serves ./static
+
+    import uvicorn
+
+    import realtime_server
+    from fake_llm import FakeLLMProcessor
+    from llm_processor import set_llm_backend
+
+    set_llm_backend(lambda provider, model_name: FakeLLMProcessor(
+        default_model=model_name,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        chars_per_chunk=args.chars_per_chunk
+    ))
+    uvicorn.run(realtime_server.app, host=args.host, port=args.port, log_config=None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3006)
+    parser.add_argument("--asr-url", default="ws://127.0.0.1:8765/asr/v2/")
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--chars-per-chunk", type=int, default=4, help="Characters per streamed delta")
+    main(parser.parse_args())
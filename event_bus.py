@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus(ABC):
+    """
+    Shared session state and transcript events, so any worker can serve a session.
+
+    Workers record per-recording metadata and finalized sentences here and
+    publish events on the session's channel; LLM endpoints and event streams
+    on any worker read them back. Keys expire `ttl` seconds after their last update.
+    """
+
+    @staticmethod
+    def channel(session_id: str) -> str:
+        return f"stt:session:{session_id}:events"
+
+    @abstractmethod
+    async def set_session(self, session_id: str, metadata: dict, ttl: int):
+        pass
+
+    @abstractmethod
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    async def append_transcript(self, session_id: str, text: str, ttl: int):
+        pass
+
+    @abstractmethod
+    async def get_transcript(self, session_id: str) -> List[str]:
+        pass
+
+    @abstractmethod
+    async def publish(self, session_id: str, event: dict):
+        pass
+
+    @abstractmethod
+    def subscribe(self, session_id: str) -> AsyncIterator[dict]:
+        pass
+
+    async def close(self):
+        pass
+
+
+class InMemoryEventBus(EventBus):
+    """
+    Process-local bus for single-worker deployments.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, dict] = {}
+        self._transcripts: Dict[str, List[str]] = {}
+        self._expires: Dict[str, float] = {}
+        self._subscribers: Dict[str, set] = defaultdict(set)
+
+    def _expire(self, session_id: str):
+        if self._expires.get(session_id, float("inf")) < time.monotonic():
+            self._sessions.pop(session_id, None)
+            self._transcripts.pop(session_id, None)
+            self._expires.pop(session_id, None)
+
+    def _touch(self, session_id: str, ttl: int):
+        self._expires[session_id] = time.monotonic() + ttl
+        # Purge other expired sessions now and then so memory stays bounded
+        if len(self._expires) % 64 == 0:
+            for other in list(self._expires):
+                self._expire(other)
+
+    async def set_session(self, session_id: str, metadata: dict, ttl: int):
+        self._expire(session_id)
+        self._sessions.setdefault(session_id, {}).update(metadata)
+        self._touch(session_id, ttl)
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        self._expire(session_id)
+        metadata = self._sessions.get(session_id)
+        return dict(metadata) if metadata is not None else None
+
+    async def append_transcript(self, session_id: str, text: str, ttl: int):
+        self._expire(session_id)
+        self._transcripts.setdefault(session_id, []).append(text)
+        self._touch(session_id, ttl)
+
+    async def get_transcript(self, session_id: str) -> List[str]:
+        self._expire(session_id)
+        return list(self._transcripts.get(session_id, []))
+
+    async def publish(self, session_id: str, event: dict):
+        for queue in self._subscribers.get(session_id, ()):
+            queue.put_nowait(event)
+
+    async def subscribe(self, session_id: str) -> AsyncIterator[dict]:
+        queue = asyncio.Queue()
+        self._subscribers[session_id].add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[session_id].discard(queue)
+            if not self._subscribers[session_id]:
+                del self._subscribers[session_id]
+
+
+class RedisEventBus(EventBus):
+    """
+    Bus backed by Redis (or any server speaking its protocol), shared by all workers and nodes.
+
+    Session metadata is a hash, the transcript a list, and events go through
+    pub/sub. Requires the optional `redis` package (`pip install redis`).
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("EVENT_BUS_URL points at Redis, but the 'redis' package is not installed") from e
+        # RESP2 keeps us compatible with older Redis versions and Redis-protocol servers
+        self._redis = redis.from_url(url, decode_responses=True, protocol=2)
+
+    @staticmethod
+    def _key(session_id: str, kind: str) -> str:
+        return f"stt:session:{session_id}:{kind}"
+
+    async def set_session(self, session_id: str, metadata: dict, ttl: int):
+        key = self._key(session_id, "meta")
+        fields = {name: json.dumps(value) for name, value in metadata.items()}
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, ttl)
+            pipe.expire(self._key(session_id, "transcript"), ttl)
+            await pipe.execute()
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        fields = await self._redis.hgetall(self._key(session_id, "meta"))
+        if not fields:
+            return None
+        return {name: json.loads(value) for name, value in fields.items()}
+
+    async def append_transcript(self, session_id: str, text: str, ttl: int):
+        key = self._key(session_id, "transcript")
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, text)
+            pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def get_transcript(self, session_id: str) -> List[str]:
+        return await self._redis.lrange(self._key(session_id, "transcript"), 0, -1)
+
+    async def publish(self, session_id: str, event: dict):
+        await self._redis.publish(self.channel(session_id), json.dumps(event, ensure_ascii=False))
+
+    async def subscribe(self, session_id: str) -> AsyncIterator[dict]:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel(session_id))
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    yield json.loads(message["data"])
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_event_bus(url: Optional[str] = None) -> EventBus:
+    """
+    Creates the bus for `url`: "memory://" (default) or "redis://host:port/db".
+    """
+    if not url or url.startswith("memory://"):
+        return InMemoryEventBus()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisEventBus(url)
+    raise ValueError(f"Unsupported EVENT_BUS_URL '{url}'")
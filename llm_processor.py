@@ -1,13 +1,131 @@
+import asyncio
+import hashlib
+import json
+import math
 import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
 from abc import ABC, abstractmethod
-import google.generativeai as genai
-from openai import OpenAI, AsyncOpenAI
-from typing import AsyncGenerator, Generator, Optional
+from typing import TYPE_CHECKING, AsyncGenerator, AsyncIterable, Awaitable, Callable, Dict, Generator, List, Optional, Tuple
 import logging
 
+import metrics
+from logging_config import summarize_text
+
+if TYPE_CHECKING:
+    # Provider SDKs take about a second to import; they are loaded when the first processor of their provider is created
+    import google.generativeai as genai
+    from openai import OpenAI, AsyncOpenAI
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+LLM_REQUESTS = metrics.counter(
+    "stt_llm_requests_total", "Streaming LLM requests by outcome (ok, error, cancelled)", ("provider", "model", "status"))
+LLM_TTFT_SECONDS = metrics.histogram(
+    "stt_llm_ttft_seconds", "Time from sending an LLM request to its first streamed chunk", ("provider", "model"))
+LLM_DURATION_SECONDS = metrics.histogram(
+    "stt_llm_duration_seconds", "Total time of streaming LLM requests", ("provider", "model"))
+LLM_OUTPUT_TOKENS_PER_SECOND = metrics.histogram(
+    "stt_llm_output_tokens_per_second", "Estimated output tokens per second after the first chunk", ("provider", "model"),
+    buckets=(5, 10, 20, 50, 100, 200, 500, 1000, 2000))
+LLM_SLOT_WAIT_SECONDS = metrics.histogram(
+    "stt_llm_slot_wait_seconds", "Time LLM requests wait for a per-provider concurrency slot", ("provider",))
+LLM_CACHE_REQUESTS = metrics.counter(
+    "stt_llm_cache_requests_total", "LLM response cache lookups by result (hit, miss)", ("provider", "result"))
+LLM_PROMPT_OVERSIZE = metrics.counter(
+    "stt_llm_prompt_oversize_total", "Prompts over the model's token budget, by action (rejected, trimmed, routed)",
+    ("model", "action"))
+LLM_HEDGE_EVENTS = metrics.counter(
+    "stt_llm_hedge_events_total",
+    "Hedged LLM requests by event (hedged, hedge_won, failover, budget_exhausted), labelled with the primary model",
+    ("model", "event"))
+
+# Connection pool limits shared by all OpenAI-compatible clients
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+# Default cap on concurrent upstream requests per provider; override with LLM_MAX_CONCURRENCY_<PROVIDER>
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+# Long-input mode: texts above the budget are split and processed in parallel
+LLM_CHUNK_TOKENS = int(os.getenv("LLM_CHUNK_TOKENS", "3000"))
+LLM_CHUNK_PARALLELISM = int(os.getenv("LLM_CHUNK_PARALLELISM", "4"))
+
+# Prompt budgets: prompt and text may use the model's context window (LLM_CONTEXT_TOKENS overrides the
+# built-in table, e.g. "gpt-4=8192,my-model=32768") minus LLM_OUTPUT_RESERVE_TOKENS for the answer.
+# Oversized prompts are rejected before any upstream call (LLM_OVERSIZE_POLICY=reject) or cut to their
+# most recent part (trim); unchunked requests go to LLM_LONG_CONTEXT_MODEL instead if it is large enough.
+LLM_CONTEXT_TOKENS = {
+    name.strip(): int(tokens) for name, _, tokens in
+    (item.partition("=") for item in os.getenv("LLM_CONTEXT_TOKENS", "").split(",") if item.strip())
+}
+LLM_OUTPUT_RESERVE_TOKENS = int(os.getenv("LLM_OUTPUT_RESERVE_TOKENS", "4096"))
+LLM_OVERSIZE_POLICY = os.getenv("LLM_OVERSIZE_POLICY", "reject")
+LLM_LONG_CONTEXT_MODEL = os.getenv("LLM_LONG_CONTEXT_MODEL", "")
+
+# Streamed output is passed on in pieces of up to LLM_STREAM_FLUSH_BYTES bytes, at most LLM_STREAM_FLUSH_MS
+# after the first buffered token, instead of one write per token; streams whose tokens arrive further apart
+# than LLM_STREAM_FLUSH_MS are passed through as is, and 0 passes every token through
+LLM_STREAM_FLUSH_MS = float(os.getenv("LLM_STREAM_FLUSH_MS", "30"))
+LLM_STREAM_FLUSH_BYTES = int(os.getenv("LLM_STREAM_FLUSH_BYTES", "256"))
+
+# Response cache: in-memory LRU, plus an optional SQLite file that survives restarts
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB")
+
+# Hedged requests: backup models on other providers (comma-separated, in order of preference). A request
+# whose first chunk takes longer than the primary model's LLM_HEDGE_QUANTILE time to first chunk (clamped
+# to LLM_HEDGE_MIN_DELAY..LLM_HEDGE_MAX_DELAY; LLM_HEDGE_DELAY until enough samples) is also sent to the
+# first backup and the faster answer wins; failed requests move on to the next backup.
+# At most LLM_HEDGE_BUDGET of all requests are hedged.
+LLM_HEDGE_MODELS = [m.strip() for m in os.getenv("LLM_HEDGE_MODELS", "").split(",") if m.strip()]
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "2.0"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.3"))
+LLM_HEDGE_MAX_DELAY = float(os.getenv("LLM_HEDGE_MAX_DELAY", "10.0"))
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+
+# Prompts are logged as length + hash; set to show that many leading characters as well
+LOG_PROMPT_CHARS = int(os.getenv("LOG_PROMPT_CHARS", "0"))
+
+# One (async, sync) client pair per provider endpoint, reused by every processor of that provider
+_openai_clients: Dict[Tuple[str, str], Tuple["AsyncOpenAI", "OpenAI"]] = {}
+_gemini_configured_key: Optional[str] = None
+_registry_lock = threading.Lock()
+
+def _get_openai_clients(api_key: str, base_url: Optional[str] = None) -> Tuple["AsyncOpenAI", "OpenAI"]:
+    """
+    Returns process-wide keep-alive clients for an OpenAI-compatible endpoint.
+    """
+    # Imported outside the lock: the first import takes ~0.5 s and the event loop takes this lock too
+    import httpx
+    from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient
+
+    key = (base_url or "", api_key)
+    with _registry_lock:
+        if key not in _openai_clients:
+            limits = httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            )
+            timeout = httpx.Timeout(LLM_TIMEOUT, connect=10.0)
+            _openai_clients[key] = (
+                AsyncOpenAI(api_key=api_key, base_url=base_url,
+                            http_client=DefaultAsyncHttpxClient(limits=limits, timeout=timeout)),
+                OpenAI(api_key=api_key, base_url=base_url,
+                       http_client=DefaultHttpxClient(limits=limits, timeout=timeout)),
+            )
+        return _openai_clients[key]
+
 class LLMProcessor(ABC):
     @abstractmethod
     async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
@@ -19,18 +137,29 @@ class LLMProcessor(ABC):
 
 class GeminiProcessor(LLMProcessor):
     def __init__(self, default_model: str = 'gemini-1.5-pro'):
+        global _gemini_configured_key
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise EnvironmentError("GOOGLE_API_KEY is not set")
-        genai.configure(api_key=api_key)
+        import google.generativeai as genai
+        self._genai = genai
+        # genai.configure is process-wide; only redo it if the key changed
+        if _gemini_configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _gemini_configured_key = api_key
         self.default_model = default_model
+        self._models: Dict[str, "genai.GenerativeModel"] = {}
+
+    def _get_model(self, model_name: str) -> "genai.GenerativeModel":
+        if model_name not in self._models:
+            self._models[model_name] = self._genai.GenerativeModel(model_name)
+        return self._models[model_name]
 
     async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
         all_prompt = f"{prompt}\n\n{text}"
         model_name = model or self.default_model
-        logger.info(f"Using model: {model_name} for processing")
-        logger.info(f"Prompt: {all_prompt}")
-        genai_model = genai.GenerativeModel(model_name)
+        logger.info(f"Using model: {model_name} for processing, prompt {summarize_text(all_prompt, LOG_PROMPT_CHARS)}")
+        genai_model = self._get_model(model_name)
         response = await genai_model.generate_content_async(
             all_prompt,
             stream=True
@@ -42,9 +171,8 @@ class GeminiProcessor(LLMProcessor):
     def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
         all_prompt = f"{prompt}\n\n{text}"
         model_name = model or self.default_model
-        logger.info(f"Using model: {model_name} for sync processing")
-        logger.info(f"Prompt: {all_prompt}")
-        genai_model = genai.GenerativeModel(model_name)
+        logger.info(f"Using model: {model_name} for sync processing, prompt {summarize_text(all_prompt, LOG_PROMPT_CHARS)}")
+        genai_model = self._get_model(model_name)
         response = genai_model.generate_content(all_prompt)
         return response.text
 
@@ -52,15 +180,13 @@ class GPTProcessor(LLMProcessor):
     def __init__(self, default_model: str = 'gpt-4'):
         if not os.getenv("OPENAI_API_KEY"):
             raise ValueError("OpenAI API key not found in environment variables")
-        self.async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.sync_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.async_client, self.sync_client = _get_openai_clients(os.getenv("OPENAI_API_KEY"))
         self.default_model = default_model
 
     async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
         all_prompt = f"{prompt}\n\n{text}"
         model_name = model or self.default_model
-        logger.info(f"Using model: {model_name} for processing")
-        logger.info(f"Prompt: {all_prompt}")
+        logger.info(f"Using model: {model_name} for processing, prompt {summarize_text(all_prompt, LOG_PROMPT_CHARS)}")
         response = await self.async_client.chat.completions.create(
             model=model_name,
             messages=[
@@ -75,8 +201,7 @@ class GPTProcessor(LLMProcessor):
     def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
         all_prompt = f"{prompt}\n\n{text}"
         model_name = model or self.default_model
-        logger.info(f"Using model: {model_name} for sync processing")
-        logger.info(f"Prompt: {all_prompt}")
+        logger.info(f"Using model: {model_name} for sync processing, prompt {summarize_text(all_prompt, LOG_PROMPT_CHARS)}")
         response = self.sync_client.chat.completions.create(
             model=model_name,
             messages=[
@@ -90,8 +215,7 @@ class DeepSeekProcessor(LLMProcessor):
         api_key = os.getenv("DEEPSEEK_API_KEY")
         if not api_key:
             raise EnvironmentError("DEEPSEEK_API_KEY is not set in environment variables.")
-        self.async_client = AsyncOpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1")
-        self.sync_client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1")
+        self.async_client, self.sync_client = _get_openai_clients(api_key, base_url="https://api.deepseek.com/v1")
         self.default_model = default_model
 
     async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
@@ -117,10 +241,949 @@ class DeepSeekProcessor(LLMProcessor):
         )
         return response.choices[0].message.content
 
+class ConcurrencyLimitedProcessor(LLMProcessor):
+    """
+    Wraps a processor so that at most a fixed number of streaming requests per
+    provider are in flight; further requests wait for a free slot.
+    """
+    def __init__(self, processor: LLMProcessor, semaphore: asyncio.Semaphore, provider: str = ""):
+        self.processor = processor
+        self.semaphore = semaphore
+        self.provider = provider
+        self.default_model = processor.default_model
+
+    async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
+        start = time.perf_counter()
+        async with self.semaphore:
+            LLM_SLOT_WAIT_SECONDS.observe(time.perf_counter() - start, provider=self.provider)
+            async for chunk in self.processor.process_text(text, prompt, model):
+                yield chunk
+
+    def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
+        return self.processor.process_text_sync(text, prompt, model)
+
+class InstrumentedProcessor(LLMProcessor):
+    """
+    Records time to first chunk, total duration, output rate and outcome of each
+    streaming request in the metrics registry, and traces it as an "llm.process_text" span.
+    """
+    def __init__(self, processor: LLMProcessor, provider: str):
+        self.processor = processor
+        self.provider = provider
+        self.default_model = processor.default_model
+
+    async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
+        labels = {"provider": self.provider, "model": model or self.default_model}
+        start = time.perf_counter()
+        ttft = None
+        output_tokens = 0
+        status = "error"
+        with metrics.span("llm.process_text", input_chars=len(text), **labels) as attributes:
+            try:
+                async for chunk in self.processor.process_text(text, prompt, model):
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        LLM_TTFT_SECONDS.observe(ttft, **labels)
+                    output_tokens += estimate_tokens(chunk)
+                    yield chunk
+                status = "ok"
+            except (GeneratorExit, asyncio.CancelledError):
+                # The client went away before the completion finished
+                status = "cancelled"
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                LLM_REQUESTS.inc(status=status, **labels)
+                LLM_DURATION_SECONDS.observe(duration, **labels)
+                if status == "ok" and ttft is not None and duration > ttft and output_tokens:
+                    LLM_OUTPUT_TOKENS_PER_SECOND.observe(output_tokens / (duration - ttft), **labels)
+                attributes.update(ttft_ms=round(ttft * 1000, 1) if ttft is not None else None,
+                                  output_tokens=output_tokens)
+
+    def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
+        return self.processor.process_text_sync(text, prompt, model)
+
+class LLMResponseCache:
+    """
+    Completion cache keyed by a hash of (provider, model, prompt, text).
+
+    The memory tier is an LRU bounded by entry count and total size, with a TTL.
+    If `db_path` is set, completions are also written to SQLite and looked up
+    there on a memory miss.
+    """
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.commit()
+
+        # Metrics
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, text: str) -> str:
+        payload = json.dumps([provider, model, prompt, text], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached completion, or None. May touch SQLite, so call it off the event loop.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value, _ = entry
+                if now - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM llm_cache WHERE key = ? AND created > ?", (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    self._put_memory(key, row[0], row[1])
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, value, now)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)", (key, value, now))
+                self._db.execute("DELETE FROM llm_cache WHERE created <= ?", (now - self.ttl,))
+                self._db.commit()
+
+    def _put_memory(self, key: str, value: str, created: float):
+        size = len(value.encode('utf-8'))
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        self._entries[key] = (created, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_enabled": self._db is not None,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+class CachedProcessor(LLMProcessor):
+    """
+    Serves repeated requests from an LLMResponseCache. Hits are streamed back from
+    the stored completion; only fully completed responses are stored.
+    """
+    def __init__(self, processor: LLMProcessor, provider: str, cache: LLMResponseCache):
+        self.processor = processor
+        self.provider = provider
+        self.cache = cache
+        self.default_model = processor.default_model
+
+    def _key(self, text: str, prompt: str, model: Optional[str]) -> str:
+        return self.cache.make_key(self.provider, model or self.default_model, prompt, text)
+
+    async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
+        key = self._key(text, prompt, model)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        LLM_CACHE_REQUESTS.inc(provider=self.provider, result="miss" if cached is None else "hit")
+        if cached is not None:
+            yield cached
+            return
+
+        chunks = []
+        async for chunk in self.processor.process_text(text, prompt, model):
+            chunks.append(chunk)
+            yield chunk
+        await asyncio.to_thread(self.cache.set, key, "".join(chunks))
+
+    def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
+        key = self._key(text, prompt, model)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = self.processor.process_text_sync(text, prompt, model)
+        self.cache.set(key, result)
+        return result
+
+class IncrementalEnhancer:
+    """
+    Polishes a live transcript window by window while recording is still going.
+
+    Finalized ASR sentences are collected until `window_chars` characters are
+    pending (or `max_wait` seconds have passed), then sent to the LLM together
+    with the last `context_chars` characters of polished output as context.
+    Windows are processed strictly in order; each output chunk is passed to
+    `on_chunk(segment_index, text)`. Sentences that arrive while a window is
+    being processed simply make the next window larger.
+    """
+    # Between the outputs of consecutive windows; static/main.js starts every segment on a new line too
+    SEGMENT_SEPARATOR = "\n"
+
+    def __init__(self, processor: LLMProcessor, prompt: str, on_chunk: Callable[[int, str], Awaitable[None]],
+                 window_chars: int = 120, context_chars: int = 200, max_wait: float = 5.0,
+                 context_template: Optional[str] = None):
+        self.processor = processor
+        self.prompt = prompt
+        self.on_chunk = on_chunk
+        self.window_chars = window_chars
+        self.context_chars = context_chars
+        self.max_wait = max_wait
+        self.context_template = context_template or "{context}"
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._polished_tail = ""
+        self._polished: List[str] = []
+        self._segment = 0
+        self._finishing = False
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def add_sentence(self, text: str):
+        """
+        Queues a finalized sentence for enhancement.
+        """
+        if not text:
+            return
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= self.window_chars:
+            self._wakeup.set()
+
+    async def finish(self):
+        """
+        Enhances whatever is still pending and waits until all output was delivered.
+        """
+        self._finishing = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+
+    async def cancel(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def polished_text(self) -> str:
+        """
+        Everything polished so far, in order, one line per window like the web client shows it.
+        """
+        return self.SEGMENT_SEPARATOR.join(segment for segment in self._polished if segment)
+
+    def _build_prompt(self) -> str:
+        if not self._polished_tail:
+            return self.prompt
+        context = self.context_template.format(context=self._polished_tail)
+        return f"{self.prompt}\n\n{context}"
+
+    async def _run(self):
+        while True:
+            if not self._finishing and self._pending_chars < self.window_chars:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            if not self._pending:
+                if self._finishing:
+                    return
+                continue
+
+            window = "".join(self._pending)
+            self._pending.clear()
+            self._pending_chars = 0
+            prompt = self._build_prompt()
+            polished = []
+            try:
+                async for chunk in coalesce_chunks(self.processor.process_text(window, prompt)):
+                    polished.append(chunk)
+                    await self.on_chunk(self._segment, chunk)
+            except Exception as e:
+                logger.error(f"Incremental enhancement failed for segment {self._segment}: {e}", exc_info=True)
+                if not polished:
+                    # Keep the raw text rather than losing it from the polished transcript
+                    polished.append(window)
+                    await self.on_chunk(self._segment, window)
+            self._polished.append("".join(polished))
+            self._polished_tail = self._polished[-1][-self.context_chars:]
+            self._segment += 1
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]')
+_SENTENCE_END = re.compile(r'(?<=[。！？；!?;.])')
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count: about one token per CJK character and per four other characters.
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Splits text into chunks of at most `max_tokens` (estimated), preferring
+    paragraph boundaries, then sentence boundaries, then hard cuts.
+    """
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n|\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append((paragraph, True))
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            while estimate_tokens(sentence) > max_tokens:
+                # A single sentence over budget (e.g. ASR text without punctuation)
+                cut = max(1, len(sentence) * max_tokens // estimate_tokens(sentence))
+                pieces.append((sentence[:cut], False))
+                sentence = sentence[cut:]
+            if sentence:
+                pieces.append((sentence, False))
+        pieces[-1] = (pieces[-1][0], True)
+
+    chunks, current, current_tokens = [], "", 0
+    for piece, ends_paragraph in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current.rstrip())
+            current, current_tokens = "", 0
+        current += piece + ("\n" if ends_paragraph else "")
+        current_tokens += tokens
+    if current.strip():
+        chunks.append(current.rstrip())
+    return chunks
+
+class PromptTooLargeError(ValueError):
+    """
+    Raised before any upstream call when a prompt does not fit into the model's token budget.
+    """
+    def __init__(self, model: str, tokens: int, limit: int):
+        super().__init__(f"Input of about {tokens} tokens exceeds the {limit}-token prompt budget of {model}")
+        self.model = model
+        self.tokens = tokens
+        self.limit = limit
+
+# Context window and tokenizer density (tokens per estimate_tokens token, for mostly Chinese text)
+# by model-name prefix; the longest matching prefix wins
+MODEL_TOKEN_LIMITS: Dict[str, Tuple[int, float]] = {
+    "deepseek": (65536, 0.7),
+    "gpt-4o": (128000, 0.8),
+    "gpt-4-turbo": (128000, 1.3),
+    "gpt-4": (8192, 1.3),
+    "gpt-3.5": (16385, 1.3),
+    "o1": (128000, 0.8),
+    "gemini-1.5-pro": (2097152, 1.0),
+    "gemini": (1048576, 1.0),
+}
+DEFAULT_TOKEN_LIMITS = (8192, 1.3)
+
+class TokenBudget:
+    """
+    How much prompt one model takes: its context window minus `output_tokens`
+    reserved for the answer, counted with estimate_tokens scaled by the density
+    of the model's tokenizer.
+    """
+    def __init__(self, model: str, context_tokens: int, density: float, output_tokens: int = LLM_OUTPUT_RESERVE_TOKENS):
+        self.model = model
+        self.context_tokens = context_tokens
+        self.density = density
+        self.input_tokens = max(0, context_tokens - output_tokens)
+
+    def estimate(self, text: str) -> int:
+        return math.ceil(estimate_tokens(text) * self.density)
+
+    def prompt_tokens(self, prompt: str, text: str) -> int:
+        return self.estimate(prompt) + self.estimate(text) + 1
+
+    def fits(self, prompt: str, text: str) -> bool:
+        return self.prompt_tokens(prompt, text) <= self.input_tokens
+
+    def text_tokens(self, prompt: str) -> int:
+        """
+        Room left for the text next to `prompt`, in estimate_tokens units (as used by split_text).
+        """
+        return int((self.input_tokens - self.estimate(prompt) - 1) / self.density)
+
+    def trim(self, prompt: str, text: str) -> str:
+        """
+        The most recent part of `text` that fits next to `prompt`.
+        """
+        available = self.input_tokens - self.estimate(prompt) - 1
+        keep = len(text) * max(0, available) // max(1, self.estimate(text))
+        text = text[len(text) - keep:]
+        while text and self.estimate(text) > available:
+            text = text[len(text) // 20 + 1:]
+        return text
+
+_token_budgets: Dict[str, TokenBudget] = {}
+
+def get_token_budget(model_name: str) -> TokenBudget:
+    budget = _token_budgets.get(model_name)
+    if budget is None:
+        prefixes = [prefix for prefix in MODEL_TOKEN_LIMITS if model_name.lower().startswith(prefix)]
+        context_tokens, density = MODEL_TOKEN_LIMITS[max(prefixes, key=len)] if prefixes else DEFAULT_TOKEN_LIMITS
+        budget = _token_budgets[model_name] = TokenBudget(
+            model_name, LLM_CONTEXT_TOKENS.get(model_name, context_tokens), density)
+    return budget
+
+def fit_prompt(model_name: str, prompt: str, text: str) -> str:
+    """
+    Returns `text` if it fits into the model's prompt budget, or (with LLM_OVERSIZE_POLICY=trim) its
+    most recent part that does. Raises PromptTooLargeError otherwise.
+    """
+    budget = get_token_budget(model_name)
+    tokens = budget.prompt_tokens(prompt, text)
+    if tokens <= budget.input_tokens:
+        return text
+    if LLM_OVERSIZE_POLICY == "trim" and budget.estimate(prompt) < budget.input_tokens:
+        LLM_PROMPT_OVERSIZE.inc(model=model_name, action="trimmed")
+        trimmed = budget.trim(prompt, text)
+        logger.warning(f"Input of about {tokens} tokens trimmed to {len(trimmed)}/{len(text)} characters "
+                       f"for the {budget.input_tokens}-token budget of {model_name}")
+        return trimmed
+    LLM_PROMPT_OVERSIZE.inc(model=model_name, action="rejected")
+    raise PromptTooLargeError(model_name, tokens, budget.input_tokens)
+
+def route_model(model_name: str, prompt: str, text: str) -> str:
+    """
+    Picks the model for an unchunked request up front: `model_name` if the prompt fits its budget,
+    else LLM_LONG_CONTEXT_MODEL if that one is large enough. Raises PromptTooLargeError when neither
+    fits and oversized prompts are rejected rather than trimmed.
+    """
+    budget = get_token_budget(model_name)
+    if budget.fits(prompt, text):
+        return model_name
+    if LLM_LONG_CONTEXT_MODEL and get_token_budget(LLM_LONG_CONTEXT_MODEL).fits(prompt, text):
+        LLM_PROMPT_OVERSIZE.inc(model=model_name, action="routed")
+        logger.info(f"Input too large for {model_name}, routed to {LLM_LONG_CONTEXT_MODEL}")
+        return LLM_LONG_CONTEXT_MODEL
+    if LLM_OVERSIZE_POLICY == "trim":
+        return model_name
+    LLM_PROMPT_OVERSIZE.inc(model=model_name, action="rejected")
+    raise PromptTooLargeError(model_name, budget.prompt_tokens(prompt, text), budget.input_tokens)
+
+class TokenBudgetProcessor(LLMProcessor):
+    """
+    Applies fit_prompt to every request, so oversized prompts are trimmed or
+    rejected before they take a concurrency slot or reach the provider.
+    """
+    def __init__(self, processor: LLMProcessor):
+        self.processor = processor
+        self.default_model = processor.default_model
+
+    async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
+        text = fit_prompt(model or self.default_model, prompt, text)
+        async for chunk in self.processor.process_text(text, prompt, model):
+            yield chunk
+
+    def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
+        text = fit_prompt(model or self.default_model, prompt, text)
+        return self.processor.process_text_sync(text, prompt, model)
+
+async def coalesce_chunks(chunks: AsyncIterable[str], max_delay: float = LLM_STREAM_FLUSH_MS / 1000,
+                          max_bytes: int = LLM_STREAM_FLUSH_BYTES) -> AsyncGenerator[str, None]:
+    """
+    Merges a stream of small deltas into fewer, larger chunks.
+
+    Deltas are passed on as they arrive until one follows the previous within
+    `max_delay` seconds; slower streams have nothing to merge and never pay for
+    buffering. From then on deltas are buffered until `max_bytes` bytes (UTF-8)
+    are pending or `max_delay` seconds have passed since the oldest of them
+    arrived, whichever comes first; the rest is flushed when the stream ends.
+    With `max_delay` <= 0 every delta is passed through.
+
+    While coalescing, the stream is read by one background task, so waiting costs
+    a single timer per flush rather than per delta.
+    """
+    iterator = chunks.__aiter__()
+    loop = asyncio.get_running_loop()
+    buffer: List[str] = []
+    buffered_bytes = 0
+    oldest = 0.0
+    finished = False
+    error: Optional[BaseException] = None
+    wakeup: Optional[asyncio.Future] = None
+    reader: Optional[asyncio.Future] = None
+
+    def wake():
+        if wakeup is not None and not wakeup.done():
+            wakeup.set_result(None)
+
+    async def read():
+        nonlocal buffered_bytes, oldest, finished, error
+        try:
+            async for chunk in iterator:
+                buffer.append(chunk)
+                buffered_bytes += len(chunk.encode("utf-8"))
+                if len(buffer) == 1:
+                    oldest = loop.time()
+                    wake()
+                elif buffered_bytes >= max_bytes:
+                    wake()
+        except Exception as e:
+            error = e
+        finally:
+            finished = True
+            wake()
+
+    try:
+        last_arrival = None
+        while True:
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            now = loop.time()
+            if max_delay > 0 and last_arrival is not None and now - last_arrival < max_delay:
+                # Deltas arrive faster than the flush window: buffer from here on
+                buffer.append(chunk)
+                buffered_bytes = len(chunk.encode("utf-8"))
+                oldest = now
+                break
+            last_arrival = now
+            yield chunk
+
+        reader = asyncio.ensure_future(read())
+        while True:
+            if not buffer and not finished:
+                wakeup = loop.create_future()
+                await wakeup
+            if buffer and not finished and buffered_bytes < max_bytes:
+                wakeup = loop.create_future()
+                timer = loop.call_at(oldest + max_delay, wake)
+                try:
+                    await wakeup
+                finally:
+                    timer.cancel()
+            if buffer:
+                output = "".join(buffer)
+                buffer.clear()
+                buffered_bytes = 0
+                yield output
+            elif finished:
+                break
+        if error is not None:
+            raise error
+    finally:
+        if reader is not None:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+class ChunkedProcessor(LLMProcessor):
+    """
+    Long-input mode: texts over `max_chunk_tokens` are split on paragraph and
+    sentence boundaries and the chunks are processed concurrently (at most
+    `max_parallel` at a time). Outputs are streamed back in chunk order, so the
+    first chunk's output starts arriving after one chunk's latency.
+
+    With `map_prompt`, this becomes map-reduce: every chunk is condensed with
+    `map_prompt` and the joined results are processed once with the request
+    prompt (e.g. for summaries). Short texts go straight to the wrapped processor.
+    """
+    def __init__(self, processor: LLMProcessor, max_chunk_tokens: int = LLM_CHUNK_TOKENS,
+                 max_parallel: int = LLM_CHUNK_PARALLELISM, map_prompt: Optional[str] = None,
+                 separator: str = "\n\n"):
+        self.processor = processor
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_parallel = max_parallel
+        self.map_prompt = map_prompt
+        self.separator = separator
+        self.default_model = processor.default_model
+
+    async def _map(self, chunks: List[str], prompt: str, model: Optional[str]) -> AsyncGenerator[Tuple[int, str], None]:
+        """
+        Processes all chunks concurrently and yields (chunk_index, output) in chunk order.
+        """
+        slots = asyncio.Semaphore(self.max_parallel)
+        queues = [asyncio.Queue() for _ in chunks]
+        done = object()
+
+        async def worker(index: int, chunk: str):
+            async with slots:
+                try:
+                    async for output in self.processor.process_text(chunk, prompt, model):
+                        queues[index].put_nowait(output)
+                    queues[index].put_nowait(done)
+                except Exception as e:
+                    queues[index].put_nowait(e)
+
+        tasks = [asyncio.create_task(worker(i, chunk)) for i, chunk in enumerate(chunks)]
+        try:
+            for index, queue in enumerate(queues):
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield index, item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _chunk_tokens(self, prompt: str, model: Optional[str]) -> int:
+        # Chunks must also fit next to the prompt into the model's budget, which is smaller for some models
+        budget = get_token_budget(model or self.default_model)
+        return max(256, min(self.max_chunk_tokens, budget.text_tokens(self.map_prompt or prompt)))
+
+    async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
+        max_tokens = self._chunk_tokens(prompt, model)
+        if estimate_tokens(text) <= max_tokens:
+            async for chunk in self.processor.process_text(text, prompt, model):
+                yield chunk
+            return
+
+        chunks = split_text(text, max_tokens)
+        logger.info(f"Long input ({estimate_tokens(text)} tokens) split into {len(chunks)} chunks")
+
+        if self.map_prompt is None:
+            last_index = 0
+            async for index, output in self._map(chunks, prompt, model):
+                if index != last_index:
+                    yield self.separator
+                    last_index = index
+                yield output
+            return
+
+        partials = [[] for _ in chunks]
+        async for index, output in self._map(chunks, self.map_prompt, model):
+            partials[index].append(output)
+        combined = self.separator.join("".join(partial) for partial in partials)
+        async for chunk in self.processor.process_text(combined, prompt, model):
+            yield chunk
+
+    def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
+        max_tokens = self._chunk_tokens(prompt, model)
+        if estimate_tokens(text) <= max_tokens:
+            return self.processor.process_text_sync(text, prompt, model)
+        chunks = split_text(text, max_tokens)
+        map_prompt = self.map_prompt or prompt
+        outputs = [self.processor.process_text_sync(chunk, map_prompt, model) for chunk in chunks]
+        if self.map_prompt is None:
+            return self.separator.join(outputs)
+        return self.processor.process_text_sync(self.separator.join(outputs), prompt, model)
+
+class LatencyTracker:
+    """
+    Sliding window of recent time-to-first-chunk samples of one upstream model.
+    """
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> dict:
+        return {
+            "samples": len(self._samples),
+            **{f"p{round(q * 100)}_ms": round(value * 1000, 1) if value is not None else None
+               for q in (0.5, 0.95, 0.99) for value in [self.quantile(q)]}
+        }
+
+_latency_trackers: Dict[str, LatencyTracker] = {}
+
+def get_latency_tracker(name: str) -> LatencyTracker:
+    """
+    Returns the shared time-to-first-chunk tracker of a "provider/model" name.
+    """
+    with _registry_lock:
+        return _latency_trackers.setdefault(name, LatencyTracker())
+
+class HedgedProcessor(LLMProcessor):
+    """
+    Streams the answer of whichever of several interchangeable processors responds first.
+
+    `candidates` are (name, processor) pairs in order of preference. The
+    primary gets a head start of `hedge_delay()`: the `quantile` of its recent
+    time to first chunk, clamped to [`min_delay`, `max_delay`] (`delay` until
+    `min_samples` are known). If it has not produced a chunk by then, the same
+    request also goes to the next candidate; the first to yield is streamed and
+    the other is cancelled. A candidate that fails before its first chunk is
+    replaced by the next one right away.
+
+    Hedging is limited to a `budget` fraction of requests, so a slow provider
+    cannot double the cost: every request earns `budget` of a hedge once its
+    race is decided (at most `max_budget_tokens` are saved up), and the bucket
+    starts empty, so a fresh worker has to serve requests before it may hedge
+    any. Failovers are not limited. Errors after the first
+    chunk are raised, since part of the answer has already been streamed.
+    """
+    def __init__(self, candidates: List[Tuple[str, LLMProcessor]], delay: float = LLM_HEDGE_DELAY,
+                 min_delay: float = LLM_HEDGE_MIN_DELAY, max_delay: float = LLM_HEDGE_MAX_DELAY,
+                 quantile: float = LLM_HEDGE_QUANTILE, budget: float = LLM_HEDGE_BUDGET,
+                 min_samples: int = 20, max_budget_tokens: float = 5.0):
+        self.candidates = candidates
+        self.default_model = candidates[0][1].default_model
+        self.delay = delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.max_budget_tokens = max_budget_tokens
+        self._budget_tokens = 0.0  # Each decided request adds `budget`, each hedge takes one
+        self._trackers = [get_latency_tracker(name) for name, _ in candidates]
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self.budget_exhausted = 0
+
+    def hedge_delay(self) -> float:
+        tracker = self._trackers[0]
+        if len(tracker) < self.min_samples:
+            return self.delay
+        return min(self.max_delay, max(self.min_delay, tracker.quantile(self.quantile)))
+
+    def _event(self, event: str):
+        LLM_HEDGE_EVENTS.inc(model=self.candidates[0][0], event=event)
+
+    async def _race(self, text: str, prompt: str, model: Optional[str]) -> Tuple[int, AsyncGenerator[str, None], Optional[str]]:
+        """
+        Returns the winning candidate's index, its generator and first chunk (None for an empty answer).
+        """
+        racing = {}  # First-chunk task -> (candidate index, generator, start time)
+        next_index = 0
+        last_error = None
+        may_hedge = len(self.candidates) > 1
+        hedged = False
+        delay = self.hedge_delay()
+        deadline = time.perf_counter() + delay
+
+        def start_next():
+            nonlocal next_index
+            _, processor = self.candidates[next_index]
+            # The requested model only applies to the primary; backups use their own
+            generator = processor.process_text(text, prompt, model if next_index == 0 else None)
+            task = asyncio.ensure_future(generator.__anext__())
+            racing[task] = (next_index, generator, time.perf_counter())
+            next_index += 1
+
+        start_next()
+        try:
+            while racing:
+                timeout = max(0.0, deadline - time.perf_counter()) if may_hedge else None
+                done, _ = await asyncio.wait(racing, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    may_hedge = False
+                    if self._budget_tokens < 1.0:
+                        self.budget_exhausted += 1
+                        self._event("budget_exhausted")
+                    elif next_index < len(self.candidates):
+                        self._budget_tokens -= 1.0
+                        hedged = True
+                        self.hedged += 1
+                        self._event("hedged")
+                        logger.info(f"No first chunk from {self.candidates[0][0]} after {delay:.2f}s, "
+                                    f"hedging with {self.candidates[next_index][0]}")
+                        start_next()
+                    continue
+                for task in done:
+                    index, generator, started = racing.pop(task)
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        first = None
+                    except Exception as e:
+                        last_error = e
+                        if index == 0:
+                            may_hedge = False  # The failover below replaces the hedge
+                        if next_index < len(self.candidates):
+                            self.failovers += 1
+                            self._event("failover")
+                            logger.warning(f"{self.candidates[index][0]} failed before its first chunk ({e}), "
+                                           f"failing over to {self.candidates[next_index][0]}")
+                            start_next()
+                        continue
+                    self._trackers[index].observe(time.perf_counter() - started)
+                    if hedged and index > 0:
+                        self.hedge_wins += 1
+                        self._event("hedge_won")
+                    return index, generator, first
+            raise last_error
+        finally:
+            losers = list(racing.items())
+            for task, _ in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*(task for task, _ in losers), return_exceptions=True)
+            now = time.perf_counter()
+            for task, (index, generator, started) in losers:
+                # A loser cancelled before answering still tells us its latency is at least this long
+                if task.cancelled() or task.exception() is None:
+                    self._trackers[index].observe(now - started)
+                await generator.aclose()
+
+    async def process_text(self, text: str, prompt: str, model: Optional[str] = None) -> AsyncGenerator[str, None]:
+        self.requests += 1
+        try:
+            _, generator, first = await self._race(text, prompt, model)
+        finally:
+            # Credited afterwards, so a burst of requests cannot hedge on credit none of them has earned yet
+            self._budget_tokens = min(self.max_budget_tokens, self._budget_tokens + self.budget)
+        try:
+            if first is None:
+                return
+            yield first
+            async for chunk in generator:
+                yield chunk
+        finally:
+            await generator.aclose()
+
+    def process_text_sync(self, text: str, prompt: str, model: Optional[str] = None) -> str:
+        last_error = None
+        for index, (name, processor) in enumerate(self.candidates):
+            try:
+                return processor.process_text_sync(text, prompt, model if index == 0 else None)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"{name} failed ({e}), trying the next model")
+        raise last_error
+
+    def stats(self) -> dict:
+        return {
+            "candidates": [name for name, _ in self.candidates],
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 1),
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "budget_exhausted": self.budget_exhausted,
+        }
+
+_response_cache: Optional[LLMResponseCache] = None
+
+def get_llm_response_cache() -> LLMResponseCache:
+    global _response_cache
+    with _registry_lock:
+        if _response_cache is None:
+            _response_cache = LLMResponseCache(
+                max_entries=LLM_CACHE_MAX_ENTRIES,
+                max_bytes=LLM_CACHE_MAX_BYTES,
+                ttl=LLM_CACHE_TTL,
+                db_path=LLM_CACHE_DB
+            )
+        return _response_cache
+
+_processors: Dict[Tuple[str, str], LLMProcessor] = {}
+_backend_factory: Optional[Callable[[str, str], LLMProcessor]] = None
+_provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+def get_provider_concurrency(provider: str) -> int:
+    return int(os.getenv(f"LLM_MAX_CONCURRENCY_{provider.upper()}", LLM_MAX_CONCURRENCY))
+
+def _get_provider_semaphore(provider: str) -> asyncio.Semaphore:
+    with _registry_lock:
+        if provider not in _provider_semaphores:
+            _provider_semaphores[provider] = asyncio.Semaphore(get_provider_concurrency(provider))
+        return _provider_semaphores[provider]
+
+def _create_llm_processor(provider: str, model_name: str) -> LLMProcessor:
+    if provider == 'gpt':
+        return GPTProcessor(default_model=model_name)
+    elif provider == 'gemini':
+        return GeminiProcessor(default_model=model_name)
+    else:
+        return DeepSeekProcessor(default_model=model_name)
+
+def get_llm_provider(model_name: str) -> str:
+    """
+    Maps a model name to its provider: 'gpt', 'gemini' or 'deepseek'.
+    """
+    model_name_lower = model_name.lower()
+    if model_name_lower.startswith(('gpt-', 'o1-')):
+        # Note: 'o1-mini' is a specific model, but we can treat it as part of GPT family for now.
+        return 'gpt'
+    elif model_name_lower.startswith('gemini'):
+        return 'gemini'
+    elif model_name_lower.startswith('deepseek'):
+        return 'deepseek'
+    else:
+        # Default to GPT if no specific provider is identified, for backward compatibility.
+        logger.warning(f"Unsupported or unrecognized model type: '{model_name}'. Defaulting to GPTProcessor.")
+        return 'gpt'
+
+def _get_model_processor(model_name: str) -> LLMProcessor:
+    key = (get_llm_provider(model_name), model_name)
+    processor = _processors.get(key)
+    if processor is None:
+        processor = InstrumentedProcessor((_backend_factory or _create_llm_processor)(*key), key[0])
+        processor = ConcurrencyLimitedProcessor(processor, _get_provider_semaphore(key[0]), key[0])
+        # Cache outside the limit so hits never wait for a concurrency slot
+        processor = CachedProcessor(processor, key[0], get_llm_response_cache())
+        # Budget check outermost: oversized prompts fail fast, and trimmed ones are cached as sent
+        processor = TokenBudgetProcessor(processor)
+        with _registry_lock:
+            processor = _processors.setdefault(key, processor)
+    return processor
+
 def get_llm_processor(model_name: str) -> LLMProcessor:
     """
     Factory function to get the appropriate LLM processor based on the model name.
 
+    Processors are created once per (provider, model) and reused, so their HTTP
+    connection pools stay warm across requests. Streaming calls are limited to
+    `get_provider_concurrency(provider)` concurrent requests per provider, and
+    identical requests are answered from the shared LLMResponseCache. Prompts
+    over the model's TokenBudget are rejected or trimmed up front. Upstream
+    latency and outcomes are recorded by InstrumentedProcessor. With
+    LLM_HEDGE_MODELS set, the model is wrapped in a HedgedProcessor together
+    with the backup models of other providers.
+
     Args:
         model_name (str): The name of the model (e.g., 'gpt-4o', 'gemini-1.5-pro', 'deepseek-chat').
 
@@ -130,15 +1193,87 @@ def get_llm_processor(model_name: str) -> LLMProcessor:
     Raises:
         ValueError: If the model type is unsupported.
     """
-    model_name_lower = model_name.lower()
-    if model_name_lower.startswith(('gpt-', 'o1-')):
-        # Note: 'o1-mini' is a specific model, but we can treat it as part of GPT family for now.
-        return GPTProcessor(default_model=model_name)
-    elif model_name_lower.startswith('gemini'):
-        return GeminiProcessor(default_model=model_name)
-    elif model_name_lower.startswith('deepseek'):
-        return DeepSeekProcessor(default_model=model_name)
-    else:
-        # Default to GPT if no specific provider is identified, for backward compatibility.
-        logger.warning(f"Unsupported or unrecognized model type: '{model_name}'. Defaulting to GPTProcessor.")
-        return GPTProcessor(default_model=model_name)
+    provider = get_llm_provider(model_name)
+    backups = [m for m in LLM_HEDGE_MODELS if get_llm_provider(m) != provider]
+    if not backups:
+        return _get_model_processor(model_name)
+
+    key = ("hedged", model_name)
+    processor = _processors.get(key)
+    if processor is None:
+        candidates = [(f"{provider}/{model_name}", _get_model_processor(model_name))]
+        for backup in backups:
+            try:
+                candidates.append((f"{get_llm_provider(backup)}/{backup}", _get_model_processor(backup)))
+            except Exception as e:
+                # E.g. no API key for that provider: hedge with the remaining backups
+                logger.warning(f"Backup model '{backup}' unavailable, not hedging with it: {e}")
+        if len(candidates) == 1:
+            return candidates[0][1]
+        processor = HedgedProcessor(candidates)
+        with _registry_lock:
+            processor = _processors.setdefault(key, processor)
+    return processor
+
+def warm_up_llm_processors(model_names: List[str]) -> Dict[str, str]:
+    """
+    Creates the processors of `model_names` ahead of their first request, which imports
+    their provider SDK and builds its HTTP clients. Safe to call from a worker thread.
+
+    Returns "ok" or the error per model; a model that cannot be created (e.g. no API key)
+    is logged and skipped, and fails again on its first real request.
+    """
+    results = {}
+    for model_name in model_names:
+        try:
+            get_llm_processor(model_name)
+            results[model_name] = "ok"
+        except Exception as e:
+            logger.warning(f"LLM warm-up: model '{model_name}' unavailable: {e}")
+            results[model_name] = str(e)
+    return results
+
+def get_llm_hedging_stats() -> dict:
+    """
+    Time to first chunk per upstream model, and the hedge counters of every hedged model.
+    """
+    with _registry_lock:
+        trackers = dict(_latency_trackers)
+        hedged = {key[1]: processor for key, processor in _processors.items() if key[0] == "hedged"}
+    return {
+        "backup_models": LLM_HEDGE_MODELS,
+        "budget": LLM_HEDGE_BUDGET,
+        "latency": {name: tracker.stats() for name, tracker in trackers.items()},
+        "hedged": {model: processor.stats() for model, processor in hedged.items()},
+    }
+
+def set_llm_backend(factory: Optional[Callable[[str, str], LLMProcessor]]):
+    """
+    Replaces how upstream processors are created, e.g. with a fake for offline load tests.
+
+    `factory(provider, model_name)` returns the innermost processor; instrumentation,
+    concurrency limits and the response cache still wrap it. Pass None to restore
+    the real providers. Processors created before the call are discarded.
+    """
+    global _backend_factory
+    with _registry_lock:
+        _backend_factory = factory
+        _processors.clear()
+        _latency_trackers.clear()
+
+async def close_llm_processors():
+    """
+    Closes the shared HTTP clients and response cache and forgets all cached processors. Call on shutdown.
+    """
+    global _response_cache
+    with _registry_lock:
+        clients = list(_openai_clients.values())
+        _openai_clients.clear()
+        _processors.clear()
+        _provider_semaphores.clear()
+        cache, _response_cache = _response_cache, None
+    if cache is not None:
+        cache.close()
+    for async_client, sync_client in clients:
+        await async_client.close()
+        sync_client.close()
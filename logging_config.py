@@ -0,0 +1,152 @@
+import atexit
+import hashlib
+import json
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import metrics
+
+LOG_RECORDS_DROPPED = metrics.counter(
+    "stt_log_records_dropped_total", "Log records dropped because the logging queue was full")
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[QueueListener] = None
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the background writer thread without ever blocking the caller.
+
+    When the writer falls behind and the queue is full, new records are dropped and
+    counted rather than stalling the event loop on log I/O.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Stamped here, on the caller's thread, where the request's context is visible
+        record.request_id = metrics.request_id_var.get()
+        return super().prepare(record)
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, for log shippers.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(level: int = logging.INFO, fmt: str = "text", queue_size: int = 10000,
+                  stream=None) -> NonBlockingQueueHandler:
+    """
+    Routes all logging through a bounded queue drained by a background thread.
+
+    Log calls on the event loop only format the message and enqueue it; writing
+    to the terminal or file happens on the listener thread. `fmt` is "text" (the
+    classic one-line format) or "json". Returns the queue handler, whose
+    `dropped` attribute counts records lost to a full queue.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    sink = logging.StreamHandler(stream or sys.stderr)
+    sink.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, sink, respect_handler_level=True)
+    _listener.start()
+    return handler
+
+
+def shutdown_logging():
+    """
+    Flushes queued records and stops the writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+class LogSampler:
+    """
+    Lets through the first of every `every` events, and at most one per `interval` seconds.
+
+    Use it to keep per-frame and per-partial logs from flooding the log under load:
+        if sampler.should_log():
+            logger.debug(...)
+    `suppressed` counts the events skipped since the last one that was logged.
+    """
+
+    def __init__(self, every: int = 100, interval: float = 1.0):
+        self.every = max(1, every)
+        self.interval = interval
+        self.suppressed = 0
+        self._count = 0
+        self._last = float("-inf")
+
+    def should_log(self) -> bool:
+        self._count += 1
+        now = time.monotonic()
+        if (self._count - 1) % self.every == 0 and now - self._last >= self.interval:
+            self._last = now
+            return True
+        self.suppressed += 1
+        return False
+
+    def take_suppressed(self) -> int:
+        suppressed, self.suppressed = self.suppressed, 0
+        return suppressed
+
+
+def summarize_text(text: str, max_chars: int = 0) -> str:
+    """
+    A log-safe stand-in for a prompt or transcript.
+
+    Shows the length and a short hash (enough to tell whether two requests were
+    identical), plus the first `max_chars` characters when that is positive.
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+    summary = f"<{len(text)} chars, sha256 {digest}>"
+    if max_chars > 0:
+        preview = text[:max_chars].replace("\n", " ")
+        summary = f"{preview!r}{'…' if len(text) > max_chars else ''} {summary}"
+    return summary
@@ -27,4 +27,11 @@ PROMPTS = {
 你的回答无需详尽或过于细节，核心目标是启发思考，并能轻松有效地打动读者。请大胆采用出人意料且富有创意的角度。
 
 请用简体中文回复。""",
+
+    'readability-context': """以下是前文已经整理好的内容，仅用于保持上下文连贯，不要重复输出：
+{context}
+
+请只整理下面这段新内容：""",
+
+    'chunk-summary': """以下是一段较长语音转写文本中的一部分。请提炼这一部分的主要内容和关键观点，保留重要的事实、数字和结论，使用与原文相同的语言，直接输出要点，不要添加额外说明：""",
 }
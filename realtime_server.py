@@ -1,35 +1,49 @@
 import asyncio
 import json
 import os
-import numpy as np
-from fastapi import FastAPI, WebSocket, Request, HTTPException
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, Form, Query, WebSocket, Request, HTTPException, UploadFile
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 import uvicorn
 import logging
+import metrics
+from logging_config import LogSampler, setup_logging, summarize_text
 from prompts import PROMPTS
-from tencent_asr_client import TencentASRClient # Replaced OpenAI client
+from tencent_asr_client import ASRCapacityError, ASRSession, ASRSessionManager, AudioSendQueue, TencentASRConnectionPool, TranscriptState # Replaced OpenAI client
+from audio_processor import AudioProcessor, DSPExecutor, opus_supported, warm_up_dsp
+from batch_transcriber import AudioFile, BatchQueueFullError, BatchTranscriber
+from event_bus import create_event_bus
+from transcript_store import TranscriptStore
 from starlette.websockets import WebSocketState
-import wave
 import datetime
-import scipy.signal
-from openai import OpenAI, AsyncOpenAI
 from pydantic import BaseModel, Field
 from typing import Generator, Optional
-from llm_processor import get_llm_processor
+from llm_processor import (ChunkedProcessor, IncrementalEnhancer, PromptTooLargeError, close_llm_processors, coalesce_chunks,
+                           get_llm_hedging_stats, get_llm_processor, get_llm_response_cache, route_model,
+                           warm_up_llm_processors)
 from datetime import datetime, timedelta
 import websockets.exceptions
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging: records are queued and written by a background thread, so log I/O
+# never blocks the event loop; LOG_FORMAT=json writes one JSON object per line
+setup_logging(
+    level=getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO),
+    fmt=os.getenv("LOG_FORMAT", "text"),
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 )
 logger = logging.getLogger(__name__)
 
+# Transcripts are logged as length + hash; set to show that many leading characters as well
+LOG_TRANSCRIPT_CHARS = int(os.getenv("LOG_TRANSCRIPT_CHARS", "0"))
+
 # Pydantic models for request and response schemas
 class ReadabilityRequest(BaseModel):
-    text: str = Field(..., description="The text to improve readability for.")
+    text: str = Field("", description="The text to improve readability for.")
+    session_id: Optional[str] = Field(None, description="Use the transcript of this recording instead of `text`.")
     prompt: Optional[str] = Field(None, description="Custom prompt for readability enhancement.")
     model: Optional[str] = Field(None, description="LLM model name, e.g. 'deepseek-chat' or 'deepseek-reasoner'.")
 
@@ -37,7 +51,8 @@ class ReadabilityResponse(BaseModel):
     enhanced_text: str = Field(..., description="The text with improved readability.")
 
 class CorrectnessRequest(BaseModel):
-    text: str = Field(..., description="The text to check for factual correctness.")
+    text: str = Field("", description="The text to check for factual correctness.")
+    session_id: Optional[str] = Field(None, description="Use the transcript of this recording instead of `text`.")
     prompt: Optional[str] = Field(None, description="Custom prompt for correctness checking.")
     model: Optional[str] = Field(None, description="LLM model name, e.g. 'deepseek-chat' or 'deepseek-reasoner'.")
 
@@ -45,14 +60,13 @@ class CorrectnessResponse(BaseModel):
     analysis: str = Field(..., description="The factual correctness analysis.")
 
 class AskAIRequest(BaseModel):
-    text: str = Field(..., description="The question to ask AI.")
+    text: str = Field("", description="The question to ask AI.")
+    session_id: Optional[str] = Field(None, description="Use the transcript of this recording instead of `text`.")
     model: Optional[str] = Field(None, description="LLM model name, e.g. 'deepseek-chat' or 'deepseek-reasoner'.")
 
 class AskAIResponse(BaseModel):
     answer: str = Field(..., description="AI's answer to the question.")
 
-app = FastAPI()
-
 # --- Environment Variable Configuration ---
 TENCENT_APP_ID = os.getenv("TENCENT_APP_ID")
 TENCENT_SECRET_ID = os.getenv("TENCENT_SECRET_ID")
@@ -63,102 +77,276 @@ if not all([TENCENT_APP_ID, TENCENT_SECRET_ID, TENCENT_SECRET_KEY]):
     logger.error(error_msg)
     raise EnvironmentError(error_msg)
 
+# Optional override of the ASR endpoint, e.g. a local fake server for offline testing
+TENCENT_ASR_BASE_URL = os.getenv("TENCENT_ASR_BASE_URL")
+
+# Session metadata and transcript events are shared through the bus, so with several
+# workers (or nodes) any of them can serve the LLM endpoints for a recording
+EVENT_BUS_URL = os.getenv("EVENT_BUS_URL", "memory://")
+SESSION_TTL = int(os.getenv("SESSION_TTL", "86400"))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+event_bus = create_event_bus(EVENT_BUS_URL)
+
+# Finalized sentences and LLM results of every recording are kept in SQLite (written in
+# batches by a background thread) and can be listed and searched via /api/v1/sessions;
+# disabled unless a database path is set
+TRANSCRIPT_DB = os.getenv("TRANSCRIPT_DB", "")
+transcript_store = TranscriptStore(
+    TRANSCRIPT_DB,
+    max_queued=int(os.getenv("TRANSCRIPT_STORE_MAX_QUEUED", "100000"))
+) if TRANSCRIPT_DB else None
+
+# Shared pool for audio DSP so resampling never blocks the event loop
+dsp_executor = DSPExecutor(
+    max_workers=int(os.getenv("DSP_EXECUTOR_WORKERS", "4")),
+    max_pending=int(os.getenv("DSP_EXECUTOR_MAX_PENDING", "64"))
+)
+
+# Warm, pre-signed Tencent ASR sessions handed out on start_recording
+asr_pool = TencentASRConnectionPool(
+    app_id=TENCENT_APP_ID,
+    secret_id=TENCENT_SECRET_ID,
+    secret_key=TENCENT_SECRET_KEY,
+    size=int(os.getenv("ASR_POOL_SIZE", "2")),
+    max_idle=float(os.getenv("ASR_POOL_MAX_IDLE", "10")),
+    base_url=TENCENT_ASR_BASE_URL
+)
+
+# Every upstream ASR session goes through the manager, which caps how many run at once
+asr_sessions = ASRSessionManager(
+    asr_pool,
+    max_sessions=int(os.getenv("ASR_MAX_SESSIONS", "200")),
+    max_waiting=int(os.getenv("ASR_MAX_WAITING", "20")),
+    queue_timeout=float(os.getenv("ASR_QUEUE_TIMEOUT", "10")),
+    # Dropped upstream connections are re-established and the recent audio replayed
+    reconnect_attempts=int(os.getenv("ASR_RECONNECT_ATTEMPTS", "5")),
+    replay_ms=int(os.getenv("ASR_REPLAY_BUFFER_MS", "15000"))
+)
 
-# Initialize with DeepSeek as the default LLM
-llm_processor = get_llm_processor("deepseek-chat")
+async def publish_batch_status(job):
+    if transcript_store:
+        transcript_store.save_session(job.job_id, kind="batch", status=job.status, started_at=job.created_at,
+                                      ended_at=job.finished_at, filename=job.filename,
+                                      duration=round(job.duration, 2), error=job.error)
+        if job.status == "finished" and job.enhanced_text:
+            transcript_store.add_output(job.job_id, "readability", job.enhanced_text)
+    try:
+        await event_bus.set_session(job.job_id, {
+            "status": job.status, "kind": "batch", "worker": WORKER_ID, **job.to_dict(include_result=False)
+        }, SESSION_TTL)
+        await event_bus.publish(job.job_id, {"type": "status", "status": job.status})
+    except Exception as e:
+        logger.warning(f"Failed to publish batch job {job.job_id} to the event bus: {e}")
+
+async def publish_batch_sentence(job, sentence):
+    if transcript_store:
+        transcript_store.add_segment(job.job_id, sentence["index"], sentence["text"],
+                                     sentence.get("start_ms"), sentence.get("end_ms"))
+    try:
+        await event_bus.append_transcript(job.job_id, sentence["text"], SESSION_TTL)
+        await event_bus.publish(job.job_id, {"type": "sentence", **sentence})
+    except Exception as e:
+        logger.warning(f"Failed to publish sentence of batch job {job.job_id} to the event bus: {e}")
+
+# Uploaded recordings are cut into segments that are streamed to ASR in parallel, faster than real time;
+# job IDs double as session IDs on the event bus
+batch_transcriber = BatchTranscriber(
+    asr_sessions,
+    dsp_executor,
+    max_jobs=int(os.getenv("BATCH_MAX_JOBS", "2")),
+    max_queued=int(os.getenv("BATCH_MAX_QUEUED", "20")),
+    parallel_segments=int(os.getenv("BATCH_PARALLEL_SEGMENTS", "4")),
+    segment_seconds=float(os.getenv("BATCH_SEGMENT_SECONDS", "300")),
+    speed=float(os.getenv("BATCH_SPEED", "4")),
+    packet_ms=int(os.getenv("BATCH_PACKET_MS", "200")),
+    handlers={"on_status": publish_batch_status, "on_sentence": publish_batch_sentence}
+)
+
+# Provider SDKs and scipy.signal are imported on first use, so the server starts serving right
+# away and without LLM keys; WARMUP loads them in a background thread right after startup (and
+# creates the WARMUP_MODELS clients), so the first recording or LLM request does not wait for it
+WARMUP_ENABLED = os.getenv("WARMUP", "true").lower() in ("1", "true", "yes")
+WARMUP_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", "deepseek-chat").split(",") if m.strip()]
+warmup_state = {"status": "pending" if WARMUP_ENABLED else "disabled", "seconds": None, "models": {}}
+
+def warm_up():
+    start = time.perf_counter()
+    warmup_state["status"] = "running"
+    try:
+        warm_up_dsp()
+        warmup_state["models"] = warm_up_llm_processors(WARMUP_MODELS)
+        warmup_state["status"] = "finished"
+    except Exception as e:
+        # Nothing is lost: whatever did not load is loaded by its first request instead
+        logger.warning(f"Warm-up failed: {e}")
+        warmup_state["status"] = "failed"
+    warmup_state["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"Warm-up {warmup_state['status']} in {warmup_state['seconds']:.2f}s")
+
+# WebSocket protocol versions: 1 sends the full current sentence on every partial result,
+# 2 sends "text_delta" messages (replace-from-offset) against the whole transcript
+MAX_PROTOCOL_VERSION = 2
+
+# Audio formats accepted on /api/v1/ws, negotiated via "audio_format" in start_recording
+AUDIO_FORMATS = ["pcm16", "pcm16_framed"] + (["opus_framed"] if opus_supported() else [])
+
+# Server-side VAD drops silence before it reaches ASR; off unless enabled here or per recording with
+# "vad", so clients that do not send it keep getting the audio they always sent
+VAD_ENABLED = os.getenv("VAD_ENABLED", "false").lower() in ("1", "true", "yes")
+vad_totals = {"recordings": 0, "audio_ms": 0, "speech_ms": 0, "sent_ms": 0}
+
+# Per-session audio buffering towards Tencent ASR
+ASR_AUDIO_BUFFER_MS = int(os.getenv("ASR_AUDIO_BUFFER_MS", "10000"))
+ASR_AUDIO_OVERFLOW = os.getenv("ASR_AUDIO_OVERFLOW", "drop_oldest")
+ASR_PACKET_MS = int(os.getenv("ASR_PACKET_MS", "40"))
+
+# With TRACE_ENABLED, ASR connects, LLM calls and HTTP requests are logged as JSON spans
+# on the "stt.trace" logger, tagged with the request ID or recording's session_id
+metrics.configure_tracing(os.getenv("TRACE_ENABLED", "false").lower() in ("1", "true", "yes"))
+
+# Prometheus metrics on /metrics; every uvicorn worker keeps its own registry
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "stt_http_request_seconds", "Time until the response headers of HTTP requests are sent", ("method", "route", "status"))
+WS_CONNECTIONS = metrics.gauge("stt_websocket_connections", "Open browser WebSocket connections")
+RECORDINGS = metrics.counter("stt_recordings_total", "Recordings started over the WebSocket")
+FIRST_PARTIAL_SECONDS = metrics.histogram(
+    "stt_asr_first_partial_seconds", "Time from the first audio frame of a recording to its first recognized text")
+FINALIZE_SECONDS = metrics.histogram(
+    "stt_asr_finalize_seconds", "Time from stop_recording to the final ASR result")
+VAD_AUDIO_SECONDS = metrics.counter(
+    "stt_vad_audio_seconds_total", "Audio seen by the server-side VAD (audio), detected as speech, and sent to ASR", ("kind",))
+metrics.gauge("stt_dsp_pending_jobs", "Audio DSP jobs submitted and not yet finished", lambda: dsp_executor.pending)
+metrics.gauge("stt_asr_sessions_active", "Open upstream ASR sessions", lambda: asr_sessions.active)
+metrics.gauge("stt_asr_sessions_waiting", "Recordings waiting for a free ASR session slot", lambda: asr_sessions.waiting)
+metrics.gauge("stt_asr_pool_idle", "Warm ASR connections waiting in the pool", lambda: asr_pool.stats()["idle"])
+metrics.gauge("stt_llm_cache_entries", "Entries in the in-memory LLM response cache",
+              lambda: get_llm_response_cache().stats()["entries"])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asr_pool.start()
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up)) if WARMUP_ENABLED else None
+    yield
+    if warmup and not warmup.done():
+        # The thread itself cannot be interrupted; it finishes on its own before the process exits
+        warmup.cancel()
+    await batch_transcriber.close()
+    await asr_sessions.close()
+    await asr_pool.close()
+    dsp_executor.shutdown()
+    await close_llm_processors()
+    if transcript_store:
+        await asyncio.to_thread(transcript_store.close)
+    await event_bus.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Reuse the caller's X-Request-ID so logs and spans can be joined across services
+    request_id = request.headers.get("x-request-id") or metrics.new_request_id()
+    token = metrics.request_id_var.set(request_id)
+    start = time.perf_counter()
+    status = 500
+    try:
+        with metrics.span("http.request", method=request.method, path=request.url.path) as attributes:
+            response = await call_next(request)
+            status = attributes["status_code"] = response.status_code
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=str(status))
+        metrics.request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 @app.get("/", response_class=HTMLResponse)
 async def get_realtime_page(request: Request):
     return FileResponse("static/realtime.html")
 
-class AudioProcessor:
-    def __init__(self, target_sample_rate=16000): # Changed to 16kHz for Tencent ASR
-        self.target_sample_rate = target_sample_rate
-        self.source_sample_rate = 48000  # Most common sample rate for microphones
-        
-    def process_audio_chunk(self, audio_data):
-        # Convert binary audio data to Int16 array
-        pcm_data = np.frombuffer(audio_data, dtype=np.int16)
-        
-        # Convert to float32 for better precision during resampling
-        float_data = pcm_data.astype(np.float32) / 32768.0
-        
-        # Resample from 48kHz to 16kHz
-        resampled_data = scipy.signal.resample_poly(
-            float_data, 
-            self.target_sample_rate, 
-            self.source_sample_rate
-        )
-        
-        # Convert back to int16 while preserving amplitude
-        resampled_int16 = (resampled_data * 32768.0).clip(-32768, 32767).astype(np.int16)
-        return resampled_int16.tobytes()
-
-    def save_audio_buffer(self, audio_buffer, filename):
-        with wave.open(filename, 'wb') as wf:
-            wf.setnchannels(1)  # Mono audio
-            wf.setsampwidth(2)  # 2 bytes per sample (16-bit)
-            wf.setframerate(self.target_sample_rate)
-            wf.writeframes(b''.join(audio_buffer))
-        logger.info(f"Saved audio buffer to {filename}")
-
 @app.websocket("/api/v1/ws")
 async def websocket_endpoint(websocket: WebSocket):
     logger.info("New WebSocket connection attempt")
     await websocket.accept()
     logger.info("WebSocket connection accepted")
+    WS_CONNECTIONS.inc()
     
     await websocket.send_text(json.dumps({
         "type": "status",
-        "status": "idle"
+        "status": "idle",
+        "audio_formats": AUDIO_FORMATS
     }))
     
-    client: TencentASRClient = None
+    client: ASRSession = None
     audio_processor = AudioProcessor()
     recording_stopped = asyncio.Event()
     asr_ready = asyncio.Event()
-    pending_audio_chunks = [] # Buffer for audio chunks before ASR is ready
+    # Bounded buffer drained by its own sender task; also holds audio until ASR is ready
+    audio_queue = AudioSendQueue(
+        packet_ms=ASR_PACKET_MS,
+        max_buffer_ms=ASR_AUDIO_BUFFER_MS,
+        overflow=ASR_AUDIO_OVERFLOW
+    )
+    # Optional live readability enhancement of finalized sentences
+    enhancer: IncrementalEnhancer = None
+    enhancer_finish_task = None
+    transcript = TranscriptState()
+    protocol_version = 1  # Negotiated per recording in start_recording
+    session_id = None  # Bus key of the current recording
+    # Latency marks of the current recording (perf_counter seconds)
+    first_audio_at = None
+    first_text_seen = False
+    stop_requested_at = None
+    # ASR results arrive several times a second per recording; only a sample is logged
+    result_log = LogSampler(every=50, interval=5.0)
     
     async def initialize_asr():
         nonlocal client
         try:
             asr_ready.clear()
+            await audio_queue.stop()
+            if client:
+                # A new recording started without the previous one finishing
+                await client.close()
+                client = None
             
-            client = TencentASRClient(
-                app_id=TENCENT_APP_ID,
-                secret_id=TENCENT_SECRET_ID,
-                secret_key=TENCENT_SECRET_KEY
-            )
-            
-            # Register handlers for Tencent ASR events BEFORE connecting
-            client.register_handler("on_result", handle_asr_result)
-            client.register_handler("on_error", handle_asr_error)
-            client.register_handler("on_close", handle_asr_close)
-            
-            await client.connect()
+            # The manager admits the session (or queues/rejects it) and takes an
+            # already-handshaken connection from the pool; handlers are registered
+            # before any audio is sent
+            with metrics.span("asr.open_session") as attributes:
+                client = await asr_sessions.open_session({
+                    "on_result": handle_asr_result,
+                    "on_error": handle_asr_error,
+                    "on_close": handle_asr_close,
+                    "on_reconnecting": handle_asr_reconnecting,
+                    "on_reconnected": handle_asr_reconnected
+                })
+                attributes["queue_wait_ms"] = round(client.queue_wait * 1000, 1)
             logger.info("Successfully connected to Tencent ASR client")
             
-            # Wait a brief moment for the connection to stabilize
-            await asyncio.sleep(0.1)
-            
-            # The connection is established, mark as ready
+            # The handshake has been acknowledged, mark as ready
             asr_ready.set()
 
-            # Send any buffered chunks immediately after connection
-            if pending_audio_chunks:
-                logger.info(f"Sending {len(pending_audio_chunks)} buffered audio chunks...")
-                for chunk in pending_audio_chunks:
-                    await client.send_audio(chunk)
-                pending_audio_chunks.clear()
-                logger.info("Buffered chunks sent.")
+            # Start draining buffered and incoming audio to Tencent
+            audio_queue.start(client.send_audio)
 
             await websocket.send_text(json.dumps({
                 "type": "status",
-                "status": "connected"
+                "status": "connected",
+                "protocol_version": protocol_version,
+                "session_id": session_id
             }))
             return True
+        except ASRCapacityError as e:
+            logger.warning(f"ASR session rejected: {e}")
+            await websocket.send_text(json.dumps({
+                "type": "error",
+                "content": "服务繁忙，请稍后再试"
+            }))
+            await websocket.send_text(json.dumps({"type": "status", "status": "idle"}))
+            return False
         except Exception as e:
             logger.error(f"Failed to connect to Tencent ASR: {e}", exc_info=True)
             asr_ready.clear()
@@ -168,21 +356,109 @@ async def websocket_endpoint(websocket: WebSocket):
             }))
             return False
 
+    async def send_enhanced_chunk(segment, content):
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.send_text(json.dumps({
+                "type": "enhanced_text",
+                "segment": segment,
+                "content": content
+            }))
+
+    async def finish_enhancement(current_enhancer, current_session_id):
+        await current_enhancer.finish()
+        if transcript_store and current_session_id:
+            transcript_store.add_output(current_session_id, "readability", current_enhancer.polished_text,
+                                        model=current_enhancer.processor.default_model)
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.send_text(json.dumps({"type": "enhanced_done"}))
+
+    def schedule_enhancement_finish():
+        nonlocal enhancer_finish_task
+        # Both the final ASR result and an upstream close end the recording; finish only once.
+        # Only the last window is left to polish; don't hold up the ASR receiver for it
+        if enhancer and enhancer_finish_task is None:
+            enhancer_finish_task = asyncio.create_task(finish_enhancement(enhancer, session_id))
+
+    async def start_enhancement(msg):
+        nonlocal enhancer, enhancer_finish_task
+        if enhancer:
+            await enhancer.cancel()
+        enhancer = None
+        enhancer_finish_task = None
+        if msg.get("incremental_enhance"):
+            enhancer = IncrementalEnhancer(
+                get_llm_processor(msg.get("model") or "deepseek-chat"),
+                msg.get("prompt") or PROMPTS['readability-enhance'],
+                on_chunk=send_enhanced_chunk,
+                context_template=PROMPTS['readability-context']
+            )
+            enhancer.start()
+
+    async def publish_session(status, **metadata):
+        if transcript_store:
+            transcript_store.save_session(session_id, kind="recording", status=status, **metadata)
+        # The bus is best-effort: recognition must keep running if it is unavailable
+        try:
+            await event_bus.set_session(session_id, {"status": status, **metadata}, SESSION_TTL)
+            await event_bus.publish(session_id, {"type": "status", "status": status})
+        except Exception as e:
+            logger.warning(f"Failed to publish session {session_id} to the event bus: {e}")
+
+    async def publish_sentence(index, text, start_ms=None, end_ms=None):
+        if transcript_store:
+            transcript_store.add_segment(session_id, index, text, start_ms, end_ms)
+        try:
+            await event_bus.append_transcript(session_id, text, SESSION_TTL)
+            await event_bus.publish(session_id, {"type": "sentence", "index": index, "text": text})
+        except Exception as e:
+            logger.warning(f"Failed to publish sentence of session {session_id} to the event bus: {e}")
+
+    async def finish_session():
+        nonlocal session_id
+        if session_id:
+            await publish_session("finished", ended_at=time.time())
+            session_id = None
+
     async def handle_asr_result(data):
+        nonlocal first_text_seen, stop_requested_at
         if websocket.client_state == WebSocketState.CONNECTED:
-            text = data.get("result", {}).get("voice_text_str", "")
-            if text:
+            result = data.get("result", {})
+            text = result.get("voice_text_str", "")
+            if text and not first_text_seen and first_audio_at is not None:
+                first_text_seen = True
+                FIRST_PARTIAL_SECONDS.observe(time.perf_counter() - first_audio_at)
+            if result.get("slice_type") == 2 and text:
+                # slice_type 2 marks a finalized sentence
+                if enhancer:
+                    enhancer.add_sentence(text)
+                if session_id:
+                    await publish_sentence(result.get("index"), text, result.get("start_time"), result.get("end_time"))
+            delta = transcript.apply(result) if result else None
+            if protocol_version >= 2:
+                if delta:
+                    # UTF-8 instead of \\u escapes roughly halves the bytes for Chinese text
+                    await websocket.send_text(json.dumps({"type": "text_delta", **delta}, ensure_ascii=False))
+            elif text:
                 await websocket.send_text(json.dumps({
                     "type": "text",
                     "content": text,
                     # Tencent ASR provides the full sentence each time, so it's always a "new response" in a way
                     "isNewResponse": True 
                 }))
-                logger.info(f"Handled ASR result: {text}")
+            if text and result_log.should_log():
+                logger.debug(f"ASR result {result.get('index')} (slice_type {result.get('slice_type')}, "
+                             f"{result_log.take_suppressed()} results not logged): "
+                             f"{summarize_text(text, LOG_TRANSCRIPT_CHARS)}")
 
             if data.get("final") == 1:
                 logger.info("Final ASR result received.")
+                if stop_requested_at is not None:
+                    FINALIZE_SECONDS.observe(time.perf_counter() - stop_requested_at)
+                    stop_requested_at = None
                 recording_stopped.set()
+                schedule_enhancement_finish()
+                await finish_session()
+                await audio_queue.stop()
                 if client:
                     await client.close()
 
@@ -196,16 +472,47 @@ async def websocket_endpoint(websocket: WebSocket):
             "content": f"ASR Error: {error_msg} (Details: {full_error})" # Send full details to frontend
         }))
 
+    async def handle_asr_reconnecting(data):
+        logger.warning(f"Tencent ASR connection lost, reconnecting (attempt {data['attempt']}): {data['reason']}")
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.send_text(json.dumps({"type": "status", "status": "connecting"}))
+
+    async def handle_asr_reconnected(data):
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.send_text(json.dumps({
+                "type": "status",
+                "status": "connected",
+                "protocol_version": protocol_version
+            }))
+
     async def handle_asr_close(data):
         logger.warning(f"Tencent ASR connection closed: {data.get('error')}")
         asr_ready.clear()
+        # Without a final result, polish what was recognized so far and send enhanced_done
+        schedule_enhancement_finish()
+        await audio_queue.stop()
+        if client:
+            # Give the session slot back right away
+            await client.close()
         await websocket.send_text(json.dumps({
             "type": "status",
             "status": "idle"
         }))
 
+    async def report_vad_stats():
+        stats = audio_processor.vad.stats()
+        vad_totals["recordings"] += 1
+        for key in ("audio_ms", "speech_ms", "sent_ms"):
+            vad_totals[key] += stats[key]
+        VAD_AUDIO_SECONDS.inc(stats["audio_ms"] / 1000, kind="audio")
+        VAD_AUDIO_SECONDS.inc(stats["speech_ms"] / 1000, kind="speech")
+        VAD_AUDIO_SECONDS.inc(stats["sent_ms"] / 1000, kind="sent")
+        logger.info(f"VAD: {stats['speech_ms']} ms speech of {stats['audio_ms']} ms, sent {stats['sent_ms']} ms to ASR")
+        await websocket.send_text(json.dumps({"type": "vad_stats", **stats}))
+
     async def receive_messages():
-        nonlocal client
+        nonlocal client, transcript, protocol_version, session_id
+        nonlocal first_audio_at, first_text_seen, stop_requested_at
         
         try:
             while True:
@@ -216,41 +523,321 @@ async def websocket_endpoint(websocket: WebSocket):
                 data = await websocket.receive()
                 
                 if "bytes" in data:
-                    processed_audio = audio_processor.process_audio_chunk(data["bytes"])
-                    if asr_ready.is_set() and client:
-                        await client.send_audio(processed_audio)
-                        logger.debug(f"Sent audio chunk to Tencent ASR, size: {len(processed_audio)} bytes")
-                    else:
-                        logger.debug("ASR not ready, buffering audio chunk.")
-                        pending_audio_chunks.append(processed_audio)
+                    if first_audio_at is None:
+                        first_audio_at = time.perf_counter()
+                    try:
+                        payload, sample_rate = audio_processor.unpack_frame(data["bytes"])
+                        if audio_processor.needs_processing(sample_rate):
+                            # Awaiting here keeps frames in order and applies backpressure when the pool is busy
+                            processed_audio = await dsp_executor.run(audio_processor.process_payload, payload, sample_rate)
+                        else:
+                            # Clients that already send 16kHz PCM skip the DSP pool entirely
+                            processed_audio = payload
+                    except ValueError as e:
+                        # A malformed frame (bad header, undecodable Opus, odd-length PCM) is lost audio,
+                        # not a reason to end the recording
+                        audio_processor.drop_frame(e)
+                        continue
+                    # Copies the frame (a view into a reused DSP buffer) into the send queue's ring.
+                    # Only blocks under the "pause" overflow policy; sending happens in the queue's task
+                    if processed_audio:
+                        await audio_queue.put(processed_audio)
                         
                 elif "text" in data:
                     msg = json.loads(data["text"])
                     
                     if msg.get("type") == "start_recording":
                         await websocket.send_text(json.dumps({"type": "status", "status": "connecting"}))
+                        # AudioWorklet clients send 16kHz frames with a small header (optionally Opus-encoded);
+                        # older ones send raw 48kHz PCM
+                        audio_format = msg.get("audio_format", "pcm16")
+                        if audio_format not in AUDIO_FORMATS:
+                            await websocket.send_text(json.dumps({
+                                "type": "error",
+                                "content": f"Unsupported audio format: {audio_format}"
+                            }))
+                            continue
+                        audio_processor.reset(
+                            framed=audio_format != "pcm16",
+                            codec="opus" if audio_format == "opus_framed" else "pcm16",
+                            vad=bool(msg.get("vad", VAD_ENABLED))
+                        )
+                        audio_queue.clear()
+                        transcript = TranscriptState()
+                        protocol_version = max(1, min(int(msg.get("protocol_version", 1)), MAX_PROTOCOL_VERSION))
+                        await finish_session()
+                        session_id = uuid.uuid4().hex
+                        # Spans and tasks started for this recording are tagged with its session_id
+                        metrics.request_id_var.set(session_id)
+                        RECORDINGS.inc()
+                        first_audio_at = None
+                        first_text_seen = False
+                        stop_requested_at = None
+                        await publish_session("recording", worker=WORKER_ID, started_at=time.time())
+                        await start_enhancement(msg)
                         if not await initialize_asr():
                             continue
                         recording_stopped.clear()
                     
                     elif msg.get("type") == "stop_recording":
                         logger.info("Received stop_recording message from client.")
+                        stop_requested_at = time.perf_counter()
                         if client and asr_ready.is_set():
+                            # Everything queued must reach Tencent before the end frame
+                            await audio_queue.flush()
                             await client.send_end_frame()
                         recording_stopped.set()
+                        if audio_processor.vad_enabled:
+                            await report_vad_stats()
 
         except websockets.exceptions.ConnectionClosed:
             logger.info("Client WebSocket connection closed normally.")
         except Exception as e:
             logger.error(f"Error in receive_messages loop: {e}", exc_info=True)
         finally:
+            await audio_queue.stop()
+            if enhancer:
+                await enhancer.cancel()
+            await finish_session()
             if client:
                 await client.close()
                 logger.info("Tencent ASR client connection closed in finally block.")
 
-    await receive_messages()
+    try:
+        await receive_messages()
+    finally:
+        WS_CONNECTIONS.dec()
     logger.info("WebSocket connection handling finished.")
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get(
+    "/api/v1/stats/dsp",
+    summary="DSP Executor Stats",
+    description="Queue depth and latency of the shared audio DSP worker pool."
+)
+async def get_dsp_stats():
+    return dsp_executor.stats()
+
+@app.get(
+    "/api/v1/stats/warmup",
+    summary="Warm-up Status",
+    description="Whether the background warm-up of provider SDKs and DSP filters has finished, its duration and per-model outcome."
+)
+async def get_warmup_stats():
+    return {**warmup_state, "enabled": WARMUP_ENABLED, "warmup_models": WARMUP_MODELS}
+
+@app.get(
+    "/api/v1/stats/asr_pool",
+    summary="ASR Connection Pool Stats",
+    description="Warm Tencent ASR sessions and pool hit/miss counters."
+)
+async def get_asr_pool_stats():
+    return asr_pool.stats()
+
+@app.get(
+    "/api/v1/stats/asr_sessions",
+    summary="ASR Session Stats",
+    description="Active, queued and rejected Tencent ASR sessions; per-session details with ?detail=true."
+)
+async def get_asr_session_stats(detail: bool = False):
+    return asr_sessions.stats(include_sessions=detail)
+
+@app.get(
+    "/api/v1/stats/vad",
+    summary="Voice Activity Detection Stats",
+    description="Speech/silence totals over all recordings with server-side VAD, and the share of audio sent to ASR."
+)
+async def get_vad_stats():
+    audio_ms = vad_totals["audio_ms"]
+    return {
+        **vad_totals,
+        "enabled_by_default": VAD_ENABLED,
+        "speech_ratio": round(vad_totals["speech_ms"] / audio_ms, 3) if audio_ms else 0.0,
+        "sent_ratio": round(vad_totals["sent_ms"] / audio_ms, 3) if audio_ms else 0.0
+    }
+
+@app.get(
+    "/api/v1/stats/batch",
+    summary="Batch Transcription Stats",
+    description="Running, queued and finished batch transcription jobs; per-job progress with ?detail=true."
+)
+async def get_batch_stats(detail: bool = False):
+    return batch_transcriber.stats(include_jobs=detail)
+
+@app.get(
+    "/api/v1/stats/llm_cache",
+    summary="LLM Response Cache Stats",
+    description="Size and hit/miss counters of the LLM response cache."
+)
+async def get_llm_cache_stats():
+    return get_llm_response_cache().stats()
+
+@app.get(
+    "/api/v1/stats/llm_hedging",
+    summary="LLM Hedging Stats",
+    description="Recent time to first chunk per upstream model, and hedge/failover counters when LLM_HEDGE_MODELS is set."
+)
+async def get_llm_hedging_stats_endpoint():
+    return get_llm_hedging_stats()
+
+async def resolve_text(request) -> str:
+    """
+    Returns the request's text, or the stored transcript of `request.session_id`.
+    """
+    if not request.session_id:
+        return request.text
+    sentences = await event_bus.get_transcript(request.session_id)
+    if not sentences and await event_bus.get_session(request.session_id) is None:
+        # Expired from the bus: fall back to the persistent store
+        if transcript_store:
+            sentences = await asyncio.to_thread(transcript_store.get_transcript, request.session_id)
+        if not sentences:
+            raise HTTPException(status_code=404, detail="Unknown or expired session.")
+    return "".join(sentences)
+
+async def store_output(request, kind: str, model_name: str, chunks):
+    """
+    Passes the streamed `chunks` through and stores the complete output with the request's session, if any.
+    """
+    output = []
+    async for chunk in chunks:
+        output.append(chunk)
+        yield chunk
+    if transcript_store and request.session_id:
+        transcript_store.add_output(request.session_id, kind, "".join(output), model=model_name)
+
+def require_transcript_store() -> TranscriptStore:
+    if transcript_store is None:
+        raise HTTPException(status_code=503, detail="The transcript store is disabled; set TRANSCRIPT_DB to enable it.")
+    return transcript_store
+
+@app.get(
+    "/api/v1/sessions",
+    summary="Past Recordings",
+    description="Stored recordings and batch jobs, newest first. Pass `next_cursor` back as `cursor` for the next page."
+)
+async def list_sessions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    kind: Optional[str] = Query(None, description="'recording' or 'batch'.")
+):
+    store = require_transcript_store()
+    try:
+        return await asyncio.to_thread(store.list_sessions, limit, cursor, kind)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+@app.get(
+    "/api/v1/sessions/search",
+    summary="Search Past Recordings",
+    description="Full-text search over stored transcripts and LLM results, newest first. Chinese text is "
+                "matched as a substring; pass `next_cursor` back as `cursor` for the next page."
+)
+async def search_sessions(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100),
+                          cursor: Optional[str] = None):
+    store = require_transcript_store()
+    try:
+        return await asyncio.to_thread(store.search, q, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+@app.get(
+    "/api/v1/sessions/{session_id}",
+    summary="Past Recording",
+    description="Metadata, transcript segments and LLM results of a stored recording or batch job."
+)
+async def get_stored_session(session_id: str):
+    store = require_transcript_store()
+    session = await asyncio.to_thread(store.get_session, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session.")
+    return session
+
+@app.get(
+    "/api/v1/sessions/{session_id}/events",
+    summary="Recording Events",
+    description="Server-sent events with the finalized sentences and status changes of a recording, from any worker."
+)
+async def stream_session_events(session_id: str):
+    metadata = await event_bus.get_session(session_id)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session.")
+
+    async def event_generator():
+        yield f"data: {json.dumps({'type': 'session', **metadata}, ensure_ascii=False)}\n\n"
+        if metadata.get("status") == "finished":
+            return
+        async for event in event_bus.subscribe(session_id):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if event.get("status") == "finished":
+                break
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+def _upload_fd(upload: UploadFile) -> int:
+    # Uploads are spooled to a temporary file; a duplicate descriptor keeps it readable
+    # (and memory-mappable) after the request has finished
+    spooled = upload.file
+    if hasattr(spooled, "rollover"):
+        spooled.rollover()
+    spooled.flush()
+    return os.dup(spooled.fileno())
+
+@app.post(
+    "/api/v1/transcribe",
+    status_code=202,
+    summary="Transcribe an Audio File",
+    description="Queues a WAV or raw 16-bit PCM upload for transcription, much faster than real time. "
+                "Poll /api/v1/transcribe/{job_id} or follow /api/v1/sessions/{job_id}/events for the result."
+)
+async def transcribe_file(
+    file: UploadFile = File(..., description="WAV (16-bit PCM, any rate, mono or stereo) or headerless PCM."),
+    audio_format: str = Form("wav", description="'wav' or 'pcm16' for headerless little-endian PCM."),
+    sample_rate: int = Form(16000, description="Sample rate of 'pcm16' uploads."),
+    channels: int = Form(1, description="Channel count of 'pcm16' uploads."),
+    vad: bool = Form(False, description="Skip silence before it reaches ASR."),
+    enhance: bool = Form(False, description="Also polish the transcript for readability."),
+    model: Optional[str] = Form(None, description="LLM model used when enhance is set."),
+    prompt: Optional[str] = Form(None, description="Custom readability prompt used when enhance is set.")
+):
+    try:
+        fd = await asyncio.to_thread(_upload_fd, file)
+        audio = AudioFile(fd, audio_format, sample_rate, channels)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if audio.frames == 0:
+        audio.close()
+        raise HTTPException(status_code=400, detail="The uploaded file contains no audio.")
+
+    enhance_text = None
+    if enhance:
+        processor = ChunkedProcessor(get_llm_processor(model or "deepseek-chat"))
+        enhance_prompt = prompt or PROMPTS['readability-enhance']
+        enhance_text = lambda text: processor.process_text(text, enhance_prompt)
+    try:
+        job = batch_transcriber.submit(audio, file.filename or "", vad=vad, enhance=enhance_text)
+    except BatchQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return job.to_dict(include_result=False)
+
+@app.get(
+    "/api/v1/transcribe/{job_id}",
+    summary="Batch Transcription Result",
+    description="Status, progress and (once available) transcript of a batch transcription job."
+)
+async def get_transcription(job_id: str):
+    job = batch_transcriber.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    # Submitted to another worker: answer from the event bus
+    metadata = await event_bus.get_session(job_id)
+    if metadata is None or metadata.get("kind") != "batch":
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return {**metadata, "text": "".join(await event_bus.get_transcript(job_id))}
+
 @app.post(
     "/api/v1/readability",
     response_model=ReadabilityResponse,
@@ -258,16 +845,19 @@ async def websocket_endpoint(websocket: WebSocket):
     description="Improve the readability of the provided text using DeepSeek."
 )
 async def enhance_readability(request: ReadabilityRequest):
+    text = await resolve_text(request)
     try:
         async def text_generator():
             model_name = request.model or "deepseek-chat"
-            processor = get_llm_processor(model_name)
+            # Long transcripts are polished chunk by chunk in parallel and stitched in order
+            processor = ChunkedProcessor(get_llm_processor(model_name))
             # Use custom prompt if provided, otherwise use default
             prompt = request.prompt or PROMPTS['readability-enhance']
-            async for chunk in processor.process_text(request.text, prompt):
+            async for chunk in store_output(request, "readability", model_name, processor.process_text(text, prompt)):
                 yield chunk
         
-        return StreamingResponse(text_generator(), media_type="text/plain")
+        # Tokens are written in batches (LLM_STREAM_FLUSH_MS / LLM_STREAM_FLUSH_BYTES), not one write each
+        return StreamingResponse(coalesce_chunks(text_generator()), media_type="text/plain")
     except Exception as e:
         logger.error(f"Error in enhance_readability: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to process text for readability.")
@@ -278,16 +868,44 @@ async def enhance_readability(request: ReadabilityRequest):
     summary="Ask AI a Question",
     description="Ask AI to provide insights using DeepSeek model."
 )
-def ask_ai(request: AskAIRequest):
+async def ask_ai(request: AskAIRequest):
+    text = await resolve_text(request)
     try:
-        model_name = request.model or "deepseek-chat"
+        prompt = PROMPTS['paraphrase-gpt-realtime']
+        model_name = route_model(request.model or "deepseek-chat", prompt, text)
         processor = get_llm_processor(model_name)
-        answer = processor.process_text_sync(request.text, PROMPTS['paraphrase-gpt-realtime'])
-        return AskAIResponse(answer=answer)
+        chunks = processor.process_text(text, prompt)
+        return AskAIResponse(answer="".join([chunk async for chunk in store_output(request, "ask_ai", model_name, chunks)]))
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Error in ask_ai: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to get answer from AI.")
 
+@app.post(
+    "/api/v1/ask_ai/stream",
+    summary="Ask AI a Question (Streaming)",
+    description="Same as /api/v1/ask_ai, but streams the answer as plain text while it is generated."
+)
+async def ask_ai_stream(request: AskAIRequest):
+    text = await resolve_text(request)
+    try:
+        prompt = PROMPTS['paraphrase-gpt-realtime']
+        # Decided before streaming starts, so an oversized question still gets a proper status code
+        model_name = route_model(request.model or "deepseek-chat", prompt, text)
+
+        async def text_generator():
+            processor = get_llm_processor(model_name)
+            async for chunk in store_output(request, "ask_ai", model_name, processor.process_text(text, prompt)):
+                yield chunk
+
+        return StreamingResponse(coalesce_chunks(text_generator()), media_type="text/plain")
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in ask_ai_stream: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to get answer from AI.")
+
 @app.post(
     "/api/v1/correctness",
     response_model=CorrectnessResponse,
@@ -295,19 +913,28 @@ def ask_ai(request: AskAIRequest):
     description="生成约30-60字的一句话总结。"
 )
 async def check_correctness(request: CorrectnessRequest):
+    text = await resolve_text(request)
     try:
         async def text_generator():
             model_name = request.model or "deepseek-chat"
-            processor = get_llm_processor(model_name)
+            # Long transcripts are condensed chunk by chunk, then the prompt runs once over the result
+            processor = ChunkedProcessor(get_llm_processor(model_name), map_prompt=PROMPTS['chunk-summary'])
             # Use custom prompt if provided, otherwise use default
             prompt = request.prompt or PROMPTS['correctness-check']
-            async for chunk in processor.process_text(request.text, prompt):
+            async for chunk in store_output(request, "summary", model_name, processor.process_text(text, prompt)):
                 yield chunk
 
-        return StreamingResponse(text_generator(), media_type="text/plain")
+        return StreamingResponse(coalesce_chunks(text_generator()), media_type="text/plain")
     except Exception as e:
         logger.error(f"Error in check_correctness: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to生成一句话要点。")
 
 if __name__ == '__main__':
-    uvicorn.run(app, host="0.0.0.0", port=3006)
+    # Several workers need a shared bus (EVENT_BUS_URL=redis://...) so any of them can serve a recording
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1 and EVENT_BUS_URL.startswith("memory://"):
+        logger.warning("WORKERS > 1 with the in-process event bus: session transcripts are not shared between workers")
+    uvicorn.run("realtime_server:app" if workers > 1 else app, host="0.0.0.0",
+                port=int(os.getenv("PORT", "3006")), workers=workers,
+                # Let uvicorn's loggers propagate into the queued handler instead of writing synchronously
+                log_config=None)
@@ -7,6 +7,12 @@ let audioBuffer = new Int16Array(0);
 let wsConnected = false;
 let streamInitialized = false;
 let isAutoStarted = false;
+let lastEnhancedSegment = -1;
+let useFramedAudio = false;  // AudioWorklet path: 16 kHz framed audio instead of raw device-rate PCM
+let serverTranscript = '';  // Transcript as the server sees it; text_delta offsets refer to this
+let serverAudioFormats = [];  // Advertised by the server in its first status message
+let opusEncoder = null;  // WebCodecs encoder while recording in opus_framed mode
+let opusSequence = 0;
 
 // DOM elements
 const recordButton = document.getElementById('recordButton');
@@ -24,6 +30,9 @@ const resetPrompts = document.getElementById('resetPrompts');
 const readabilityPrompt = document.getElementById('readabilityPrompt');
 const correctnessPrompt = document.getElementById('correctnessPrompt');
 const llmModelSelect = document.getElementById('llmModelSelect');
+const incrementalEnhanceToggle = document.getElementById('incrementalEnhanceToggle');
+const opusUploadToggle = document.getElementById('opusUploadToggle');
+const vadToggle = document.getElementById('vadToggle');
 
 // Configuration
 const targetSeconds = 5;
@@ -102,10 +111,81 @@ function createAudioProcessor() {
     return processor;
 }
 
+async function createWorkletProcessor() {
+    await audioContext.audioWorklet.addModule('static/pcm-worklet.js');
+    const node = new AudioWorkletNode(audioContext, 'pcm-framer', {
+        processorOptions: { targetSampleRate: 16000, frameMs: 100 }
+    });
+    // Frames arrive only between 'start' and 'stop', already downsampled and framed
+    node.port.onmessage = (event) => {
+        if (opusEncoder) {
+            encodeFrame(event.data);
+        } else if (ws.readyState === WebSocket.OPEN) {
+            ws.send(event.data);
+        }
+    };
+    return node;
+}
+
+// Opus upload: worklet frames go through a WebCodecs encoder and are sent as
+// "STO1"-framed packets, about 24 kbps instead of 256 kbps of 16 kHz PCM
+const OPUS_CONFIG = { codec: 'opus', sampleRate: 16000, numberOfChannels: 1, bitrate: 24000 };
+
+async function createOpusEncoder() {
+    if (!('AudioEncoder' in window) || !serverAudioFormats.includes('opus_framed')) return null;
+    try {
+        const { supported } = await AudioEncoder.isConfigSupported(OPUS_CONFIG);
+        if (!supported) return null;
+    } catch (error) {
+        return null;
+    }
+    opusSequence = 0;
+    const encoder = new AudioEncoder({
+        output: (chunk) => {
+            const buffer = new ArrayBuffer(16 + chunk.byteLength);
+            const view = new DataView(buffer);
+            [0x53, 0x54, 0x4f, 0x31].forEach((byte, i) => view.setUint8(i, byte));  // "STO1"
+            view.setUint32(4, opusSequence++, true);
+            view.setUint32(8, OPUS_CONFIG.sampleRate, true);
+            view.setUint32(12, Math.round(chunk.timestamp / 1000), true);
+            chunk.copyTo(new Uint8Array(buffer, 16));
+            if (ws.readyState === WebSocket.OPEN) ws.send(buffer);
+        },
+        error: (error) => console.error('Opus encoder error:', error)
+    });
+    encoder.configure(OPUS_CONFIG);
+    return encoder;
+}
+
+function encodeFrame(frame) {
+    // Worklet frame: 16-byte "STT1" header, then 16 kHz Int16 samples
+    const timestampMs = new DataView(frame).getUint32(12, true);
+    const samples = new Int16Array(frame, 16);
+    const audioData = new AudioData({
+        format: 's16',
+        sampleRate: OPUS_CONFIG.sampleRate,
+        numberOfChannels: 1,
+        numberOfFrames: samples.length,
+        timestamp: timestampMs * 1000,
+        data: samples
+    });
+    opusEncoder.encode(audioData);
+    audioData.close();
+}
+
 async function initAudio(stream) {
     audioContext = new AudioContext();
     source = audioContext.createMediaStreamSource(stream);
-    processor = createAudioProcessor();
+    useFramedAudio = false;
+    if (audioContext.audioWorklet) {
+        try {
+            processor = await createWorkletProcessor();
+            useFramedAudio = true;
+        } catch (error) {
+            console.warn('AudioWorklet unavailable, falling back to ScriptProcessor:', error);
+        }
+    }
+    if (!useFramedAudio) processor = createAudioProcessor();
     source.connect(processor);
     processor.connect(audioContext.destination);
 }
@@ -148,6 +228,7 @@ function initializeWebSocket() {
         switch (data.type) {
             case 'status':
                 updateConnectionStatus(data.status);
+                if (data.audio_formats) serverAudioFormats = data.audio_formats;
                 if (data.status === 'idle') {
                     copyToClipboard(transcript.value, copyButton);
                 }
@@ -160,6 +241,27 @@ function initializeWebSocket() {
                 }
                 transcript.scrollTop = transcript.scrollHeight;
                 break;
+            case 'text_delta':
+                // Protocol v2: replace everything from `offset` (UTF-16 units) with `content`
+                serverTranscript = serverTranscript.slice(0, data.offset) + data.content;
+                transcript.value = serverTranscript;
+                transcript.scrollTop = transcript.scrollHeight;
+                break;
+            case 'enhanced_text':
+                // Live readability enhancement, one segment per window of finalized sentences
+                if (data.segment !== lastEnhancedSegment) {
+                    if (enhancedTranscript.value) enhancedTranscript.value += '\n';
+                    lastEnhancedSegment = data.segment;
+                }
+                enhancedTranscript.value += data.content;
+                enhancedTranscript.scrollTop = enhancedTranscript.scrollHeight;
+                break;
+            case 'enhanced_done':
+                if (!isMobileDevice()) copyToClipboard(enhancedTranscript.value, copyEnhancedButton);
+                break;
+            case 'vad_stats':
+                console.info(`VAD: ${data.speech_ms} ms speech of ${data.audio_ms} ms, sent ${data.sent_ms} ms to ASR`);
+                break;
             case 'error':
                 alert(data.content);
                 updateConnectionStatus('idle');
@@ -198,7 +300,24 @@ async function startRecording() {
         if (!audioContext) await initAudio(stream);
 
         isRecording = true;
-        await ws.send(JSON.stringify({ type: 'start_recording' }));
+        lastEnhancedSegment = -1;
+        serverTranscript = '';
+        const startMessage = {
+            type: 'start_recording',
+            protocol_version: 2,
+            vad: localStorage.getItem('vad') === 'true'  // Skip silence on the server (opt-in)
+        };
+        if (useFramedAudio) {
+            if (localStorage.getItem('opusUpload') === 'true') opusEncoder = await createOpusEncoder();
+            startMessage.audio_format = opusEncoder ? 'opus_framed' : 'pcm16_framed';
+        }
+        if (localStorage.getItem('incrementalEnhance') === 'true') {
+            startMessage.incremental_enhance = true;
+            startMessage.prompt = localStorage.getItem('readabilityPrompt') || undefined;
+            startMessage.model = localStorage.getItem('llmModel') || 'deepseek-chat';
+        }
+        await ws.send(JSON.stringify(startMessage));
+        if (useFramedAudio) processor.port.postMessage({ type: 'start' });
         
         startTimer();
         recordButton.classList.add('recording');
@@ -215,12 +334,22 @@ async function stopRecording() {
     isRecording = false;
     stopTimer();
     
-    if (audioBuffer.length > 0 && ws.readyState === WebSocket.OPEN) {
+    if (useFramedAudio) {
+        // The worklet sends its last partial frame and stops framing
+        processor.port.postMessage({ type: 'stop' });
+    } else if (audioBuffer.length > 0 && ws.readyState === WebSocket.OPEN) {
         ws.send(audioBuffer.buffer);
         audioBuffer = new Int16Array(0);
     }
     
     await new Promise(resolve => setTimeout(resolve, 500));
+    if (opusEncoder) {
+        // Send the packets still buffered in the encoder before ending the recording
+        const encoder = opusEncoder;
+        await encoder.flush();
+        encoder.close();
+        opusEncoder = null;
+    }
     await ws.send(JSON.stringify({ type: 'stop_recording' }));
     
     recordButton.classList.remove('recording');
@@ -251,12 +380,18 @@ function loadPrompts() {
     correctnessPrompt.value = localStorage.getItem('correctnessPrompt') || defaultCorrectnessPrompt;
     // Load model selection
     llmModelSelect.value = localStorage.getItem('llmModel') || 'deepseek-chat';
+    incrementalEnhanceToggle.checked = localStorage.getItem('incrementalEnhance') === 'true';
+    opusUploadToggle.checked = localStorage.getItem('opusUpload') === 'true';
+    vadToggle.checked = localStorage.getItem('vad') === 'true';
 }
 
 function savePrompts() {
     localStorage.setItem('readabilityPrompt', readabilityPrompt.value);
     localStorage.setItem('correctnessPrompt', correctnessPrompt.value);
     localStorage.setItem('llmModel', llmModelSelect.value);
+    localStorage.setItem('incrementalEnhance', incrementalEnhanceToggle.checked);
+    localStorage.setItem('opusUpload', opusUploadToggle.checked);
+    localStorage.setItem('vad', vadToggle.checked);
 }
 
 function resetPromptsToDefault() {
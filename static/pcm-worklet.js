@@ -0,0 +1,115 @@
+// AudioWorklet that downsamples microphone audio to 16 kHz and emits fixed-duration
+// Int16 frames with a 16-byte header: "STT1", sequence number, sample rate and
+// timestamp in ms since the recording started (all uint32, little-endian).
+
+const FRAME_MAGIC = [0x53, 0x54, 0x54, 0x31];  // "STT1"
+const HEADER_BYTES = 16;
+
+// Windowed-sinc low-pass filter; cutoff is in cycles per input sample
+function designLowPass(cutoff, numTaps) {
+    const taps = new Float32Array(numTaps);
+    const mid = (numTaps - 1) / 2;
+    let sum = 0;
+    for (let i = 0; i < numTaps; i++) {
+        const x = i - mid;
+        const sinc = x === 0 ? 2 * cutoff : Math.sin(2 * Math.PI * cutoff * x) / (Math.PI * x);
+        const window = 0.54 - 0.46 * Math.cos(2 * Math.PI * i / (numTaps - 1));  // Hamming
+        taps[i] = sinc * window;
+        sum += taps[i];
+    }
+    for (let i = 0; i < numTaps; i++) taps[i] /= sum;
+    return taps;
+}
+
+class PcmFramerProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const opts = options.processorOptions || {};
+        this.targetRate = opts.targetSampleRate || 16000;
+        this.frameSamples = Math.round(this.targetRate * (opts.frameMs || 100) / 1000);
+        this.ratio = sampleRate / this.targetRate;  // `sampleRate` is the context rate
+
+        // Anti-aliasing filter, only needed when downsampling
+        this.taps = this.ratio > 1
+            ? designLowPass(0.45 / this.ratio, 2 * Math.ceil(8 * this.ratio) + 1)
+            : new Float32Array([1]);
+        this.ring = new Float32Array(this.taps.length);
+        this.frame = new Int16Array(this.frameSamples);
+        this.active = false;
+        this.reset();
+
+        this.port.onmessage = (event) => {
+            if (event.data.type === 'start') {
+                this.reset();
+                this.active = true;
+            } else if (event.data.type === 'stop') {
+                this.emit();  // Send the final partial frame
+                this.active = false;
+            }
+        };
+    }
+
+    reset() {
+        this.ring.fill(0);
+        this.ringPos = 0;
+        this.inIndex = 0;  // Index of the next filtered input sample
+        this.nextOut = 0;  // Input position of the next output sample
+        this.prevY = 0;
+        this.fill = 0;
+        this.sequence = 0;
+        this.samplesOut = 0;
+    }
+
+    emit() {
+        if (this.fill === 0) return;
+        const buffer = new ArrayBuffer(HEADER_BYTES + this.fill * 2);
+        const view = new DataView(buffer);
+        FRAME_MAGIC.forEach((byte, i) => view.setUint8(i, byte));
+        view.setUint32(4, this.sequence, true);
+        view.setUint32(8, this.targetRate, true);
+        view.setUint32(12, Math.round(this.samplesOut * 1000 / this.targetRate), true);
+        new Int16Array(buffer, HEADER_BYTES).set(this.frame.subarray(0, this.fill));
+        this.port.postMessage(buffer, [buffer]);
+
+        this.sequence++;
+        this.samplesOut += this.fill;
+        this.fill = 0;
+    }
+
+    push(value) {
+        const clamped = Math.max(-1, Math.min(1, value));
+        this.frame[this.fill++] = clamped < 0 ? clamped * 32768 : clamped * 32767;
+        if (this.fill === this.frameSamples) this.emit();
+    }
+
+    process(inputs) {
+        const input = inputs[0] && inputs[0][0];
+        if (!this.active || !input) return true;
+
+        const taps = this.taps;
+        const ring = this.ring;
+        const n = ring.length;
+        for (let i = 0; i < input.length; i++) {
+            ring[this.ringPos] = input[i];
+            let y = 0;
+            let k = this.ringPos;
+            for (let t = 0; t < n; t++) {
+                y += taps[t] * ring[k];
+                k = k === 0 ? n - 1 : k - 1;
+            }
+            this.ringPos = (this.ringPos + 1) % n;
+
+            // Emit every output sample that falls between the previous and this filtered sample
+            while (this.nextOut <= this.inIndex) {
+                const frac = this.nextOut - (this.inIndex - 1);
+                this.push(this.prevY + (y - this.prevY) * frac);
+                this.nextOut += this.ratio;
+            }
+            this.prevY = y;
+            this.inIndex++;
+        }
+        return true;
+    }
+}
+
+registerProcessor('pcm-framer', PcmFramerProcessor);
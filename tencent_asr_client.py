@@ -4,31 +4,57 @@ import hashlib
 import hmac
 import json
 import logging
+import random
 import time
 import urllib.parse
-from typing import Callable, Dict
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 import uuid  # Import the uuid library
 
 import websockets
 
+import metrics
+
 logger = logging.getLogger(__name__)
 
+ASR_CONNECT_SECONDS = metrics.histogram(
+    "stt_asr_connect_seconds", "Time to connect to Tencent ASR and complete the handshake", ("result",))
+ASR_POOL_ACQUIRE = metrics.counter(
+    "stt_asr_pool_acquire_total", "ASR connections handed out, from the warm pool (hit) or connected on demand (miss)", ("result",))
+ASR_SESSIONS = metrics.counter(
+    "stt_asr_sessions_total", "ASR session requests by outcome (opened, rejected, failed)", ("result",))
+ASR_SESSION_QUEUE_WAIT = metrics.histogram(
+    "stt_asr_session_queue_wait_seconds", "Time spent waiting for a free ASR session slot")
+ASR_RECONNECTS = metrics.counter(
+    "stt_asr_reconnects_total", "Reconnects of dropped ASR sessions by outcome", ("result",))
+ASR_AUDIO_BYTES = metrics.counter(
+    "stt_asr_audio_bytes_total", "Audio bytes sent to Tencent ASR, dropped on overflow or replayed after a reconnect", ("outcome",))
+
 class TencentASRClient:
     """
     Client for Tencent Cloud's real-time Automatic Speech Recognition (ASR) service via WebSocket.
     """
     BASE_URL = "wss://asr.cloud.tencent.com/asr/v2/"
+    SIGNATURE_TTL = 24 * 60 * 60  # Signed URLs expire after 24 hours
+    HANDSHAKE_TIMEOUT = 5.0
 
-    def __init__(self, app_id: str, secret_id: str, secret_key: str):
+    def __init__(self, app_id: str, secret_id: str, secret_key: str, base_url: Optional[str] = None):
         if not all([app_id, secret_id, secret_key]):
             raise ValueError("Tencent ASR credentials (app_id, secret_id, secret_key) are required.")
         
         self.app_id = app_id
         self.secret_id = secret_id
         self.secret_key = secret_key
+        self.base_url = base_url or self.BASE_URL  # Overridable to point at a local fake server
         self.ws = None
         self.receive_task = None
         self.handlers: Dict[str, Callable[[dict], asyncio.Future]] = {}
+        self.voice_id = None
+        self.expires_at = None  # Unix time at which the signed URL expires
+        self.connected_at = None  # Monotonic time at which the handshake completed
+        self.ready = asyncio.Event()  # Set once Tencent acknowledges the handshake
+        self.handshake_error = None
+        self._closing = False  # Set by close(), so only unexpected closes reach "on_close"
 
     def _generate_signature(self) -> str:
         """
@@ -36,15 +62,18 @@ class TencentASRClient:
         Reference: https://cloud.tencent.com/document/product/1093/48982#signature
         """
         # Define request parameters
+        now = int(time.time())
+        self.voice_id = str(uuid.uuid4())  # Must be unique per recognition session
+        self.expires_at = now + self.SIGNATURE_TTL
         params = {
             "secretid": self.secret_id,
             "engine_model_type": "16k_zh",  # For Mandarin Chinese, 16kHz
-            "timestamp": str(int(time.time())),
-            "expired": str(int(time.time()) + 24 * 60 * 60),  # Expires in 24 hours
-            "nonce": str(int(time.time()) % 100000),  # Random number
+            "timestamp": str(now),
+            "expired": str(self.expires_at),
+            "nonce": str(random.randint(1, 9999999999)),  # Random number
             # According to API docs and error msg, voice_format should be a number. '1' likely stands for pcm.
             "voice_format": "1",
-            "voice_id": str(uuid.uuid4()),  # Add the required voice_id
+            "voice_id": self.voice_id,  # Add the required voice_id
         }
 
         # Construct the signature source string
@@ -53,8 +82,9 @@ class TencentASRClient:
         # 2. Concatenate into a query string
         query_string = urllib.parse.urlencode(sorted_params)
         # 3. Construct the final string to be signed, following the specific ASR doc example
-        host = "asr.cloud.tencent.com"
-        path = f"/asr/v2/{self.app_id}"
+        parsed_url = urllib.parse.urlparse(self.base_url)
+        host = parsed_url.netloc
+        path = f"{parsed_url.path}{self.app_id}"
         # The signature source string for Tencent ASR WebSocket seems to be a non-standard format
         source_string = f"{host}{path}?{query_string}"
         
@@ -67,21 +97,45 @@ class TencentASRClient:
         signature_b64 = base64.b64encode(signature).decode('utf-8')
 
         # URL-encode the signature and construct the final URL
-        final_url = f"{self.BASE_URL}{self.app_id}?{query_string}&signature={urllib.parse.quote(signature_b64)}"
+        final_url = f"{self.base_url}{self.app_id}?{query_string}&signature={urllib.parse.quote(signature_b64)}"
         
-        logger.info(f"Generated Tencent ASR connection URL.")
+        logger.debug("Generated Tencent ASR connection URL.")
         return final_url
 
-    async def connect(self):
+    async def connect(self, timeout: float = HANDSHAKE_TIMEOUT):
         """
-        Connects to the Tencent ASR WebSocket server.
+        Connects to the Tencent ASR WebSocket server and waits until the handshake is acknowledged.
         """
-        connection_url = self._generate_signature()
-        self.ws = await websockets.connect(connection_url)
-        logger.info("Successfully connected to Tencent ASR WebSocket server.")
-        
-        # Start the receiver coroutine
-        self.receive_task = asyncio.create_task(self.receive_messages())
+        start = time.perf_counter()
+        with metrics.span("asr.connect"):
+            try:
+                connection_url = self._generate_signature()
+                self.ws = await websockets.connect(connection_url)
+
+                # Start the receiver coroutine
+                self.receive_task = asyncio.create_task(self.receive_messages())
+                try:
+                    await self.wait_ready(timeout)
+                except BaseException:
+                    await self.close()
+                    raise
+            except BaseException:
+                ASR_CONNECT_SECONDS.observe(time.perf_counter() - start, result="error")
+                raise
+        ASR_CONNECT_SECONDS.observe(time.perf_counter() - start, result="ok")
+        logger.debug("Successfully connected to Tencent ASR WebSocket server.")
+
+    async def wait_ready(self, timeout: float = HANDSHAKE_TIMEOUT):
+        """
+        Waits for Tencent's handshake response, which signals the session is ready for audio.
+        """
+        await asyncio.wait_for(self.ready.wait(), timeout)
+        if self.handshake_error is not None:
+            raise ConnectionError(f"Tencent ASR handshake failed: {self.handshake_error}")
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self.ws and self.ws.open and self.receive_task and not self.receive_task.done())
 
     async def receive_messages(self):
         """
@@ -90,6 +144,14 @@ class TencentASRClient:
         try:
             async for message in self.ws:
                 data = json.loads(message)
+                if not self.ready.is_set():
+                    # The first message acknowledges (or rejects) the handshake
+                    if data.get("code") != 0:
+                        self.handshake_error = data
+                    self.connected_at = time.monotonic()
+                    self.ready.set()
+                    if self.handshake_error is None:
+                        continue
                 # Tencent ASR does not have a 'type' field, we check 'code'
                 if data.get("code") == 0:
                     # Successfully received data
@@ -99,11 +161,25 @@ class TencentASRClient:
                     # Error occurred
                     handler = self.handlers.get("on_error", self.default_handler)
                     await handler(data)
+            # Tencent closed the socket cleanly (close code 1000), e.g. after an error message
+            if not self._closing:
+                if not self.ready.is_set():
+                    self.handshake_error = {"error": "connection closed"}
+                    self.ready.set()
+                logger.warning("Tencent ASR WebSocket connection closed by server.")
+                close_handler = self.handlers.get("on_close", self.default_handler)
+                await close_handler({"error": "connection closed by server"})
         except websockets.exceptions.ConnectionClosed as e:
+            if not self.ready.is_set():
+                self.handshake_error = {"error": str(e)}
+                self.ready.set()
             logger.error(f"Tencent ASR WebSocket connection closed: {e}")
             error_handler = self.handlers.get("on_close", self.default_handler)
             await error_handler({"error": str(e)})
         except Exception as e:
+            if not self.ready.is_set():
+                self.handshake_error = {"error": str(e)}
+                self.ready.set()
             logger.error(f"Error in receive_messages: {e}", exc_info=True)
             error_handler = self.handlers.get("on_error", self.default_handler)
             await error_handler({"error": str(e)})
@@ -144,7 +220,10 @@ class TencentASRClient:
         """
         Closes the WebSocket connection.
         """
-        if self.receive_task and not self.receive_task.done():
+        self._closing = True
+        # Handlers may close the client from inside the receiver task itself; closing
+        # the socket below then ends its loop without cancelling the handler
+        if self.receive_task and not self.receive_task.done() and self.receive_task is not asyncio.current_task():
             self.receive_task.cancel()
             try:
                 await self.receive_task
@@ -153,4 +232,834 @@ class TencentASRClient:
         
         if self.ws and self.ws.open:
             await self.ws.close()
-            logger.info("Closed Tencent ASR WebSocket connection.") 
\ No newline at end of file
+            logger.debug("Closed Tencent ASR WebSocket connection.")
+
+
+def utf16_len(text: str) -> int:
+    """
+    Length of `text` in UTF-16 code units, which is how browsers index strings.
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+class TranscriptState:
+    """
+    Server-side view of one recording's transcript, built from Tencent results.
+
+    Tencent re-sends the whole current sentence (`voice_text_str`) on every partial
+    result and marks the end of a sentence with slice_type 2. Finalized sentences
+    never change, so `apply` only diffs the current sentence and returns a compact
+    "replace from offset" delta against the full transcript. Offsets are in UTF-16
+    code units so the browser can apply them with String.slice.
+    """
+
+    def __init__(self):
+        self.segments: List[str] = []  # Finalized sentences
+        self.current_index = None
+        self.current_text = ""
+        self.stable_length = 0  # UTF-16 length of the finalized part
+
+    @property
+    def text(self) -> str:
+        return "".join(self.segments) + self.current_text
+
+    def _finalize_current(self):
+        if self.current_text:
+            self.segments.append(self.current_text)
+            self.stable_length += utf16_len(self.current_text)
+        self.current_text = ""
+        self.current_index = None
+
+    def apply(self, result: dict) -> Optional[dict]:
+        """
+        Applies one Tencent `result` object; returns the delta to send, or None if nothing changed.
+        """
+        text = result.get("voice_text_str", "")
+        index = result.get("index")
+        if self.current_index is not None and index != self.current_index:
+            # Defensive: a new sentence started without a slice_type 2 for the previous one
+            self._finalize_current()
+
+        old_text = self.current_text
+        prefix = 0
+        limit = min(len(old_text), len(text))
+        while prefix < limit and old_text[prefix] == text[prefix]:
+            prefix += 1
+        changed = prefix != len(old_text) or prefix != len(text)
+        delta = {
+            "offset": self.stable_length + utf16_len(text[:prefix]),
+            "content": text[prefix:],
+        }
+
+        self.current_index = index
+        self.current_text = text
+        if result.get("slice_type") == 2:
+            self._finalize_current()
+            delta["sentence_final"] = True
+        elif not changed:
+            return None
+        delta["stable_length"] = self.stable_length
+        if "end_time" in result:
+            delta["end_ms"] = result["end_time"]  # End of the result in the audio sent to ASR
+        return delta
+
+
+class TencentASRConnectionPool:
+    """
+    Keeps a few pre-signed, already-handshaken ASR sessions warm so `start_recording`
+    does not pay for signing, TLS and the handshake.
+
+    Every session carries its own voice_id and is handed out at most once. Tencent
+    drops connections that receive no audio for about 15 seconds, so warm sessions
+    are recycled after `max_idle` seconds (and well before their signature expires).
+    """
+
+    def __init__(self, app_id: str, secret_id: str, secret_key: str, size: int = 2,
+                 max_idle: float = 10.0, base_url: Optional[str] = None):
+        self.app_id = app_id
+        self.secret_id = secret_id
+        self.secret_key = secret_key
+        self.size = size
+        self.max_idle = max_idle
+        self.base_url = base_url
+        self._idle = deque()
+        self._refill = asyncio.Event()
+        self._maintain_task = None
+
+        # Metrics
+        self.hits = 0  # Sessions served from the warm pool
+        self.misses = 0  # Sessions that had to connect on demand
+
+    def _new_client(self) -> TencentASRClient:
+        return TencentASRClient(
+            app_id=self.app_id,
+            secret_id=self.secret_id,
+            secret_key=self.secret_key,
+            base_url=self.base_url
+        )
+
+    def _is_usable(self, client: TencentASRClient) -> bool:
+        return (
+            client.is_open
+            and time.monotonic() - client.connected_at < self.max_idle
+            and time.time() + self.max_idle < client.expires_at
+        )
+
+    def start(self):
+        """
+        Starts filling the pool in the background.
+        """
+        if self.size > 0 and self._maintain_task is None:
+            self._maintain_task = asyncio.create_task(self._maintain())
+
+    async def acquire(self) -> TencentASRClient:
+        """
+        Returns a connected client, from the pool when possible.
+        """
+        while self._idle:
+            client = self._idle.popleft()
+            if self._is_usable(client):
+                self.hits += 1
+                ASR_POOL_ACQUIRE.inc(result="hit")
+                self._refill.set()
+                return client
+            await client.close()
+
+        self.misses += 1
+        ASR_POOL_ACQUIRE.inc(result="miss")
+        self._refill.set()
+        client = self._new_client()
+        await client.connect()
+        return client
+
+    async def _maintain(self):
+        backoff = 1.0
+        while True:
+            try:
+                # Recycle sessions Tencent is about to time out; detach them all before the first
+                # await, so a concurrent acquire() never sees (or closes) one of them too
+                stale = [client for client in self._idle if not self._is_usable(client)]
+                if stale:
+                    self._idle = deque(client for client in self._idle if client not in stale)
+                    for client in stale:
+                        await client.close()
+
+                while len(self._idle) < self.size:
+                    client = self._new_client()
+                    await client.connect()
+                    self._idle.append(client)
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to recycle or pre-connect Tencent ASR sessions: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+
+            self._refill.clear()
+            try:
+                await asyncio.wait_for(self._refill.wait(), timeout=self.max_idle / 2)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    async def close(self):
+        """
+        Stops refilling and closes all warm sessions.
+        """
+        if self._maintain_task and not self._maintain_task.done():
+            self._maintain_task.cancel()
+            try:
+                await self._maintain_task
+            except asyncio.CancelledError:
+                pass
+        self._maintain_task = None
+        while self._idle:
+            await self._idle.popleft().close()
+
+
+class ASRCapacityError(Exception):
+    """
+    Raised when the ASR session manager cannot admit another session.
+    """
+
+
+class PCMRingBuffer:
+    """
+    Byte FIFO over one preallocated bytearray, for audio that streams through a session.
+
+    Writes copy into the ring and reads copy out into the caller's buffer, so a
+    long recording allocates nothing per frame. The ring starts at
+    `initial_bytes` and doubles (up to `max_bytes`) when a write does not fit;
+    callers make room by discarding the oldest bytes first.
+    """
+
+    def __init__(self, max_bytes: int, initial_bytes: int = 32000):
+        self.max_bytes = max_bytes
+        self._buffer = bytearray(max(2, min(initial_bytes, max_bytes)))
+        self._view = memoryview(self._buffer)
+        self._head = 0  # Offset of the oldest byte
+        self.size = 0
+
+    def _grow(self, needed: int):
+        capacity = len(self._buffer)
+        while capacity < needed:
+            capacity *= 2
+        buffer = bytearray(min(capacity, self.max_bytes))
+        view = memoryview(buffer)
+        self.copy_into(view, 0, self.size)
+        self._buffer, self._view, self._head = buffer, view, 0
+
+    def write(self, data):
+        """
+        Appends `data` (any contiguous bytes-like object); raises ValueError beyond `max_bytes`.
+        """
+        data = memoryview(data).cast('B')
+        n = len(data)
+        if self.size + n > len(self._buffer):
+            if self.size + n > self.max_bytes:
+                raise ValueError(f"Ring buffer overflow: {self.size + n} > {self.max_bytes} bytes")
+            self._grow(self.size + n)
+        capacity = len(self._buffer)
+        tail = (self._head + self.size) % capacity
+        first = min(n, capacity - tail)
+        self._view[tail:tail + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        self.size += n
+
+    def copy_into(self, out: memoryview, offset: int, n: int):
+        """
+        Copies `n` bytes, starting `offset` bytes after the oldest one, into `out`.
+        """
+        capacity = len(self._buffer)
+        start = (self._head + offset) % capacity
+        first = min(n, capacity - start)
+        out[:first] = self._view[start:start + first]
+        if first < n:
+            out[first:n] = self._view[:n - first]
+
+    def discard(self, n: int) -> int:
+        """
+        Drops up to `n` of the oldest bytes and returns how many were dropped.
+        """
+        n = max(0, min(n, self.size))
+        self._head = (self._head + n) % len(self._buffer)
+        self.size -= n
+        return n
+
+
+class AudioReplayBuffer:
+    """
+    Time-bounded ring buffer of the 16kHz PCM sent upstream in one recording.
+
+    Positions are byte offsets since the recording started; only the last
+    `max_ms` of audio are kept.
+    """
+
+    def __init__(self, sample_rate: int = 16000, max_ms: int = 15000):
+        self.bytes_per_ms = sample_rate * 2 // 1000  # 16-bit mono PCM
+        self.max_bytes = max_ms * self.bytes_per_ms
+        self._ring = PCMRingBuffer(self.max_bytes, initial_bytes=2000 * self.bytes_per_ms)
+        self.end = 0
+
+    @property
+    def start(self) -> int:
+        return self.end - self._ring.size
+
+    def append(self, data):
+        data = memoryview(data).cast('B')
+        self.end += len(data)
+        if len(data) > self.max_bytes:
+            data = data[len(data) - self.max_bytes:]
+        self._ring.discard(self._ring.size + len(data) - self.max_bytes)
+        self._ring.write(data)
+
+    def read_from(self, position: int) -> Tuple[int, bytearray]:
+        """
+        Returns a copy of the buffered audio from `position` (or the oldest buffered byte) and where it starts.
+        """
+        position = max(position - position % 2, self.start)
+        data = bytearray(self.end - position)
+        self._ring.copy_into(memoryview(data), position - self.start, len(data))
+        return position, data
+
+
+class ASRSession:
+    """
+    One recording's upstream ASR connection, handed out by ASRSessionManager.
+
+    Exposes the TencentASRClient calls the server needs and dispatches the
+    client's events to the server's handlers. If Tencent drops the socket
+    mid-recording, the session reconnects with exponential backoff, replays
+    the buffered audio since the end of the last finalized sentence, and
+    rewrites the new connection's results (sentence indices, timestamps) so
+    they continue the transcript; sentences that were already finalized are
+    suppressed. Closing the session returns its slot to the manager.
+    """
+    __slots__ = ("manager", "session_id", "client", "handlers", "started_at", "queue_wait", "audio_bytes",
+                 "results", "errors", "closed", "ending", "upstream_ready", "replay", "reconnects",
+                 "replayed_bytes", "suppressed", "_reconnect_task", "_offset", "_index_base", "_open_index",
+                 "_last_final_index", "_final_end", "_recent_finals", "_dedup")
+
+    # Slack when comparing a replayed sentence's end with the last finalized one
+    DEDUP_TOLERANCE_MS = 200
+
+    def __init__(self, manager: "ASRSessionManager", session_id: int, client: TencentASRClient,
+                 handlers: Dict[str, Callable[[dict], Awaitable[None]]], queue_wait: float):
+        self.manager = manager
+        self.session_id = session_id
+        self.handlers = handlers
+        self.started_at = time.monotonic()
+        self.queue_wait = queue_wait  # Seconds spent waiting for a free slot
+        self.audio_bytes = 0
+        self.results = 0
+        self.errors = 0
+        self.closed = False
+        self.ending = False  # The end frame was requested
+        self.upstream_ready = True  # False while reconnecting and replaying
+        self.replay = AudioReplayBuffer(max_ms=manager.replay_ms)
+        self.reconnects = 0
+        self.replayed_bytes = 0
+        self.suppressed = 0  # Duplicate sentences dropped after a reconnect
+        self._reconnect_task = None
+
+        # Mapping from the current connection's results onto the recording
+        self._offset = 0  # Replay-buffer position where the current connection's audio starts
+        self._index_base = 0
+        self._open_index = None  # Recording-wide index of the sentence in progress
+        self._last_final_index = -1
+        self._final_end = 0  # Replay-buffer position where the last finalized sentence ended
+        self._recent_finals = deque(maxlen=5)
+        self._dedup = False
+        self._attach(client)
+
+    @property
+    def voice_id(self) -> str:
+        return self.client.voice_id
+
+    def _attach(self, client: TencentASRClient):
+        self.client = client
+        client.register_handler("on_result", self._on_result)
+        client.register_handler("on_error", self._on_error)
+        client.register_handler("on_close", self._on_close)
+
+    async def _emit(self, event_type: str, data: dict):
+        handler = self.handlers.get(event_type)
+        if handler:
+            await handler(data)
+
+    async def send_audio(self, audio_data: bytes):
+        self.audio_bytes += len(audio_data)
+        self.replay.append(audio_data)
+        # While reconnecting, audio only goes into the replay buffer
+        if self.upstream_ready:
+            await self.client.send_audio(audio_data)
+
+    async def send_end_frame(self):
+        self.ending = True
+        if self.upstream_ready:
+            await self.client.send_end_frame()
+
+    def _map_result(self, result: dict) -> dict:
+        bytes_per_ms = self.replay.bytes_per_ms
+        index = self._index_base + result.get("index", 0)
+        end_time = result.get("end_time") or 0
+        mapped = {
+            **result,
+            "index": index,
+            "start_time": (result.get("start_time") or 0) + self._offset // bytes_per_ms,
+            "end_time": end_time + self._offset // bytes_per_ms,
+        }
+        if result.get("slice_type") != 2:
+            self._open_index = index
+            return mapped
+
+        end = self._offset + end_time * bytes_per_ms if end_time else None
+        if self._dedup:
+            text = result.get("voice_text_str", "")
+            replayed_twice = end is not None and end <= self._final_end + self.DEDUP_TOLERANCE_MS * bytes_per_ms
+            if text in self._recent_finals or replayed_twice:
+                # Already in the transcript: blank out the partial shown for it instead
+                self.suppressed += 1
+                self._open_index = index
+                return {**mapped, "slice_type": 1, "voice_text_str": ""}
+            self._dedup = False
+
+        self._open_index = None
+        self._last_final_index = index
+        # Without timestamps, replay from the start of the buffer and rely on the text check
+        self._final_end = end if end is not None else self.replay.start
+        self._recent_finals.append(result.get("voice_text_str", ""))
+        return mapped
+
+    async def _on_result(self, data: dict):
+        self.results += 1
+        if data.get("result"):
+            data = {**data, "result": self._map_result(data["result"])}
+        await self._emit("on_result", data)
+
+    async def _on_error(self, data: dict):
+        self.errors += 1
+        await self._emit("on_error", data)
+
+    async def _on_close(self, data: dict):
+        if self.closed or self.manager.reconnect_attempts <= 0:
+            await self._emit("on_close", data)
+        elif self._reconnect_task is None or self._reconnect_task.done():
+            self.upstream_ready = False
+            self._reconnect_task = asyncio.create_task(self._reconnect(data))
+
+    async def _reconnect(self, reason: dict):
+        manager = self.manager
+        for attempt in range(manager.reconnect_attempts):
+            await self._emit("on_reconnecting", {"attempt": attempt + 1, "reason": reason})
+            if attempt:
+                delay = min(manager.reconnect_backoff * 2 ** (attempt - 1), 30.0)
+                await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+            if self.closed:
+                return
+            try:
+                client = await manager.pool.acquire()
+            except Exception as e:
+                logger.warning(f"ASR session {self.session_id}: reconnect attempt {attempt + 1} failed: {e}")
+                continue
+            if self.closed:
+                await client.close()
+                return
+
+            old_client = self.client
+            self._attach(client)
+            await old_client.close()
+            await self._replay()
+            if not client.is_open:
+                # Dropped during the replay: live audio keeps going to the replay buffer until the next attempt
+                continue
+            # No await since the replay caught up, so no live audio can slip past it
+            self.upstream_ready = True
+            if self.ending:
+                await client.send_end_frame()
+            self.reconnects += 1
+            manager.reconnects += 1
+            ASR_RECONNECTS.inc(result="ok")
+            logger.info(f"ASR session {self.session_id} reconnected, replayed {self.replayed_bytes} bytes so far")
+            await self._emit("on_reconnected", {"attempt": attempt + 1})
+            return
+
+        manager.reconnect_failures += 1
+        ASR_RECONNECTS.inc(result="failed")
+        logger.error(f"ASR session {self.session_id}: giving up after {manager.reconnect_attempts} reconnect attempts")
+        await self._emit("on_close", reason)
+
+    async def _replay(self):
+        # Tencent may not have finalized anything after the last slice_type 2,
+        # so that audio is sent again, faster than real time
+        position, data = self.replay.read_from(self._final_end)
+        self._offset = position
+        self._index_base = self._open_index if self._open_index is not None else self._last_final_index + 1
+        self._dedup = True
+        packet_bytes = self.manager.replay_packet_ms * self.replay.bytes_per_ms
+        byte_rate = self.replay.bytes_per_ms * 1000 * self.manager.replay_speed
+        while data:
+            for i in range(0, len(data), packet_bytes):
+                if not self.client.is_open:
+                    return  # Dropped again; the next attempt replays from the same position
+                packet = data[i:i + packet_bytes]
+                await self.client.send_audio(packet)
+                self.replayed_bytes += len(packet)
+                ASR_AUDIO_BYTES.inc(len(packet), outcome="replayed")
+                await asyncio.sleep(len(packet) / byte_rate)
+            # Audio that arrived while replaying is sent the same way
+            position, data = self.replay.read_from(position + len(data))
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._reconnect_task and self._reconnect_task is not asyncio.current_task():
+                self._reconnect_task.cancel()
+            await self.client.close()
+        finally:
+            self.manager._release(self)
+
+    def stats(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "voice_id": self.voice_id,
+            "age_s": round(time.monotonic() - self.started_at, 1),
+            "queue_wait_ms": round(self.queue_wait * 1000, 1),
+            "audio_bytes": self.audio_bytes,
+            "results": self.results,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "replayed_bytes": self.replayed_bytes,
+            "suppressed": self.suppressed,
+        }
+
+
+class ASRSessionManager:
+    """
+    Owns every upstream Tencent ASR connection of the process.
+
+    Tencent runs one recognition (voice_id) per WebSocket, so sessions cannot be
+    multiplexed onto one socket; instead the manager is the single place where
+    sessions are opened (through the warm connection pool), capped and accounted
+    for. At most `max_sessions` run at once; up to `max_waiting` further
+    requests wait up to `queue_timeout` seconds for a slot, anything beyond that
+    is rejected with ASRCapacityError. Browser sockets only hold an ASRSession
+    while recording, so idle connections cost no upstream resources.
+
+    Sessions whose upstream drops are reconnected up to `reconnect_attempts`
+    times, replaying up to `replay_ms` of buffered audio at `replay_speed`
+    times real time.
+    """
+
+    def __init__(self, pool: TencentASRConnectionPool, max_sessions: int = 200, max_waiting: int = 20,
+                 queue_timeout: float = 10.0, reconnect_attempts: int = 5, reconnect_backoff: float = 0.5,
+                 replay_ms: int = 15000, replay_speed: float = 2.0, replay_packet_ms: int = 200):
+        self.pool = pool
+        self.max_sessions = max_sessions
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_backoff = reconnect_backoff
+        self.replay_ms = replay_ms
+        self.replay_speed = replay_speed
+        self.replay_packet_ms = replay_packet_ms
+        self._sessions: Dict[int, ASRSession] = {}
+        self._slots = asyncio.Semaphore(max_sessions)
+        self._next_id = 0
+        self.waiting = 0
+
+        # Metrics
+        self.opened = 0
+        self.queued = 0  # Sessions that had to wait for a slot
+        self.rejected = 0
+        self.failed = 0  # Upstream connection failures
+        self.max_active = 0
+        self.total_queue_wait = 0.0
+        self.total_audio_bytes = 0  # Of closed sessions; active ones are added in stats()
+        self.total_results = 0
+        self.reconnects = 0
+        self.reconnect_failures = 0
+
+    @property
+    def active(self) -> int:
+        return len(self._sessions)
+
+    async def _acquire_slot(self) -> float:
+        start = time.monotonic()
+        if self._slots.locked():
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                ASR_SESSIONS.inc(result="rejected")
+                raise ASRCapacityError("Too many concurrent ASR sessions")
+            self.queued += 1
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                ASR_SESSIONS.inc(result="rejected")
+                raise ASRCapacityError("Timed out waiting for a free ASR session")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        return time.monotonic() - start
+
+    async def open_session(self, handlers: Dict[str, Callable[[dict], Awaitable[None]]]) -> ASRSession:
+        """
+        Opens a session that dispatches to `handlers`: "on_result", "on_error" and "on_close"
+        like TencentASRClient, plus optional "on_reconnecting" and "on_reconnected".
+        """
+        queue_wait = await self._acquire_slot()
+        try:
+            client = await self.pool.acquire()
+        except BaseException:
+            self.failed += 1
+            ASR_SESSIONS.inc(result="failed")
+            self._slots.release()
+            raise
+
+        self._next_id += 1
+        session = ASRSession(self, self._next_id, client, handlers, queue_wait)
+        self._sessions[session.session_id] = session
+        self.opened += 1
+        self.total_queue_wait += queue_wait
+        ASR_SESSIONS.inc(result="opened")
+        ASR_SESSION_QUEUE_WAIT.observe(queue_wait)
+        self.max_active = max(self.max_active, self.active)
+        return session
+
+    def _release(self, session: ASRSession):
+        if self._sessions.pop(session.session_id, None) is not None:
+            self.total_audio_bytes += session.audio_bytes
+            self.total_results += session.results
+            self._slots.release()
+
+    def stats(self, include_sessions: bool = False) -> dict:
+        stats = {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_sessions": self.max_sessions,
+            "max_waiting": self.max_waiting,
+            "max_active": self.max_active,
+            "opened": self.opened,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "avg_queue_wait_ms": round(self.total_queue_wait / self.opened * 1000, 1) if self.opened else 0.0,
+            "audio_bytes": self.total_audio_bytes + sum(s.audio_bytes for s in self._sessions.values()),
+            "results": self.total_results + sum(s.results for s in self._sessions.values()),
+            "reconnects": self.reconnects,
+            "reconnect_failures": self.reconnect_failures,
+        }
+        if include_sessions:
+            stats["sessions"] = [session.stats() for session in self._sessions.values()]
+        return stats
+
+    async def close(self):
+        """
+        Closes all active sessions.
+        """
+        for session in list(self._sessions.values()):
+            await session.close()
+
+
+class AudioSendQueue:
+    """
+    Bounded per-session buffer between the browser socket and the Tencent ASR socket.
+
+    Incoming frames are queued without waiting on the upstream connection; a
+    dedicated sender task batches them into packets of `packet_ms`..`max_packet_ms`
+    and paces them with a token bucket at `realtime_factor` times real time
+    (Tencent recommends 40 ms packets at a 1:1 rate). When more than
+    `max_buffer_ms` of audio is queued, `overflow` decides what happens:
+
+    - "drop_oldest": the oldest audio is discarded.
+    - "coalesce": once half the buffer is used, the backlog is merged into one
+      large frame and sent without pacing; audio beyond the limit is dropped.
+    - "pause": `put` blocks until the sender catches up, which stops reading
+      from the client.
+    """
+    OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "pause")
+
+    def __init__(self, sample_rate: int = 16000, packet_ms: int = 40, max_packet_ms: int = 200,
+                 max_buffer_ms: int = 10000, overflow: str = "drop_oldest",
+                 realtime_factor: float = 1.0, burst_ms: int = 1000):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {self.OVERFLOW_POLICIES}")
+        bytes_per_ms = sample_rate * 2 // 1000  # 16-bit mono PCM
+        self.packet_bytes = packet_ms * bytes_per_ms
+        self.max_packet_bytes = max(max_packet_ms, packet_ms) * bytes_per_ms
+        self.max_buffer_bytes = max_buffer_ms * bytes_per_ms
+        self.burst_bytes = burst_ms * bytes_per_ms
+        self.byte_rate = sample_rate * 2 * realtime_factor  # Pacing rate in bytes per second
+        self.overflow = overflow
+
+        # Frames are copied into a ring and packets out of it into one reused buffer,
+        # so the steady state allocates nothing per frame
+        self._ring = PCMRingBuffer(self.max_buffer_bytes, initial_bytes=2 * self.max_packet_bytes)
+        self._packet = bytearray(self.max_packet_bytes)
+        self._data_available = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._flushing = False
+        self._sender_task = None
+
+        # Metrics
+        self.sent_bytes = 0
+        self.sent_packets = 0
+        self.dropped_bytes = 0
+        self.coalesced_packets = 0
+        self.pauses = 0
+        self.max_buffered_bytes = 0
+
+    @property
+    def sending(self) -> bool:
+        return self._sender_task is not None and not self._sender_task.done()
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._ring.size
+
+    async def put(self, data):
+        """
+        Queues an audio frame, applying the overflow policy when the buffer is full.
+
+        `data` is copied, so it may be a view into a buffer the caller reuses.
+        """
+        if not data:
+            return
+        if self.overflow == "pause" and self.sending:
+            if self.buffered_bytes + len(data) > self.max_buffer_bytes:
+                self.pauses += 1
+            while self.buffered_bytes + len(data) > self.max_buffer_bytes and self.sending:
+                self._space_available.clear()
+                await self._space_available.wait()
+        if len(data) > self.max_buffer_bytes:
+            # Only the newest audio of an oversized frame fits
+            self._count_dropped(len(data) - self.max_buffer_bytes)
+            data = memoryview(data).cast('B')[len(data) - self.max_buffer_bytes:]
+        if self.buffered_bytes + len(data) > self.max_buffer_bytes:
+            # Also the fallback for "pause" while no sender is attached (e.g. ASR not connected)
+            self._count_dropped(self._ring.discard(self.buffered_bytes + len(data) - self.max_buffer_bytes))
+
+        self._ring.write(data)
+        self.max_buffered_bytes = max(self.max_buffered_bytes, self.buffered_bytes)
+        self._drained.clear()
+        self._data_available.set()
+
+    def _count_dropped(self, nbytes: int):
+        self.dropped_bytes += nbytes
+        ASR_AUDIO_BYTES.inc(nbytes, outcome="dropped")
+
+    def _take(self, nbytes: int) -> memoryview:
+        # The packet is a view of a reused buffer; the sender awaits `send` before taking the next one
+        if nbytes > len(self._packet):
+            self._packet = bytearray(nbytes)  # Coalesced backlog
+        packet = memoryview(self._packet)[:nbytes]
+        self._ring.copy_into(packet, 0, nbytes)
+        self._ring.discard(nbytes)
+        return packet
+
+    def start(self, send: Callable[[bytes], Awaitable[None]]):
+        """
+        Starts the sender task that drains the queue into `send`.
+        """
+        if self.sending:
+            self._sender_task.cancel()
+        self._sender_task = asyncio.create_task(self._run(send))
+
+    async def _run(self, send: Callable[[bytes], Awaitable[None]]):
+        tokens = self.burst_bytes
+        last_refill = time.monotonic()
+        try:
+            while True:
+                if self.buffered_bytes == 0 or (self.buffered_bytes < self.packet_bytes and not self._flushing):
+                    if self.buffered_bytes == 0:
+                        self._drained.set()
+                    self._data_available.clear()
+                    await self._data_available.wait()
+                    continue
+
+                catch_up = self.overflow == "coalesce" and self.buffered_bytes > self.max_buffer_bytes // 2
+                if catch_up:
+                    packet = self._take(self.buffered_bytes)
+                    self.coalesced_packets += 1
+                else:
+                    packet = self._take(min(self.buffered_bytes, self.max_packet_bytes))
+                    # Token bucket pacing: allow a short burst, then hold the configured real-time rate
+                    now = time.monotonic()
+                    tokens = min(self.burst_bytes, tokens + (now - last_refill) * self.byte_rate)
+                    last_refill = now
+                    if tokens < len(packet):
+                        await asyncio.sleep((len(packet) - tokens) / self.byte_rate)
+                        tokens = 0
+                        last_refill = time.monotonic()
+                    else:
+                        tokens -= len(packet)
+                self._space_available.set()
+
+                await send(packet)
+                self.sent_bytes += len(packet)
+                self.sent_packets += 1
+                ASR_AUDIO_BYTES.inc(len(packet), outcome="sent")
+        finally:
+            self._space_available.set()
+
+    async def flush(self):
+        """
+        Sends everything queued so far, including a final short packet.
+        """
+        if not self.sending:
+            return
+        self._flushing = True
+        try:
+            self._data_available.set()
+            # The sender sets `_drained` once the buffer is empty and the last packet went out
+            drained = asyncio.create_task(self._drained.wait())
+            await asyncio.wait({drained, self._sender_task}, return_when=asyncio.FIRST_COMPLETED)
+            drained.cancel()
+        finally:
+            self._flushing = False
+
+    async def stop(self):
+        """
+        Stops the sender task; queued audio is kept until `clear` is called.
+        """
+        if self.sending:
+            self._sender_task.cancel()
+            try:
+                await self._sender_task
+            except asyncio.CancelledError:
+                pass
+        self._sender_task = None
+
+    def clear(self):
+        """
+        Discards all queued audio, e.g. when a new recording starts.
+        """
+        self._ring.discard(self._ring.size)
+        self._space_available.set()
+
+    def stats(self) -> dict:
+        return {
+            "buffered_bytes": self.buffered_bytes,
+            "max_buffered_bytes": self.max_buffered_bytes,
+            "sent_bytes": self.sent_bytes,
+            "sent_packets": self.sent_packets,
+            "dropped_bytes": self.dropped_bytes,
+            "coalesced_packets": self.coalesced_packets,
+            "pauses": self.pauses,
+        }
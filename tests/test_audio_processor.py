@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+import scipy.signal
+
+from audio_processor import StreamingResampler, VoiceActivityDetector
+
+
+def noise(samples, amplitude, seed=0):
+    return np.random.default_rng(seed).integers(-amplitude, amplitude + 1, samples).astype(np.int16)
+
+
+def tone(samples, rate, frequency=440, amplitude=8000):
+    return (amplitude * np.sin(2 * np.pi * frequency * np.arange(samples) / rate)).astype(np.int16)
+
+
+def run_chunked(process, signal, chunk_sizes):
+    # Outputs are views into reused buffers, so they are copied before the next call
+    outputs, position, i = [], 0, 0
+    while position < len(signal):
+        size = chunk_sizes[i % len(chunk_sizes)]
+        outputs.append(process(signal[position:position + size]).copy())
+        position += size
+        i += 1
+    return np.concatenate(outputs)
+
+
+class TestStreamingResampler:
+    @pytest.mark.parametrize("source_rate", [48000, 44100, 22050, 8000])
+    def test_output_does_not_depend_on_chunk_size(self, source_rate):
+        signal = noise(source_rate * 2, 12000)
+        whole = StreamingResampler(source_rate, 16000).process(signal).copy()
+        for chunk_sizes in ([4800], [960], [1, 333, 4097], [30000]):
+            chunked = run_chunked(StreamingResampler(source_rate, 16000).process, signal, chunk_sizes)
+            assert len(chunked) == len(whole)
+            assert np.abs(chunked.astype(np.int32) - whole).max() <= 1
+
+    @pytest.mark.parametrize("source_rate", [48000, 44100])
+    def test_matches_resample_poly(self, source_rate):
+        signal = tone(source_rate, source_rate) + noise(source_rate, 2000)
+        streamed = run_chunked(StreamingResampler(source_rate, 16000).process, signal, [source_rate // 50])
+        reference = scipy.signal.resample_poly(signal.astype(np.float64), 16000, source_rate)
+        # The stream lags by the filter's group delay and holds back the last input samples
+        lag = np.argmax(scipy.signal.correlate(streamed, reference[:len(streamed)], mode="full")) - len(streamed) + 1
+        aligned = streamed[lag:].astype(np.float64)
+        error = aligned - reference[:len(aligned)]
+        assert 0.98 * len(reference) <= len(streamed) <= len(reference)
+        assert np.sqrt(np.mean(error[100:-100] ** 2)) < 2.0
+
+    def test_same_rate_passes_audio_through(self):
+        signal = noise(1600, 12000)
+        assert np.array_equal(run_chunked(StreamingResampler(16000, 16000).process, signal, [100]), signal)
+
+
+FRAME = 320  # 20 ms at 16 kHz
+
+
+class TestVoiceActivityDetector:
+    def speech_after_silence(self):
+        silence = noise(16000, 10)
+        speech = tone(8000, 16000)
+        tail = noise(32000, 10, seed=1)
+        return silence, speech, tail, np.concatenate([silence, speech, tail])
+
+    def test_speech_is_sent_with_pre_roll_and_hangover(self):
+        silence, speech, tail, signal = self.speech_after_silence()
+        vad = VoiceActivityDetector()
+        out = run_chunked(vad.process, signal, [FRAME])
+        # 10 frames (200 ms) before the speech and 30 frames (600 ms) after it
+        assert np.array_equal(out, np.concatenate([silence[-10 * FRAME:], speech, tail[:30 * FRAME]]))
+        assert vad.speech_frames == 25
+        assert vad.stats()["sent_ms"] == 1300
+
+    def test_output_does_not_depend_on_chunk_size(self):
+        *_, signal = self.speech_after_silence()
+        expected = run_chunked(VoiceActivityDetector().process, signal, [FRAME])
+        for chunk_sizes in ([777], [1, 4096], [len(signal)]):
+            assert np.array_equal(run_chunked(VoiceActivityDetector().process, signal, chunk_sizes), expected)
+
+    def test_short_pause_keeps_one_utterance(self):
+        gap = noise(400 * 16, 10)  # Shorter than the 600 ms hangover
+        signal = np.concatenate([noise(16000, 10), tone(8000, 16000), gap, tone(8000, 16000), noise(16000, 10)])
+        out = run_chunked(VoiceActivityDetector().process, signal, [FRAME])
+        assert len(out) == (10 + 25 + 20 + 25 + 30) * FRAME
+
+    def test_silence_sends_only_keepalive_frames(self):
+        vad = VoiceActivityDetector(keepalive_ms=5000)
+        out = run_chunked(vad.process, noise(16000 * 11, 10), [1600])
+        assert len(out) == 2 * FRAME
+        assert not out.any()
+        assert vad.speech_frames == 0
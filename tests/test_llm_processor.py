@@ -0,0 +1,88 @@
+import pytest
+
+import llm_processor
+from llm_processor import LLMResponseCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_processor.time, "time", clock)
+    return clock
+
+
+class TestLLMResponseCache:
+    def test_key_depends_on_every_field(self):
+        key = LLMResponseCache.make_key("deepseek", "deepseek-chat", "prompt", "text")
+        assert key == LLMResponseCache.make_key("deepseek", "deepseek-chat", "prompt", "text")
+        assert key != LLMResponseCache.make_key("deepseek", "deepseek-chat", "prompt", "text2")
+        assert key != LLMResponseCache.make_key("gemini", "deepseek-chat", "prompt", "text")
+
+    def test_entries_expire_after_ttl(self, clock):
+        cache = LLMResponseCache(ttl=60)
+        cache.set("k", "value")
+        clock.now += 59
+        assert cache.get("k") == "value"
+        clock.now += 1
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_least_recently_used_entry_is_evicted(self, clock):
+        cache = LLMResponseCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        assert cache.get("a") == "1"
+        cache.set("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert cache.evictions == 1
+
+    def test_size_limit_counts_utf8_bytes(self, clock):
+        cache = LLMResponseCache(max_bytes=12)
+        cache.set("a", "你好")  # 6 bytes
+        cache.set("b", "世界")
+        assert cache.stats()["bytes"] == 12
+        cache.set("c", "x")
+        assert cache.get("a") is None
+        assert cache.stats()["bytes"] == 7
+        # A value larger than the whole cache is not stored
+        cache.set("d", "x" * 13)
+        assert cache.get("d") is None
+        assert cache.get("b") == "世界"
+
+    def test_replacing_a_key_updates_its_size(self, clock):
+        cache = LLMResponseCache(max_bytes=10)
+        cache.set("a", "x" * 8)
+        cache.set("a", "y" * 2)
+        assert cache.stats()["bytes"] == 2
+        assert cache.get("a") == "yy"
+
+    def test_disabled_memory_tier(self, clock):
+        cache = LLMResponseCache(max_entries=0)
+        cache.set("a", "1")
+        assert cache.get("a") is None
+
+    def test_disk_tier_survives_a_restart_and_expires(self, clock, tmp_path):
+        db_path = str(tmp_path / "cache.db")
+        cache = LLMResponseCache(ttl=60, db_path=db_path)
+        cache.set("k", "value")
+        cache.close()
+
+        cache = LLMResponseCache(ttl=60, db_path=db_path)
+        assert cache.get("k") == "value"
+        assert cache.disk_hits == 1
+        assert cache.get("k") == "value"
+        assert cache.hits == 1
+        clock.now += 60
+        assert cache.get("k") is None
+        cache.close()
@@ -0,0 +1,214 @@
+import asyncio
+import types
+
+import pytest
+
+from tencent_asr_client import ASRSession, AudioSendQueue, TranscriptState, utf16_len
+
+BYTES_PER_MS = 32  # 16 kHz 16-bit mono
+
+
+def result(index, text, slice_type=1, **extra):
+    return {"index": index, "voice_text_str": text, "slice_type": slice_type, **extra}
+
+
+class TestTranscriptState:
+    def test_partials_send_only_the_changed_suffix(self):
+        state = TranscriptState()
+        assert state.apply(result(0, "你好")) == {"offset": 0, "content": "你好", "stable_length": 0}
+        assert state.apply(result(0, "你好世界")) == {"offset": 2, "content": "世界", "stable_length": 0}
+        assert state.apply(result(0, "你好世界")) is None
+        # A correction rewrites from the first differing character
+        assert state.apply(result(0, "你们")) == {"offset": 1, "content": "们", "stable_length": 0}
+        assert state.text == "你们"
+
+    def test_final_advances_stable_length(self):
+        state = TranscriptState()
+        state.apply(result(0, "第一句"))
+        delta = state.apply(result(0, "第一句。", slice_type=2, end_time=1500))
+        assert delta == {"offset": 3, "content": "。", "stable_length": 4, "sentence_final": True, "end_ms": 1500}
+        assert state.apply(result(1, "第二")) == {"offset": 4, "content": "第二", "stable_length": 4}
+        assert state.text == "第一句。第二"
+
+    def test_unchanged_final_is_still_reported(self):
+        state = TranscriptState()
+        state.apply(result(0, "好"))
+        delta = state.apply(result(0, "好", slice_type=2))
+        assert delta["sentence_final"] is True
+        assert delta["content"] == ""
+        assert delta["stable_length"] == 1
+
+    def test_new_index_finalizes_the_previous_sentence(self):
+        state = TranscriptState()
+        state.apply(result(0, "没有结尾"))
+        assert state.apply(result(1, "下一句")) == {"offset": 4, "content": "下一句", "stable_length": 4}
+        assert state.segments == ["没有结尾"]
+
+    def test_offsets_count_utf16_code_units(self):
+        assert utf16_len("a😀中") == 4
+        state = TranscriptState()
+        state.apply(result(0, "😀好", slice_type=2))
+        assert state.stable_length == 3
+        state.apply(result(1, "😀a"))
+        # The emoji is a surrogate pair, so the change starts two units into the sentence
+        assert state.apply(result(1, "😀b")) == {"offset": 5, "content": "b", "stable_length": 3}
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = []
+        self.is_open = True
+        self.voice_id = "voice"
+        self.handlers = {}
+
+    def register_handler(self, event_type, handler):
+        self.handlers[event_type] = handler
+
+    async def send_audio(self, data):
+        self.sent.append(bytes(data))
+
+    async def send_end_frame(self):
+        pass
+
+    async def close(self):
+        self.is_open = False
+
+
+def make_session():
+    manager = types.SimpleNamespace(replay_ms=15000, replay_packet_ms=40, replay_speed=1000,
+                                    _release=lambda session: None)
+    return ASRSession(manager, 1, FakeClient(), {}, 0.0)
+
+
+async def replayed_session():
+    # 4 s of audio; the first connection finalized sentence 0 at 2 s and was in sentence 1
+    session = make_session()
+    await session.send_audio(b"\0" * 4000 * BYTES_PER_MS)
+    assert session._map_result(result(0, "第一句。", slice_type=2, start_time=0, end_time=2000))["index"] == 0
+    session._map_result(result(1, "第二", start_time=2000, end_time=3000))
+    session._attach(FakeClient())
+    await session._replay()
+    return session
+
+
+class TestASRSessionMapResult:
+    @pytest.mark.asyncio
+    async def test_replay_starts_after_the_last_final(self):
+        replayed = await replayed_session()
+        assert sum(map(len, replayed.client.sent)) == 2000 * BYTES_PER_MS
+        mapped = replayed._map_result(result(0, "第二句。", slice_type=2, start_time=100, end_time=1500))
+        assert (mapped["index"], mapped["start_time"], mapped["end_time"]) == (1, 2100, 3500)
+        assert mapped["slice_type"] == 2
+        assert replayed.suppressed == 0
+
+    @pytest.mark.asyncio
+    async def test_already_finalized_text_is_suppressed(self):
+        replayed = await replayed_session()
+        mapped = replayed._map_result(result(0, "第一句。", slice_type=2, start_time=0, end_time=1500))
+        assert mapped["slice_type"] == 1
+        assert mapped["voice_text_str"] == ""
+        assert replayed.suppressed == 1
+        # The next new sentence reuses the index of the suppressed one
+        mapped = replayed._map_result(result(1, "第二句。", slice_type=2, start_time=1500, end_time=1900))
+        assert (mapped["index"], mapped["slice_type"]) == (2, 2)
+
+    @pytest.mark.asyncio
+    async def test_final_ending_before_the_replay_point_is_suppressed(self):
+        replayed = await replayed_session()
+        mapped = replayed._map_result(result(0, "第一句", slice_type=2, start_time=0, end_time=150))
+        assert mapped["voice_text_str"] == ""
+        assert replayed.suppressed == 1
+
+    @pytest.mark.asyncio
+    async def test_dedup_stops_after_the_first_new_final(self):
+        replayed = await replayed_session()
+        replayed._map_result(result(0, "第二句。", slice_type=2, end_time=1500))
+        mapped = replayed._map_result(result(1, "第一句。", slice_type=2, end_time=1800))
+        assert mapped["voice_text_str"] == "第一句。"
+        assert replayed.suppressed == 0
+
+
+class Sender:
+    def __init__(self, blocked=False):
+        self.packets = []
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def __call__(self, packet):
+        self.packets.append(bytes(packet))  # The packet is a view of a reused buffer
+        await self.gate.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestAudioSendQueue:
+    def test_unknown_overflow_policy(self):
+        with pytest.raises(ValueError):
+            AudioSendQueue(overflow="block")
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest_keeps_the_newest_audio(self):
+        queue = AudioSendQueue(max_buffer_ms=100)
+        for i in range(5):
+            await queue.put(bytes([i]) * 1000)
+        assert queue.buffered_bytes == 3200
+        assert queue.dropped_bytes == 1800
+        sender = Sender()
+        queue.start(sender)
+        await queue.flush()
+        await queue.stop()
+        assert b"".join(sender.packets) == b"\1" * 200 + b"\2" * 1000 + b"\3" * 1000 + b"\4" * 1000
+
+    @pytest.mark.asyncio
+    async def test_oversized_frame_keeps_its_tail(self):
+        queue = AudioSendQueue(max_buffer_ms=100)
+        await queue.put(bytes(range(200)) * 20)
+        assert queue.buffered_bytes == 3200
+        assert queue.dropped_bytes == 800
+
+    @pytest.mark.asyncio
+    async def test_pause_blocks_until_the_sender_catches_up(self):
+        queue = AudioSendQueue(max_buffer_ms=100, overflow="pause")
+        sender = Sender(blocked=True)
+        queue.start(sender)
+        await queue.put(b"\1" * 3200)
+        await settle()  # The sender takes it and blocks in send
+        await queue.put(b"\2" * 3200)
+        put = asyncio.ensure_future(queue.put(b"\3" * 1000))
+        await settle()
+        assert not put.done()
+        assert queue.pauses == 1
+        sender.gate.set()
+        await asyncio.wait_for(put, 1)
+        await queue.flush()
+        await queue.stop()
+        assert queue.dropped_bytes == 0
+        assert b"".join(sender.packets) == b"\1" * 3200 + b"\2" * 3200 + b"\3" * 1000
+
+    @pytest.mark.asyncio
+    async def test_pause_without_a_sender_drops_the_oldest_audio(self):
+        queue = AudioSendQueue(max_buffer_ms=100, overflow="pause")
+        await queue.put(b"\1" * 3200)
+        await asyncio.wait_for(queue.put(b"\2" * 1000), 1)
+        assert queue.dropped_bytes == 1000
+        assert queue.pauses == 0
+
+    @pytest.mark.asyncio
+    async def test_coalesce_sends_the_backlog_as_one_packet(self):
+        queue = AudioSendQueue(max_buffer_ms=100, overflow="coalesce")
+        sender = Sender(blocked=True)
+        queue.start(sender)
+        await queue.put(b"\1" * 1280)
+        await settle()
+        for _ in range(4):
+            await queue.put(b"\2" * 640)  # 2560 bytes, over half the buffer
+        sender.gate.set()
+        await queue.flush()
+        await queue.stop()
+        assert [len(p) for p in sender.packets] == [1280, 2560]
+        assert queue.coalesced_packets == 1
+        assert queue.dropped_bytes == 0
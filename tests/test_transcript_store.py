@@ -0,0 +1,35 @@
+from transcript_store import TranscriptStore, build_match_query, ngram_tokens
+
+
+def test_ngram_tokens():
+    assert ngram_tokens("季度预算OK") == ["季度", "度预", "预算", "算", "ok"]
+    assert ngram_tokens("好") == ["好"]
+    assert ngram_tokens("你好，世界 Hello_World 42") == ["你好", "好", "世界", "界", "hello", "world", "42"]
+    assert ngram_tokens("，。！") == []
+
+
+def test_build_match_query():
+    assert build_match_query("季度预算") == '"季度 度预 预算"'
+    assert build_match_query("量子 API") == '"量子" AND "api"*'
+    assert build_match_query("好") == '"好"*'
+    assert build_match_query("  ，。") is None
+
+
+def test_search_matches_substrings_only(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"))
+    try:
+        store.save_session("s1", kind="realtime")
+        store.add_segment("s1", 0, "下个季度的预算需要调整", 0, 2000)
+        store.add_segment("s1", 1, "预算季度报告", 2000, 4000)
+        store.add_output("s1", "summary", "Budget review for Q3")
+        assert store.flush(5)
+
+        results = store.search("季度的预算")["results"]
+        assert [r["index"] for r in results] == [0]
+        # Segment 0 contains 预算 and 季度 too, but not as one phrase
+        assert [r["index"] for r in store.search("预算季度")["results"]] == [1]
+        assert [r["kind"] for r in store.search("budg")["results"]] == ["summary"]
+        assert len(store.search("季度")["results"]) == 2
+        assert store.search("。")["results"] == []
+    finally:
+        store.close()
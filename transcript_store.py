@@ -0,0 +1,377 @@
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_STORE_WRITES = metrics.counter(
+    "stt_transcript_store_writes_total", "Transcript store writes by outcome (written or dropped)", ("result",))
+TRANSCRIPT_STORE_BATCH_SECONDS = metrics.histogram(
+    "stt_transcript_store_batch_seconds", "Time to write and commit one batch of transcript store writes")
+
+# Han ideographs are indexed as overlapping character bigrams; everything else as lowercased words
+_HAN = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_TOKEN = re.compile(rf'[{_HAN}]+|[^\W_{_HAN}]+')
+_HAN_RUN = re.compile(rf'[{_HAN}]')
+
+# entries_fts holds only the tokens (text is read from entries); the one-character prefix
+# index keeps single-character and word-prefix queries from scanning every bigram
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    kind TEXT,
+    status TEXT,
+    started_at REAL,
+    ended_at REAL,
+    updated_at REAL,
+    segments INTEGER NOT NULL DEFAULT 0,
+    chars INTEGER NOT NULL DEFAULT 0,
+    preview TEXT NOT NULL DEFAULT '',
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started_at, session_id);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    idx INTEGER,
+    start_ms INTEGER,
+    end_ms INTEGER,
+    model TEXT,
+    text TEXT NOT NULL,
+    created REAL
+);
+CREATE INDEX IF NOT EXISTS entries_session ON entries (session_id, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(tokens, content='', prefix='1');
+"""
+
+PREVIEW_CHARS = 80
+
+
+def ngram_tokens(text: str) -> List[str]:
+    """
+    Search tokens of `text`: overlapping bigrams of every run of Chinese characters
+    (plus the run's last character, so single characters are findable) and lowercased words.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(text):
+        run = match.group()
+        if _HAN_RUN.match(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for a user query; every Chinese run or word must occur, or None if nothing is searchable.
+
+    A Chinese run is matched as a phrase of its bigrams (i.e. as a substring), a single
+    character or a word as a prefix.
+    """
+    terms = []
+    for match in _TOKEN.finditer(query):
+        run = match.group()
+        if _HAN_RUN.match(run) and len(run) > 1:
+            terms.append('"' + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+        else:
+            terms.append(f'"{run.lower()}"*')
+    return " AND ".join(terms) or None
+
+
+def make_snippet(text: str, query: str, width: int = 80) -> str:
+    """
+    Up to `width` characters of `text` around the first occurrence of a query term.
+    """
+    lowered = text.lower()
+    positions = [lowered.find(m.group().lower()) for m in _TOKEN.finditer(query)]
+    position = min([p for p in positions if p >= 0], default=0)
+    start = max(0, min(position - width // 4, len(text) - width))
+    snippet = text[start:start + width]
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(text) else "")
+
+
+class TranscriptStore:
+    """
+    SQLite store of past recordings: session metadata, finalized ASR segments and LLM
+    outputs, with a full-text index over all of them.
+
+    Writes never block the caller: they are queued and a background thread commits
+    whatever has accumulated in one transaction, so a busy server writes in large
+    batches and an idle one within milliseconds. When the queue is full, writes are
+    dropped and counted. Reads open one connection per calling thread and may block
+    on SQLite, so call them off the event loop. Listing and search are keyset-paginated
+    and use indexes only, so they stay fast however many sessions are stored.
+    """
+
+    def __init__(self, db_path: str, max_queued: int = 100000, batch_size: int = 500):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queued)
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._closed = False
+
+        # Metrics
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+        db = self._connect()
+        db.executescript(SCHEMA)
+        db.commit()
+        self._writer = threading.Thread(target=self._run, args=(db,), name="transcript-store", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        # WAL lets readers (and other workers) run while a batch is being written
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # --- Writes (non-blocking, safe to call on the event loop) ---
+
+    def _enqueue(self, op: tuple):
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            self.dropped += 1
+            TRANSCRIPT_STORE_WRITES.inc(result="dropped")
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Transcript store queue is full, {self.dropped} writes dropped so far")
+
+    def save_session(self, session_id: str, kind: Optional[str] = None, status: Optional[str] = None,
+                     started_at: Optional[float] = None, ended_at: Optional[float] = None, **metadata):
+        """
+        Creates or updates a session; fields left as None keep their stored value and `metadata` is merged.
+        """
+        self._enqueue(("session", session_id, kind, status, started_at, ended_at,
+                       json.dumps(metadata, ensure_ascii=False) if metadata else None, time.time()))
+
+    def add_segment(self, session_id: str, index: Optional[int], text: str,
+                    start_ms: Optional[int] = None, end_ms: Optional[int] = None):
+        """
+        Appends a finalized ASR sentence to the session's transcript.
+        """
+        if text:
+            self._enqueue(("segment", session_id, index, start_ms, end_ms, text, time.time()))
+
+    def add_output(self, session_id: str, kind: str, text: str, model: Optional[str] = None):
+        """
+        Stores an LLM result for the session, e.g. kind "readability", "summary" or "ask_ai".
+        """
+        if text:
+            self._enqueue(("output", session_id, kind, model, text, time.time()))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until everything queued so far is committed. Returns False on timeout.
+        """
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """
+        Commits the queued writes and closes the database.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout)
+        with self._readers_lock:
+            for db in self._readers:
+                db.close()
+            self._readers.clear()
+
+    def _run(self, db: sqlite3.Connection):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+            flushes = [op[1] for op in batch if op is not None and op[0] == "flush"]
+            writes = [op for op in batch if op is not None and op[0] != "flush"]
+            if writes:
+                start = time.perf_counter()
+                try:
+                    with db:
+                        for op in writes:
+                            getattr(self, f"_write_{op[0]}")(db, *op[1:])
+                    self.written += len(writes)
+                    self.batches += 1
+                    TRANSCRIPT_STORE_WRITES.inc(len(writes), result="written")
+                except Exception as e:
+                    self.dropped += len(writes)
+                    TRANSCRIPT_STORE_WRITES.inc(len(writes), result="dropped")
+                    logger.error(f"Failed to write {len(writes)} transcript store records: {e}", exc_info=True)
+                TRANSCRIPT_STORE_BATCH_SECONDS.observe(time.perf_counter() - start)
+            for done in flushes:
+                done.set()
+        db.close()
+
+    @staticmethod
+    def _write_session(db, session_id, kind, status, started_at, ended_at, metadata, now):
+        db.execute(
+            "INSERT INTO sessions (session_id, kind, status, started_at, ended_at, updated_at, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET "
+            "kind = coalesce(excluded.kind, kind), status = coalesce(excluded.status, status), "
+            "started_at = coalesce(started_at, excluded.started_at), ended_at = coalesce(excluded.ended_at, ended_at), "
+            "updated_at = excluded.updated_at, "
+            "metadata = CASE WHEN excluded.metadata IS NULL THEN metadata "
+            "ELSE json_patch(coalesce(metadata, '{}'), excluded.metadata) END",
+            (session_id, kind, status, started_at or now, ended_at, now, metadata))
+
+    @staticmethod
+    def _write_entry(db, session_id, kind, index, start_ms, end_ms, model, text, now):
+        entry_id = db.execute(
+            "INSERT INTO entries (session_id, kind, idx, start_ms, end_ms, model, text, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, kind, index, start_ms, end_ms, model, text, now)).lastrowid
+        db.execute("INSERT INTO entries_fts (rowid, tokens) VALUES (?, ?)", (entry_id, " ".join(ngram_tokens(text))))
+
+    def _write_segment(self, db, session_id, index, start_ms, end_ms, text, now):
+        self._write_entry(db, session_id, "segment", index, start_ms, end_ms, None, text, now)
+        db.execute(
+            "UPDATE sessions SET segments = segments + 1, chars = chars + ?, updated_at = ?, "
+            "preview = CASE WHEN length(preview) < ? THEN substr(preview || ?, 1, ?) ELSE preview END "
+            "WHERE session_id = ?",
+            (len(text), now, PREVIEW_CHARS, text, PREVIEW_CHARS, session_id))
+
+    def _write_output(self, db, session_id, kind, model, text, now):
+        self._write_entry(db, session_id, kind, None, None, None, model, text, now)
+
+    # --- Reads (blocking, call via asyncio.to_thread) ---
+
+    def _reader(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA query_only=1")
+            self._local.db = db
+            with self._readers_lock:
+                self._readers.append(db)
+        return db
+
+    @staticmethod
+    def _session_dict(row: sqlite3.Row) -> dict:
+        data = {key: row[key] for key in row.keys() if key != "metadata"}
+        data["metadata"] = json.loads(row["metadata"]) if row["metadata"] else {}
+        return data
+
+    def list_sessions(self, limit: int = 20, cursor: Optional[str] = None, kind: Optional[str] = None) -> dict:
+        """
+        Sessions newest first. Pass the returned `next_cursor` to get the following page.
+
+        Raises ValueError for a malformed cursor.
+        """
+        sql, params = "SELECT * FROM sessions", []
+        conditions = []
+        if cursor:
+            started_at, _, session_id = cursor.partition(":")
+            conditions.append("(started_at, session_id) < (?, ?)")
+            params += [float(started_at), session_id]
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY started_at DESC, session_id DESC LIMIT ?"
+        rows = self._reader().execute(sql, params + [limit + 1]).fetchall()
+        sessions = [self._session_dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = sessions[-1]
+            next_cursor = f"{last['started_at']!r}:{last['session_id']}"
+        return {"sessions": sessions, "next_cursor": next_cursor}
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        """
+        The session with its transcript (finalized segments) and LLM outputs, or None if it is unknown.
+        """
+        db = self._reader()
+        row = db.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        entries = db.execute(
+            "SELECT kind, idx, start_ms, end_ms, model, text, created FROM entries WHERE session_id = ? ORDER BY id",
+            (session_id,)).fetchall()
+        if row is None and not entries:
+            return None
+        session = self._session_dict(row) if row is not None else {"session_id": session_id, "metadata": {}}
+        session["transcript"] = [
+            {"index": e["idx"], "start_ms": e["start_ms"], "end_ms": e["end_ms"], "text": e["text"]}
+            for e in entries if e["kind"] == "segment"
+        ]
+        session["outputs"] = [
+            {"kind": e["kind"], "model": e["model"], "text": e["text"], "created": e["created"]}
+            for e in entries if e["kind"] != "segment"
+        ]
+        return session
+
+    def get_transcript(self, session_id: str) -> List[str]:
+        rows = self._reader().execute(
+            "SELECT text FROM entries WHERE session_id = ? AND kind = 'segment' ORDER BY id", (session_id,))
+        return [row[0] for row in rows]
+
+    def search(self, query: str, limit: int = 20, cursor: Optional[str] = None) -> dict:
+        """
+        Segments and outputs containing every term of `query`, newest first, with a snippet
+        around the first match. Pass the returned `next_cursor` to get the following page.
+
+        Raises ValueError for a malformed cursor.
+        """
+        match = build_match_query(query)
+        if match is None:
+            return {"results": [], "next_cursor": None}
+        sql, params = "SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?", [match]
+        if cursor:
+            sql += " AND rowid < ?"
+            params.append(int(cursor))
+        db = self._reader()
+        ids = [row[0] for row in db.execute(sql + " ORDER BY rowid DESC LIMIT ?", params + [limit + 1])]
+        next_cursor = str(ids[limit - 1]) if len(ids) > limit else None
+        ids = ids[:limit]
+        if not ids:
+            return {"results": [], "next_cursor": None}
+        rows = db.execute(
+            "SELECT e.id, e.session_id, e.kind, e.idx, e.start_ms, e.end_ms, e.model, e.text, e.created, "
+            "s.kind AS session_kind, s.started_at FROM entries e LEFT JOIN sessions s USING (session_id) "
+            f"WHERE e.id IN ({','.join('?' * len(ids))}) ORDER BY e.id DESC", ids).fetchall()
+        results = []
+        for row in rows:
+            result = {key: row[key] for key in row.keys() if key not in ("idx", "text")}
+            result["index"] = row["idx"]
+            result["snippet"] = make_snippet(row["text"], query)
+            results.append(result)
+        return {"results": results, "next_cursor": next_cursor}
+
+    def stats(self) -> dict:
+        db = self._reader()
+        return {
+            "sessions": db.execute("SELECT count(*) FROM sessions").fetchone()[0],
+            # Entries are append-only, so the largest id is their count without a table scan
+            "entries": db.execute("SELECT max(id) FROM entries").fetchone()[0] or 0,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }